@@ -0,0 +1,206 @@
+"""
+bench_data_service.py
+---------------------
+Reproducible benchmark for the data service and HTTP endpoints.
+
+For each synthetic dataset size it times:
+- _process_csv_data on raw CSV rows
+- parsing the rows into a SensorDataset, and the share of it spent in the
+  data-quality stage (validate_dataset)
+- SensorDataset.select by date range (several ranges), the row selection of /data
+- loading the dataset from a local HTTP stand-in for the sheet (cold)
+- get_data_with_filters for a mix of filters (warm cache)
+- GET /data (records and columnar layouts), /analytics/correlation, /devices and /sensors through
+  the Flask test client
+
+The shared query cache is disabled so repeated requests measure the full
+request path rather than cache hits.
+
+Results are written as JSON to benchmarks/results/ (one file per run, named
+after the date and git commit); compare two runs with benchmarks/compare.py.
+
+Usage:
+    python benchmarks/bench_data_service.py --sizes 10k 100k
+    python benchmarks/bench_data_service.py --sizes 1m --repeat 3
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCH_DIR), "src")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, BENCH_DIR)
+# Background jobs would refresh and rebuild data in the middle of the timings
+os.environ.setdefault("ECOMONITOR_SCHEDULER", "0")
+
+import synthetic
+from stand_in import SheetStandIn
+
+import services.dataset as dataset_module
+from services.cache import configure_cache, get_cache, MemoryCache
+from services.sources import registry, SheetSource
+from services.data_service import _process_csv_data, get_data_with_filters
+from services.dataset import SensorDataset
+from services.metrics import STAGE_LATENCY
+from app import app
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+# Synthetic data starts at 2025-01-01T00:00:00-06:00
+DATA_START = datetime(2025, 1, 1, tzinfo=timezone(timedelta(hours=-6)))
+
+FILTER_MIXES = {
+    "all": {},
+    "sensor": {"sensor": "temperature"},
+    "device": {"device_id": "esp32-1"},
+    "day": {"start_date": "2025-01-02T00:00:00-06:00", "end_date": "2025-01-03T00:00:00-06:00"},
+    # Documented date-only form (no UTC offset → taken as UTC)
+    "day_date_only": {"start_date": "2025-01-02", "end_date": "2025-01-03"},
+    "sensor_device": {"sensor": "co2", "device_id": "esp32-2"},
+    "sensor_device_day": {
+        "sensor": "humidity",
+        "device_id": "esp32-1",
+        "start_date": "2025-01-02T00:00:00-06:00",
+        "end_date": "2025-01-03T00:00:00-06:00",
+    },
+}
+
+
+def measure(func, repeat):
+    """Run `func` `repeat` times and return timing stats in seconds."""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return {
+        "min": round(min(samples), 6),
+        "median": round(statistics.median(samples), 6),
+        "mean": round(statistics.fmean(samples), 6),
+        "repeat": repeat,
+    }, result
+
+
+def bench_size(rows_count, repeat):
+    results = {}
+    rows = synthetic.load_rows(rows_count)
+    path = synthetic.dataset_path(rows_count)
+
+    results["process_csv_data"], _ = measure(lambda: _process_csv_data(rows), repeat)
+
+    validate_before = STAGE_LATENCY.sum(stage="validate_dataset")
+    results["parse_dataset"], dataset = measure(lambda: SensorDataset.from_rows(rows), repeat)
+    validate_seconds = (STAGE_LATENCY.sum(stage="validate_dataset") - validate_before) / repeat
+    results["validate_dataset"] = {
+        "median": round(validate_seconds, 6),
+        "repeat": repeat,
+        "fraction_of_parse": round(validate_seconds / results["parse_dataset"]["mean"], 4),
+    }
+    del rows
+
+    for days in (1, 7, None):
+        start = DATA_START + timedelta(days=1)
+        end = start + timedelta(days=days) if days else None
+        name = f"select_by_date_{days}d" if days else "select_by_date_open"
+        results[name], _ = measure(lambda: dataset.select(None, start, end), repeat)
+    del dataset
+
+    with SheetStandIn(path) as server:
+        original_sources, original_cache = registry.sources, get_cache()
+        registry.set_sources([SheetSource("bench", [server.url], refresh_interval=0)])
+        configure_cache(MemoryCache(max_bytes=0))
+        try:
+            results["load_cold"], _ = measure(lambda: dataset_module.get_dataset(force_refresh=True), repeat)
+
+            for mix, filters in FILTER_MIXES.items():
+                kwargs = {
+                    "sensor": filters.get("sensor"),
+                    "device_id": filters.get("device_id"),
+                    "start_date_str": filters.get("start_date"),
+                    "end_date_str": filters.get("end_date"),
+                }
+                results[f"get_data_with_filters_{mix}"], (_, error) = measure(lambda: get_data_with_filters(**kwargs), repeat)
+                if error:
+                    raise RuntimeError(f"get_data_with_filters({kwargs}) failed: {error}")
+
+            client = app.test_client()
+            endpoints = {f"GET /data [{mix}]": "/data?" + urlencode(filters) for mix, filters in FILTER_MIXES.items()}
+            for mix in ("all", "sensor", "sensor_device_day"):
+                endpoints[f"GET /data [{mix}, columnar]"] = "/data?" + urlencode({**FILTER_MIXES[mix], "layout": "columnar"})
+            endpoints["GET /analytics/correlation [lagged]"] = (
+                "/analytics/correlation?sensors=temperature,humidity,co2&device_id=esp32-1,esp32-2&max_lag=3600"
+            )
+            endpoints["GET /devices"] = "/devices"
+            endpoints["GET /sensors"] = "/sensors"
+            for name, url in endpoints.items():
+                stats, response = measure(lambda: client.get(url), repeat)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{url} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+                stats["bytes"] = len(response.get_data())
+                results[name] = stats
+        finally:
+            registry.set_sources(original_sources)
+            configure_cache(original_cache)
+            dataset_module._store.invalidate()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["10k", "100k"], choices=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="JSON output path (default: benchmarks/results/<date>_<commit>.json)")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": {},
+    }
+
+    for label in args.sizes:
+        print(f"\n== {label} rows ==")
+        report["results"][label] = bench_size(SIZES[label], args.repeat)
+        for name, stats in report["results"][label].items():
+            extra = f"  {stats['bytes'] / 1e6:8.2f} MB" if "bytes" in stats else ""
+            if "fraction_of_parse" in stats:
+                extra = f"  {stats['fraction_of_parse']:8.1%} of parse"
+            print(f"  {name:<40} {stats['median'] * 1000:10.2f} ms{extra}")
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}_{commit}.json")
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+bench_feature_builder.py
+------------------------
+Compares per-sensor feature construction + training cost across the
+four-sensor analysis loop:
+
+- legacy:  lag/rolling columns are added in place to one shared DataFrame
+           followed by dropna(), so every sensor inherits earlier columns.
+- builder: FeatureBuilder produces an independent matrix per sensor from a
+           shared base array.
+
+Usage:
+    python benchmarks/bench_feature_builder.py --rows 200000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+
+from model.feature_builder import FeatureBuilder
+from model.feature_window import FeatureWindow
+
+NUMERIC_COLUMNS = ['tempC', 'hum%', 'mq135_raw', 'rs_r0', 'co2_ppm', 'ldr_raw', 'ldr_v', 'ldr_pct']
+TARGETS = ['tempC', 'hum%', 'co2_ppm', 'ldr_raw']
+WINDOW_SIZE = 10
+
+
+def make_frame(rows, seed=42):
+    """Synthetic sensor frame with the same numeric schema as the ESP32 CSV."""
+    rng = np.random.default_rng(seed)
+    data = {col: rng.normal(50, 10, rows).cumsum() / 100 for col in NUMERIC_COLUMNS}
+    data['timestamp'] = pd.date_range("2025-01-01", periods=rows, freq="35s")
+    return pd.DataFrame(data)
+
+
+def run_legacy(frame):
+    data = frame.copy()
+    results = []
+    for target in TARGETS:
+        start = time.perf_counter()
+        for i in range(1, WINDOW_SIZE + 1):
+            data[f'{target}_lag_{i}'] = data[target].shift(i)
+        data[f'{target}_rolling_mean'] = data[target].rolling(window=WINDOW_SIZE).mean()
+        data[f'{target}_rolling_std'] = data[target].rolling(window=WINDOW_SIZE).std()
+        data['hour'] = data['timestamp'].dt.hour
+        data['day_of_week'] = data['timestamp'].dt.dayofweek
+        data['day_of_year'] = data['timestamp'].dt.dayofyear
+        data = data.dropna()
+        feature_columns = [col for col in data.columns if col not in ('timestamp', target)]
+        LinearRegression().fit(data[feature_columns], data[target])
+        results.append({
+            "target": target,
+            "seconds": time.perf_counter() - start,
+            "rows": len(data),
+            "features": len(feature_columns),
+        })
+    return results
+
+
+def run_builder(frame):
+    builder = FeatureBuilder(frame, NUMERIC_COLUMNS)
+    results = []
+    for target in TARGETS:
+        start = time.perf_counter()
+        window = FeatureWindow(target, n_lags=WINDOW_SIZE, windows=(WINDOW_SIZE,))
+        features = builder.build(window, exogenous=NUMERIC_COLUMNS)
+        LinearRegression().fit(features.X, features.y)
+        results.append({
+            "target": target,
+            "seconds": time.perf_counter() - start,
+            "rows": len(features),
+            "features": len(features.feature_names),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    frame = make_frame(args.rows)
+    report = {"rows": args.rows, "legacy": run_legacy(frame), "builder": run_builder(frame)}
+
+    for mode in ("legacy", "builder"):
+        print(f"\n{mode}")
+        for entry in report[mode]:
+            print(f"  {entry['target']:<8} {entry['seconds'] * 1000:8.1f} ms  "
+                  f"rows={entry['rows']:<8} features={entry['features']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
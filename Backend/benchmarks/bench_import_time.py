@@ -0,0 +1,98 @@
+"""
+bench_import_time.py
+--------------------
+Startup benchmark based on `python -X importtime`.
+
+Each module is imported in a fresh interpreter (with `src/` on the path) and
+the cumulative import time of the module plus its heaviest dependencies is
+reported. Run it before and after a change to track API/model startup cost.
+
+Usage:
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --repeat 5 --output import_times.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+DEFAULT_MODULES = [
+    "app",
+    "model.sensor_ai_model",
+    "model.simple_ai_analysis",
+]
+
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output into {package: cumulative_us}.
+    Lines look like: 'import time:  self [us] | cumulative | imported package'.
+    """
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            cumulative = int(parts[1].strip())
+        except ValueError:
+            continue  # header line
+        timings[parts[2].strip()] = cumulative
+    return timings
+
+
+def measure(module):
+    """Import `module` in a fresh interpreter and return its importtime table."""
+    env = dict(os.environ, PYTHONPATH=SRC_DIR, MPLBACKEND="Agg")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per module (median is reported)")
+    parser.add_argument("--top", type=int, default=8, help="Heaviest dependencies to list per module")
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    report = {}
+    for module in args.modules:
+        runs = [measure(module) for _ in range(args.repeat)]
+        total_ms = statistics.median(run.get(module, 0) for run in runs) / 1000
+        # Only top-level packages, so nested imports are not double counted
+        last = runs[-1]
+        heaviest = sorted(
+            ((name, us / 1000) for name, us in last.items() if "." not in name and name != module),
+            key=lambda item: item[1],
+            reverse=True,
+        )[:args.top]
+
+        report[module] = {"total_ms": round(total_ms, 2), "heaviest": dict(heaviest)}
+
+        print(f"{module:<28} {total_ms:9.1f} ms")
+        for name, ms in heaviest:
+            print(f"    {name:<24} {ms:9.1f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+bench_lstm_pipeline.py
+----------------------
+Memory/time benchmark for the LSTM sequence pipeline.
+
+- legacy: Python loop appending window slices to lists, then np.array (O(N x L))
+- views:  sliding_window_view + streamed batches (O(N) plus one batch)
+
+With --train (and TensorFlow installed) it also times one epoch of the
+SensorAIModel LSTM architecture fed by the tf.data pipeline on CPU only.
+
+Usage:
+    python benchmarks/bench_lstm_pipeline.py --points 1000000 --sequence-length 60
+    python benchmarks/bench_lstm_pipeline.py --points 200000 --train
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# CPU-only TensorFlow for reproducible numbers
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "-1")
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+
+from model.sequences import make_sequences, make_tf_dataset, sequence_batches
+
+
+def legacy_sequences(series, sequence_length):
+    X, y = [], []
+    for i in range(sequence_length, len(series)):
+        X.append(series[i - sequence_length:i])
+        y.append(series[i])
+    return np.array(X), np.array(y)
+
+
+def view_pipeline(series, sequence_length, batch_size):
+    X, y = make_sequences(series, sequence_length)
+    for _ in sequence_batches(series, sequence_length, batch_size=batch_size, shuffle=True):
+        pass
+    return X, y
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": round(elapsed, 4), "peak_mb": round(peak / 1e6, 2)}
+
+
+def train_one_epoch(series, sequence_length, batch_size):
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import LSTM, Dense, Dropout, Input
+
+    model = Sequential([
+        Input(shape=(sequence_length, 1)),
+        LSTM(50, return_sequences=True),
+        Dropout(0.2),
+        LSTM(50, return_sequences=False),
+        Dropout(0.2),
+        Dense(25),
+        Dense(1)
+    ])
+    model.compile(optimizer="adam", loss="mse")
+    dataset = make_tf_dataset(series, sequence_length, batch_size=batch_size, shuffle=True)
+    start = time.perf_counter()
+    model.fit(dataset, epochs=1, verbose=0)
+    return {"seconds": round(time.perf_counter() - start, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--sequence-length", type=int, default=60)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--skip-legacy", action="store_true", help="Skip the O(N x L) baseline")
+    parser.add_argument("--train", action="store_true", help="Also time one CPU epoch (requires TensorFlow)")
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    series = np.random.default_rng(42).normal(size=args.points).astype(np.float32)
+    report = {"points": args.points, "sequence_length": args.sequence_length}
+
+    if not args.skip_legacy:
+        report["legacy"] = measure(legacy_sequences, series, args.sequence_length)
+    report["views"] = measure(view_pipeline, series, args.sequence_length, args.batch_size)
+
+    if args.train:
+        if importlib.util.find_spec("tensorflow") is None:
+            print("TensorFlow is not installed; skipping --train")
+        else:
+            report["train_one_epoch"] = train_one_epoch(series, args.sequence_length, args.batch_size)
+
+    for name, result in report.items():
+        if isinstance(result, dict):
+            print(f"{name:<16} " + "  ".join(f"{key}={value}" for key, value in result.items()))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
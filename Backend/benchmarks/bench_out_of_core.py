@@ -0,0 +1,115 @@
+"""
+bench_out_of_core.py
+--------------------
+Peak memory of the chunked analysis mode (model/out_of_core.py) as the input
+grows, next to the in-memory path the analysis scripts use by default
+(whole CSV parsed into one dataset plus per-sensor feature matrices).
+
+Each run happens in a fresh interpreter and reports its peak RSS and its
+baseline (RSS once the libraries are loaded, before reading data); the
+difference is the working memory. The chunked mode must keep its working
+memory within --memory-limit-mb and its peak flat across the sizes that span
+several chunks (both within --tolerance); the benchmark fails otherwise.
+
+Usage:
+    python benchmarks/bench_out_of_core.py --sizes 10k 100k 1m --memory-limit-mb 64
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCH_DIR), "src")
+sys.path.insert(0, BENCH_DIR)
+
+import synthetic
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+TARGETS = ['tempC', 'hum%', 'co2_ppm', 'ldr_raw']
+
+CHUNKED = """
+import json, sys, time
+from model.out_of_core import OutOfCoreAnalysis
+start = time.perf_counter()
+analysis = OutOfCoreAnalysis(sys.argv[1], {targets!r}, memory_limit_mb=int(sys.argv[2])).run()
+report = analysis.report()
+print(json.dumps({{
+    "seconds": round(time.perf_counter() - start, 2),
+    "baseline_rss_mb": round(report["baseline_rss_mb"], 1),
+    "peak_rss_mb": round(report["peak_rss_mb"], 1),
+    "rows": report["rows"],
+    "chunk_rows": analysis.chunk_rows,
+}}))
+"""
+
+IN_MEMORY = """
+import json, sys, time
+from model.feature_builder import FeatureBuilder
+from model.feature_window import FeatureWindow
+from model.out_of_core import NUMERIC_COLUMNS, peak_rss_mb
+from services.dataset import load_csv_dataset
+baseline = peak_rss_mb()
+start = time.perf_counter()
+data = load_csv_dataset(sys.argv[1]).frame.dropna(subset=['timestamp']).reset_index(drop=True)
+builder = FeatureBuilder(data, NUMERIC_COLUMNS)
+features = [builder.build(FeatureWindow(target, 10, (10,)), NUMERIC_COLUMNS) for target in {targets!r}]
+print(json.dumps({{
+    "seconds": round(time.perf_counter() - start, 2),
+    "baseline_rss_mb": round(baseline, 1),
+    "peak_rss_mb": round(peak_rss_mb(), 1),
+}}))
+"""
+
+
+def run(script, path, memory_limit_mb):
+    result = subprocess.run(
+        [sys.executable, "-c", script.format(targets=TARGETS), path, str(memory_limit_mb)],
+        cwd=SRC_DIR, capture_output=True, text=True, check=True,
+    )
+    result = json.loads(result.stdout.strip().splitlines()[-1])
+    result["working_mb"] = round(result["peak_rss_mb"] - result["baseline_rss_mb"], 1)
+    return result
+
+
+def check_chunked(results, memory_limit_mb, tolerance):
+    """Raise when the chunked mode exceeds the memory limit or its peak grows with the input."""
+    allowed = memory_limit_mb * (1 + tolerance)
+    for name, result in results.items():
+        if result["working_mb"] > allowed:
+            raise RuntimeError(f"{name}: {result['working_mb']} MB of working memory, limit {memory_limit_mb} MB")
+    # Inputs smaller than a couple of chunks never fill one; the rest must peak alike
+    peaks = [result["peak_rss_mb"] for result in results.values() if result["rows"] >= 2 * result["chunk_rows"]]
+    if len(peaks) > 1 and max(peaks) - min(peaks) > memory_limit_mb * tolerance:
+        raise RuntimeError(f"Chunked peak RSS grows with the input: {min(peaks)} to {max(peaks)} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["10k", "100k"], choices=list(SIZES))
+    parser.add_argument("--memory-limit-mb", type=int, default=64)
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed excess, as a fraction of the limit")
+    parser.add_argument("--output", help="optional JSON output path")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'size':>6} {'mode':>10} {'peak RSS MB':>12} {'working MB':>11} {'seconds':>9}")
+    for size in args.sizes:
+        path = synthetic.dataset_path(SIZES[size])
+        for mode, script in (("in_memory", IN_MEMORY), ("chunked", CHUNKED)):
+            result = run(script, path, args.memory_limit_mb)
+            results[f"{mode}_{size}"] = result
+            print(f"{size:>6} {mode:>10} {result['peak_rss_mb']:>12.1f} {result['working_mb']:>11.1f} "
+                  f"{result['seconds']:>9.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    check_chunked({name: result for name, result in results.items() if name.startswith("chunked")},
+                  args.memory_limit_mb, args.tolerance)
+
+
+if __name__ == "__main__":
+    main()
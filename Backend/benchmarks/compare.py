@@ -0,0 +1,57 @@
+"""
+compare.py
+----------
+Compare two bench_data_service.py result files (e.g. two commits).
+
+Prints the median of every measurement side by side and flags entries that
+got slower than the threshold. Exits with status 1 when a regression is found.
+
+Usage:
+    python benchmarks/compare.py benchmarks/results/base.json benchmarks/results/new.json
+    python benchmarks/compare.py base.json new.json --threshold 1.25
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def compare(base, new, threshold):
+    """Yield (size, name, base_median, new_median, ratio, regressed) for shared measurements."""
+    for size, measurements in new["results"].items():
+        base_measurements = base["results"].get(size, {})
+        for name, stats in measurements.items():
+            if name not in base_measurements:
+                continue
+            before = base_measurements[name]["median"]
+            after = stats["median"]
+            ratio = after / before if before else float("inf")
+            yield size, name, before, after, ratio, ratio > threshold
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=1.10, help="Slowdown ratio reported as regression")
+    args = parser.parse_args()
+
+    base, new = load(args.base), load(args.new)
+    print(f"base {base['meta']['commit']}  ->  new {new['meta']['commit']}\n")
+
+    regressions = 0
+    for size, name, before, after, ratio, regressed in compare(base, new, args.threshold):
+        regressions += regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{size:>4}  {name:<40} {before * 1000:10.2f} ms {after * 1000:10.2f} ms  x{ratio:5.2f}{flag}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
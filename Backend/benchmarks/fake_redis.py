@@ -0,0 +1,106 @@
+"""
+fake_redis.py
+-------------
+Minimal Redis-compatible server for benchmarks and local testing of the
+shared cache (CACHE_BACKEND="redis://...") without installing redis-server.
+
+Supports PING, GET, SET (EX/PX/NX), DEL and FLUSHDB — what RedisCache uses:
+
+    with FakeRedis() as server:
+        server.url  # -> redis://127.0.0.1:<port>/0
+
+Run standalone with `python benchmarks/fake_redis.py --port 6379`.
+"""
+
+import argparse
+import socketserver
+import threading
+import time
+
+
+class FakeRedis:
+    def __init__(self, host="127.0.0.1", port=0):
+        data = {}  # key -> (value, expires_at or None)
+        lock = threading.Lock()
+
+        def live(key):
+            entry = data.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.time():
+                del data[key]
+                return None
+            return entry
+
+        def execute(args):
+            command = args[0].upper()
+            if command == b"PING":
+                return b"+PONG\r\n"
+            if command == b"GET":
+                with lock:
+                    entry = live(args[1])
+                if entry is None:
+                    return b"$-1\r\n"
+                return b"$%d\r\n%s\r\n" % (len(entry[0]), entry[0])
+            if command == b"SET":
+                key, value, options = args[1], args[2], [arg.upper() for arg in args[3:]]
+                expires_at = None
+                if b"PX" in options:
+                    expires_at = time.time() + int(options[options.index(b"PX") + 1]) / 1000
+                if b"EX" in options:
+                    expires_at = time.time() + int(options[options.index(b"EX") + 1])
+                with lock:
+                    if b"NX" in options and live(key) is not None:
+                        return b"$-1\r\n"
+                    data[key] = (value, expires_at)
+                return b"+OK\r\n"
+            if command == b"DEL":
+                with lock:
+                    removed = sum(1 for key in args[1:] if data.pop(key, None) is not None)
+                return b":%d\r\n" % removed
+            if command in (b"FLUSHDB", b"SELECT"):
+                if command == b"FLUSHDB":
+                    with lock:
+                        data.clear()
+                return b"+OK\r\n"
+            return b"-ERR unknown command '%s'\r\n" % args[0]
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while True:
+                    line = self.rfile.readline()
+                    if not line.startswith(b"*"):
+                        return
+                    args = []
+                    for _ in range(int(line[1:])):
+                        length = int(self.rfile.readline()[1:])
+                        args.append(self.rfile.read(length + 2)[:-2])
+                    self.wfile.write(execute(args))
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self.server = Server((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+    with FakeRedis(args.host, args.port) as server:
+        print(f"Fake Redis listening on {server.url}")
+        server.thread.join()
@@ -0,0 +1,16 @@
+"""
+load_app.py
+-----------
+WSGI entry point used by load_test.py: the API app, reading its data from the
+sheet stand-in given in ECOMONITOR_BENCH_SHEET_URL instead of DATA_SOURCES.
+"""
+
+import os
+
+# Measure request handling only, without background jobs competing for the CPU
+os.environ.setdefault("ECOMONITOR_SCHEDULER", "0")
+
+from app import app
+from services.sources import registry, SheetSource
+
+registry.set_sources([SheetSource("bench", [os.environ["ECOMONITOR_BENCH_SHEET_URL"]])])
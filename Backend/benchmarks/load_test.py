@@ -0,0 +1,213 @@
+"""
+load_test.py
+------------
+Throughput of the API served by gunicorn (gunicorn.conf.py) for several
+worker counts, on synthetic data served by the sheet stand-in.
+
+For each worker count it starts gunicorn, warms the dataset, then runs
+closed-loop clients (several processes × threads) against a mix of dashboard
+queries for a fixed duration and reports requests/s and latency percentiles.
+With `--cache redis` the workers share parsed snapshots and /data results
+through a local Redis-compatible server (a local redis-server via --redis-url,
+or the built-in fake_redis.py).
+
+Results are written as JSON to benchmarks/results/load_<date>_<commit>.json.
+
+Usage:
+    python benchmarks/load_test.py --workers 1 2 4 --size 100k
+    python benchmarks/load_test.py --workers 1 4 --cache redis --duration 30
+"""
+
+import argparse
+import json
+import os
+import platform
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+sys.path.insert(0, BENCH_DIR)
+
+import synthetic
+from fake_redis import FakeRedis
+from stand_in import SheetStandIn
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+# Dashboard-like queries: one sensor per device over 6 hours of the first day
+# (covered by every size), plus the device and sensor lists
+QUERIES = ["/devices", "/sensors"] + [
+    f"/data?sensor={sensor}&device_id=esp32-{device}"
+    f"&start_date=2025-01-01T{hour:02d}:00:00-06:00&end_date=2025-01-01T{hour + 5:02d}:59:59-06:00"
+    for sensor in ("temperature", "humidity", "co2")
+    for device in (1, 2, 3, 4)
+    for hour in (0, 6, 12, 18)
+]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers, threads, port, env):
+    command = [
+        sys.executable, "-m", "gunicorn", "-c", os.path.join(BACKEND_DIR, "gunicorn.conf.py"),
+        "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--threads", str(threads),
+        "--pythonpath", BENCH_DIR, "load_app:app",
+    ]
+    return subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+def wait_ready(base_url, process, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited: {process.stderr.read().decode(errors='replace')[-2000:]}")
+        try:
+            if requests.get(base_url + "/devices", timeout=timeout).status_code == 200:
+                return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn did not become ready in time")
+
+
+def _client(base_url, threads, duration, offset):
+    """One client process: `threads` closed-loop sessions; returns (latencies, errors, bytes)."""
+
+    def loop(index):
+        session = requests.Session()
+        latencies, errors, received = [], 0, 0
+        position = offset + index
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            url = base_url + QUERIES[position % len(QUERIES)]
+            position += 7  # spread clients over the query mix
+            start = time.perf_counter()
+            try:
+                response = session.get(url, timeout=60)
+                received += len(response.content)
+                if response.status_code != 200:
+                    errors += 1
+            except requests.RequestException:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+        return latencies, errors, received
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(loop, range(threads)))
+    return [l for r in results for l in r[0]], sum(r[1] for r in results), sum(r[2] for r in results)
+
+
+def run_load(base_url, clients, threads, duration):
+    with ProcessPoolExecutor(max_workers=clients) as executor:
+        futures = [executor.submit(_client, base_url, threads, duration, i * threads) for i in range(clients)]
+        results = [future.result() for future in futures]
+
+    latencies = sorted(l for r in results for l in r[0])
+    errors = sum(r[1] for r in results)
+    quantile = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else None
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / duration, 2),
+        "latency_p50": round(quantile(0.50), 6) if latencies else None,
+        "latency_p95": round(quantile(0.95), 6) if latencies else None,
+        "latency_p99": round(quantile(0.99), 6) if latencies else None,
+        "latency_mean": round(statistics.fmean(latencies), 6) if latencies else None,
+        "megabytes": round(sum(r[2] for r in results) / 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=4, help="threads per gunicorn worker")
+    parser.add_argument("--size", default="100k", choices=list(SIZES))
+    parser.add_argument("--cache", default="memory", choices=["memory", "redis"])
+    parser.add_argument("--redis-url", help="use this Redis server instead of the built-in fake")
+    parser.add_argument("--clients", type=int, default=4, help="client processes")
+    parser.add_argument("--client-threads", type=int, default=8, help="concurrent requests per client process")
+    parser.add_argument("--duration", type=float, default=15, help="seconds of load per worker count")
+    parser.add_argument("--output", help="JSON output path (default: benchmarks/results/load_<date>_<commit>.json)")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "size": args.size,
+            "cache": args.cache,
+            "threads": args.threads,
+            "clients": args.clients * args.client_threads,
+            "duration": args.duration,
+        },
+        "results": {},
+    }
+
+    fake = FakeRedis() if args.cache == "redis" and not args.redis_url else None
+    with SheetStandIn(synthetic.dataset_path(SIZES[args.size])) as sheet:
+        if fake:
+            fake.__enter__()
+        try:
+            env = dict(os.environ, ECOMONITOR_BENCH_SHEET_URL=sheet.url)
+            if args.cache == "redis":
+                env["ECOMONITOR_CACHE_BACKEND"] = args.redis_url or fake.url
+
+            print(f"{'workers':>8} {'req/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'errors':>8}")
+            for workers in args.workers:
+                port = free_port()
+                base_url = f"http://127.0.0.1:{port}"
+                process = start_server(workers, args.threads, port, env)
+                try:
+                    wait_ready(base_url, process)
+                    run_load(base_url, args.clients, args.client_threads, min(args.duration, 3))  # warm every worker
+                    result = run_load(base_url, args.clients, args.client_threads, args.duration)
+                finally:
+                    process.send_signal(signal.SIGTERM)
+                    process.wait(timeout=60)
+
+                report["results"][str(workers)] = result
+                print(f"{workers:>8} {result['requests_per_second']:>10.1f} "
+                      f"{(result['latency_p50'] or 0) * 1000:>10.1f} {(result['latency_p95'] or 0) * 1000:>10.1f} "
+                      f"{(result['latency_p99'] or 0) * 1000:>10.1f} {result['errors']:>8}")
+        finally:
+            if fake:
+                fake.__exit__(None, None, None)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"load_{stamp}_{commit}.json")
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
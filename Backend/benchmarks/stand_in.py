@@ -0,0 +1,47 @@
+"""
+stand_in.py
+-----------
+Local HTTP stand-in for the Google Sheets CSV export.
+
+Serves a CSV file from a background thread so sheet fetching can be
+benchmarked without network access:
+
+    with SheetStandIn(path) as server:
+        server.url  # -> http://127.0.0.1:<port>/export?format=csv
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class SheetStandIn:
+    def __init__(self, csv_path, host="127.0.0.1", port=0):
+        with open(csv_path, "rb") as file:
+            body = file.read()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/csv; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # keep benchmark output clean
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/export?format=csv"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,120 @@
+"""
+synthetic.py
+------------
+Synthetic ESP32 sensor data generator.
+
+Produces CSV files with the same header and cell formats as the device
+sheets (ISO timestamps with offset, decimal commas in quoted cells, the
+categorical `quality`/`light` labels), covering every column referenced by
+`SENSORS`. Files are cached under benchmarks/.data/ by size and seed.
+
+Usage:
+    python benchmarks/synthetic.py --rows 100000 --devices 4
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCH_DIR), "src")
+DATA_DIR = os.path.join(BENCH_DIR, ".data")
+sys.path.insert(0, SRC_DIR)
+
+from config.settings import SENSORS
+
+# Column order used by the ESP32 sheets
+HEADERS = [
+    "timestamp", "deviceId", "tempC", "hum%", "mq135_raw", "rs_r0", "co2_ppm",
+    "quality", "ldr_raw", "ldr_v", "ldr_pct", "light",
+]
+assert {cfg["column"] for cfg in SENSORS.values()} <= set(HEADERS), "HEADERS out of sync with SENSORS"
+
+SAMPLE_INTERVAL_S = 35
+START = np.datetime64("2025-01-01T00:00:00")
+UTC_OFFSET = "-06:00"
+QUALITY_LABELS = np.array(["Muy buena", "Buena", "Regular", "Mala"])
+LIGHT_LABELS = np.array(["Oscuro", "Poca luz", "Luz"])
+
+
+def _decimal_comma(values, fmt):
+    """Format floats with a decimal comma, quoted like the sheet export."""
+    text = np.char.mod(fmt, values)
+    return np.char.add(np.char.add('"', np.char.replace(text, ".", ",")), '"')
+
+
+def generate_columns(rows, devices=4, seed=42, first_row=0):
+    """Return a dict of string arrays (one per header) with `rows` readings."""
+    rng = np.random.default_rng(seed)
+    index = np.arange(first_row, first_row + rows)
+    device_index = index % devices
+    step = index // devices
+    local = START + step * np.timedelta64(SAMPLE_INTERVAL_S, "s")
+    hours = (step * SAMPLE_INTERVAL_S / 3600.0) % 24
+    daily = np.sin((hours - 9) / 24 * 2 * np.pi)
+
+    temp = 20 + 6 * daily + device_index + rng.normal(0, 0.4, rows)
+    hum = np.clip(60 - 15 * daily + rng.normal(0, 2, rows), 0, 100)
+    mq135 = np.clip(1400 + 150 * rng.standard_normal(rows), 0, 4095).astype(int)
+    rs_r0 = 3.4 - mq135 / 1000 + rng.normal(0, 0.05, rows)
+    co2 = np.clip(400 + 0.4 * (mq135 - 1400) + rng.normal(0, 20, rows), 0, None).astype(int)
+    ldr_raw = np.clip(2000 + 1900 * daily + rng.normal(0, 100, rows), 0, 4095).astype(int)
+    ldr_pct = (ldr_raw / 4095 * 100).astype(int)
+
+    return {
+        "timestamp": np.char.add(np.datetime_as_string(local, unit="s"), UTC_OFFSET),
+        "deviceId": np.char.add("esp32-", (device_index + 1).astype(str)),
+        "tempC": _decimal_comma(temp, "%.1f"),
+        "hum%": np.round(hum).astype(int).astype(str),
+        "mq135_raw": mq135.astype(str),
+        "rs_r0": _decimal_comma(rs_r0, "%.3f"),
+        "co2_ppm": co2.astype(str),
+        "quality": QUALITY_LABELS[np.clip((co2 - 300) // 200, 0, 3)],
+        "ldr_raw": ldr_raw.astype(str),
+        "ldr_v": _decimal_comma(ldr_raw * 3.3 / 4095, "%.3f"),
+        "ldr_pct": ldr_pct.astype(str),
+        "light": LIGHT_LABELS[np.clip(ldr_pct // 34, 0, 2)],
+    }
+
+
+def dataset_path(rows, devices=4, seed=42):
+    """Generate (once) and return the path of a synthetic CSV file."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"sensors_{rows}_{devices}d_{seed}.csv")
+    if os.path.exists(path):
+        return path
+
+    chunk = 1_000_000
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as file:
+        file.write(",".join(HEADERS) + "\n")
+        for offset in range(0, rows, chunk):
+            # Generate in chunks with a per-chunk seed so memory stays bounded
+            size = min(chunk, rows - offset)
+            columns = generate_columns(size, devices, seed + offset, first_row=offset)
+            lines = [",".join(row) for row in zip(*(columns[h] for h in HEADERS))]
+            file.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_rows(rows, devices=4, seed=42):
+    """Raw CSV rows (header first), as produced by csv.reader on a sheet export."""
+    with open(dataset_path(rows, devices, seed), "r", encoding="utf-8") as file:
+        return list(csv.reader(file))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--devices", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    print(dataset_path(args.rows, args.devices, args.seed))
+
+
+if __name__ == "__main__":
+    main()
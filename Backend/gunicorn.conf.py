@@ -0,0 +1,53 @@
+"""
+gunicorn.conf.py
+----------------
+Production serving configuration (run from the Backend folder):
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Requests are mostly CPU-bound (filtering and JSON serialization hold the GIL),
+so the server scales with processes: one worker per core. A few threads per
+worker overlap the I/O waits (sheet downloads, export file transfers).
+
+Run several workers with a shared cache so each sheet is fetched and parsed
+once for all of them:
+
+    ECOMONITOR_CACHE_BACKEND=redis://127.0.0.1:6379/0 gunicorn -c gunicorn.conf.py app:app
+
+Environment overrides: ECOMONITOR_BIND, WEB_CONCURRENCY (workers),
+ECOMONITOR_THREADS.
+"""
+
+import multiprocessing
+import os
+
+# The application modules live in src/
+chdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+
+bind = os.environ.get("ECOMONITOR_BIND", "0.0.0.0:5001")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = int(os.environ.get("ECOMONITOR_THREADS", 4))
+
+# Cold loads download and parse the whole sheet; allow for slow upstreams
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to bound memory growth; jitter avoids
+# restarting them all at once (their data comes back from the shared cache)
+max_requests = 2000
+max_requests_jitter = 200
+
+# Each worker builds its own app (thread pools and cache connections are not fork-safe)
+preload_app = False
+
+accesslog = os.environ.get("ECOMONITOR_ACCESS_LOG")  # "-" for stdout
+errorlog = "-"
+
+
+def post_worker_init(worker):
+    """Start the background jobs in each worker once its app is loaded (importing the app never starts them)."""
+    from services.scheduler import start_scheduler
+
+    start_scheduler(getattr(worker.wsgi, "logger", None))
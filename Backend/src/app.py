@@ -4,9 +4,13 @@ app.py
 Flask application entry point.
 """
 
+import os
+
 from flask import Flask
 from flask_cors import CORS
 from routes import register_routes
+from services.instrumentation import init_instrumentation
+from services.scheduler import start_scheduler
 from config.settings import FLASK_HOST, FLASK_PORT, DEBUG_MODE
 
 # Initialize Flask app
@@ -14,17 +18,33 @@ app = Flask(__name__)
 # Enable CORS for all routes (allow frontend to call API from browser)
 CORS(app)
 
+# Request latency, per-stage timings and opt-in profiling
+init_instrumentation(app)
+
 # Register all routes
 register_routes(app)
 
 if __name__ == "__main__":
+    # Background jobs (gunicorn starts them in post_worker_init); with the debug
+    # reloader they run in the serving child, not the watcher
+    if not DEBUG_MODE or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_scheduler(app.logger)
+
     print("Starting ECOMONITOR Flask API...")
     print(f"Available at: http://{FLASK_HOST}:{FLASK_PORT}")
     print("\n📋 Endpoints:")
     print("  GET /           - API documentation")
     print("  GET /data       - Sensor data with filters")
     print("  GET /sensors    - List available sensors")
-    print("  GET /devices    - List available devices\n")
+    print("  GET /devices    - List available devices")
+    print("  GET /sources    - Data source health")
+    print("  POST /ingest    - Push sensor rows")
+    print("  GET /analytics/correlation - Cross-sensor correlation")
+    print("  POST /exports   - Start a bulk export (gzip CSV / Parquet)")
+    print("  GET /exports/<id> - Export progress / download")
+    print("  GET /jobs       - Background jobs")
+    print("  POST /jobs/<name> - Run a background job now")
+    print("  GET /metrics    - Prometheus metrics\n")
 
     # Run server
     app.run(debug=DEBUG_MODE, host=FLASK_HOST, port=FLASK_PORT)
\ No newline at end of file
@@ -4,6 +4,8 @@ settings.py
 Centralized configuration and constants for the backend service.
 """
 
+import os
+
 # Google Sheets URLs (optional)
 SHEET_URLS = [
     "https://docs.google.com/spreadsheets/d/1-fddNDMF-WcOc4fhixGO6s-rhJ1II06YArzblGHAXtM/export?format=csv&gid=1670363824",
@@ -14,30 +16,154 @@ SHEET_URLS = [
 # Local CSV file fallback
 CSV_FILE = "backend/data/sensors_data.csv"
 
+# Timezone of the sites. Timestamps are stored in UTC; hour-of-day and
+# day-of-week profiles (rollups, analysis scripts) use local time
+TIMEZONE = "America/Mexico_City"
+
+# Seconds a parsed dataset is reused before the sources are checked again
+DATA_CACHE_TTL = 60
+
+# Data sources merged into one dataset (see services/sources.py). Each source is
+# fetched concurrently on its own refresh interval (seconds); duplicate
+# (deviceId, timestamp) rows are dropped, earlier sources winning. Types:
+#   "sheet":  a site's Google Sheet; `urls` are tried in order, then `fallback_csv`
+#   "csv":    a local CSV file (`path`)
+#   "ingest": rows posted to POST /ingest
+DATA_SOURCES = [
+    {"name": "main", "type": "sheet", "urls": SHEET_URLS, "fallback_csv": CSV_FILE,
+     "refresh_interval": DATA_CACHE_TTL},
+    {"name": "ingest", "type": "ingest"},
+]
+
+# Concurrent source fetches, and seconds a refresh waits for slow sources
+# before serving their previous data
+SOURCE_FETCH_WORKERS = 8
+SOURCE_FETCH_TIMEOUT = 10
+
+# Rows kept by an ingest source, and the folder of the journals where ingested
+# rows are appended (read by every server process on this host; kept across restarts)
+INGEST_BUFFER_MAX_ROWS = 100000
+INGEST_DIR = "ingest"
+# POST /ingest requires this token (env ECOMONITOR_INGEST_TOKEN) in INGEST_TOKEN_HEADER;
+# without one it is refused
+INGEST_TOKEN_HEADER = "X-Ingest-Token"
+INGEST_TOKEN = os.environ.get("ECOMONITOR_INGEST_TOKEN") or None
+
+# Cache shared by the server processes: parsed source snapshots, /data results
+# and export job states. "memory" (one process) or a Redis URL such as
+# "redis://127.0.0.1:6379/0" when running several gunicorn workers.
+CACHE_BACKEND = os.environ.get("ECOMONITOR_CACHE_BACKEND", "memory")
+CACHE_KEY_PREFIX = "ecomonitor:"
+MEMORY_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Seconds a process waits for another one fetching the same source before fetching it itself
+CACHE_LOCK_TTL = 30
+# Seconds a /data or /analytics result is reused, and the largest response body that is cached
+QUERY_CACHE_TTL = DATA_CACHE_TTL
+QUERY_CACHE_MAX_BYTES = 8 * 1024 * 1024
+
+# Delta sync (/data?since=): clients are told when to poll again from the
+# reporting interval of the devices (median gap between their last
+# SYNC_INTERVAL_WINDOW readings), within these bounds in seconds. Devices
+# silent for SYNC_OFFLINE_FACTOR intervals are ignored.
+SYNC_INTERVAL_WINDOW = 200
+SYNC_MIN_POLL_SECONDS = 5
+SYNC_MAX_POLL_SECONDS = 300
+SYNC_OFFLINE_FACTOR = 10
+
+# Cross-sensor analytics (GET /analytics/correlation): series are resampled to
+# a common grid of ANALYTICS_MAX_GRID_POINTS points at most; a correlation needs
+# ANALYTICS_MIN_PERIODS aligned points, and lags go up to ANALYTICS_MAX_LAG steps
+ANALYTICS_MAX_GRID_POINTS = 100000
+ANALYTICS_MAX_SERIES = 32
+ANALYTICS_MIN_PERIODS = 10
+ANALYTICS_MAX_LAG = 360
+
+# Bulk exports (POST /exports): output folder, rows written per chunk,
+# concurrent export jobs and seconds a finished export is kept
+EXPORT_DIR = "exports"
+EXPORT_CHUNK_ROWS = 50000
+EXPORT_WORKERS = 2
+EXPORT_RETENTION = 24 * 3600
+
+# Rollups: /data?resolution=auto serves raw rows for ranges up to ROLLUP_RAW_MAX_DAYS,
+# hourly rollups up to ROLLUP_HOURLY_MAX_DAYS and daily rollups beyond
+ROLLUP_RAW_MAX_DAYS = 2
+ROLLUP_HOURLY_MAX_DAYS = 60
+
+# Background jobs started with the app (env ECOMONITOR_SCHEDULER=0 disables them).
+# Intervals are in seconds (0 disables a job) and vary by ±SCHEDULER_JITTER so
+# server processes do not run them in lockstep. Light jobs run on
+# SCHEDULER_THREADS threads; heavy ones (anomaly scans, retraining) in
+# SCHEDULER_PROCESSES separate processes, away from the request threads.
+# Heavy jobs run in one server process: claimed per run through a shared
+# cache backend, otherwise in the process holding SCHEDULER_LOCK_FILE.
+SCHEDULER_ENABLED = os.environ.get("ECOMONITOR_SCHEDULER", "1") != "0"
+SCHEDULER_THREADS = 2
+SCHEDULER_PROCESSES = 1
+SCHEDULER_JITTER = 0.1
+SCHEDULER_LOCK_FILE = os.path.abspath("scheduler.lock")
+# POST /jobs/<name> (run a job now) requires this token (env ECOMONITOR_JOBS_TOKEN)
+# in JOBS_TOKEN_HEADER; without one it is refused
+JOBS_TOKEN_HEADER = "X-Jobs-Token"
+JOBS_TOKEN = os.environ.get("ECOMONITOR_JOBS_TOKEN") or None
+SCHEDULER_JOBS = {
+    "refresh_sources": {"interval": DATA_CACHE_TTL // 2},
+    "rollups": {"interval": 300},
+    "anomaly_scan": {"interval": 900},
+    "retrain_models": {"interval": 6 * 3600},
+}
+# Anomaly scans: IsolationForest fitted on a sample of the history, scoring the last hours
+ANOMALY_SCAN_HOURS = 24
+ANOMALY_SAMPLE_ROWS = 100000
+ANOMALY_CONTAMINATION = 0.05
+# Retraining: model selection (src/model/model_selection.py) on the most recent rows
+RETRAIN_TARGETS = ["tempC", "hum%", "co2_ppm"]
+RETRAIN_MAX_ROWS = 50000
+# Absolute, so the job processes and later runs share it; keeps the newest MODEL_CACHE_KEEP datasets
+MODEL_CACHE_DIR = os.path.abspath(".model_cache")
+MODEL_CACHE_KEEP = 10
+
 # Flask server settings
 FLASK_HOST = "0.0.0.0"
 FLASK_PORT = 5001
 DEBUG_MODE = True
 
-# Sensors configuration
+# Per-request profiling, off unless a token is set (env ECOMONITOR_PROFILE_TOKEN):
+# requests sent with PROFILE_HEADER ("cprofile" or "pyinstrument") and the token in
+# PROFILE_TOKEN_HEADER are profiled and the report is written to PROFILE_DIR.
+# At most one profile per PROFILE_MIN_INTERVAL seconds per process; only the
+# newest PROFILE_MAX_FILES reports are kept.
+PROFILE_HEADER = "X-Profile"
+PROFILE_TOKEN_HEADER = "X-Profile-Token"
+PROFILE_TOKEN = os.environ.get("ECOMONITOR_PROFILE_TOKEN") or None
+PROFILING_ENABLED = PROFILE_TOKEN is not None
+PROFILE_DIR = "profiles"
+PROFILE_MIN_INTERVAL = 5
+PROFILE_MAX_FILES = 50
+
+# Sensors configuration. `range` is the (min, max) a reading can physically take
+# (None = unbounded); values outside it are cleared when the data is loaded
 SENSORS = {
     'temperature': {
         'column': 'tempC',
         'unit': '°C',
         'description': 'Temperature in Celsius',
-        'type': 'numeric'
+        'type': 'numeric',
+        'range': (-40, 80)
     },
     'humidity': {
         'column': 'hum%',
         'unit': '%',
         'description': 'Relative humidity',
-        'type': 'numeric'
+        'type': 'numeric',
+        'range': (0, 100)
     },
     'co2': {
         'column': 'co2_ppm',
         'unit': 'ppm',
         'description': 'CO2 concentration',
-        'type': 'numeric'
+        'type': 'numeric',
+        'range': (0, 10000)
     },
     'air_quality': {
         'column': 'quality',
@@ -49,19 +175,22 @@ SENSORS = {
         'column': 'ldr_raw',
         'unit': '',
         'description': 'Raw light sensor value',
-        'type': 'numeric'
+        'type': 'numeric',
+        'range': (0, 4095)
     },
     'light_voltage': {
         'column': 'ldr_v',
         'unit': 'V',
         'description': 'Light sensor voltage',
-        'type': 'numeric'
+        'type': 'numeric',
+        'range': (0, 3.3)
     },
     'light_percentage': {
         'column': 'ldr_pct',
         'unit': '%',
         'description': 'Light percentage',
-        'type': 'numeric'
+        'type': 'numeric',
+        'range': (0, 100)
     },
     'light_state': {
         'column': 'light',
@@ -73,12 +202,14 @@ SENSORS = {
         'column': 'mq135_raw',
         'unit': '',
         'description': 'MQ135 raw value',
-        'type': 'numeric'
+        'type': 'numeric',
+        'range': (0, 4095)
     },
     'rs_r0': {
         'column': 'rs_r0',
         'unit': '',
         'description': 'Sensor RS/R0 ratio',
-        'type': 'numeric'
+        'type': 'numeric',
+        'range': (0, None)
     }
 }
\ No newline at end of file
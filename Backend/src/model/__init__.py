@@ -0,0 +1,8 @@
+"""
+__init__.py
+------------
+AI model package initializer.
+Exposes the shared feature window used by the analysis scripts.
+"""
+
+from .feature_window import FeatureWindow
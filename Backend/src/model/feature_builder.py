@@ -0,0 +1,63 @@
+"""
+Constructor de matrices de características por sensor
+Convierte una sola vez las columnas numéricas en un arreglo base compartido y genera,
+para cada sensor objetivo, una matriz independiente sin modificar el DataFrame original.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class TargetFeatures:
+    """Matriz de características y objetivo para un sensor"""
+
+    def __init__(self, target_column, X, y, feature_names, positions, timestamps):
+        self.target_column = target_column
+        self.X = X
+        self.y = y
+        self.feature_names = feature_names
+        self.positions = positions
+        self.timestamps = timestamps
+
+    def __len__(self):
+        return len(self.y)
+
+    def to_frame(self):
+        """Vista como DataFrame (útil para inspección)"""
+        return pd.DataFrame(self.X, columns=self.feature_names, index=self.timestamps)
+
+
+class FeatureBuilder:
+    def __init__(self, data, numeric_columns, timestamp_column='timestamp'):
+        self.columns = list(numeric_columns)
+        # Orden Fortran: cada columna queda contigua y sus vistas no requieren copia
+        self.base = np.asfortranarray(data[self.columns].to_numpy(dtype=float))
+        self.timestamps = pd.DatetimeIndex(data[timestamp_column])
+
+    def column(self, name):
+        """Vista (sin copia) de una columna del arreglo base"""
+        return self.base[:, self.columns.index(name)]
+
+    def build(self, window, exogenous=()):
+        """
+        Genera la matriz de un sensor: columnas externas actuales + características de la ventana.
+        Solo se reserva memoria para la matriz final; el objetivo es una vista del arreglo base.
+        """
+        target = window.target_column
+        exogenous = [col for col in exogenous if col != target]
+        feature_names = list(exogenous) + window.feature_names
+        n_rows = max(len(self.base) - window.size, 0)
+
+        X = np.empty((n_rows, len(feature_names)))
+        for j, col in enumerate(exogenous):
+            X[:, j] = self.column(col)[window.size:]
+        window.transform(self.column(target), self.timestamps, out=X[:, len(exogenous):])
+        y = self.column(target)[window.size:]
+        positions = np.arange(window.size, len(self.base))
+
+        # Descartar solo las filas incompletas de este sensor
+        valid = ~(np.isnan(X).any(axis=1) | np.isnan(y))
+        if not valid.all():
+            X, y, positions = X[valid], y[valid], positions[valid]
+
+        return TargetFeatures(target, X, y, feature_names, positions, self.timestamps[positions])
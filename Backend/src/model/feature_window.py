@@ -0,0 +1,159 @@
+"""
+Ventana de características para series temporales de sensores
+Mantiene lags, estadísticas móviles y características de calendario de forma
+incremental (O(1) por paso) sobre un buffer circular de tamaño fijo.
+La misma definición se usa para entrenamiento (vectorizado) e inferencia (paso a paso).
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Características de calendario disponibles (válidas para Timestamp y DatetimeIndex)
+CALENDAR_FEATURES = {
+    'hour': lambda ts: ts.hour,
+    'minute': lambda ts: ts.minute,
+    'day_of_week': lambda ts: ts.dayofweek,
+    'day_of_year': lambda ts: ts.dayofyear,
+}
+
+# Cada cuántos pasos se recalculan las sumas móviles para evitar deriva numérica
+RESYNC_INTERVAL = 4096
+
+
+class FeatureWindow:
+    def __init__(self, target_column, n_lags=10, windows=(10,), rolling_std=True,
+                 calendar=('hour', 'day_of_week', 'day_of_year')):
+        self.target_column = target_column
+        self.n_lags = n_lags
+        self.windows = tuple(windows)
+        self.rolling_std = rolling_std
+        self.calendar = tuple(calendar)
+        self.size = max((n_lags,) + self.windows)
+        self._lag_offsets = np.arange(1, n_lags + 1)
+        self.reset()
+
+    @property
+    def feature_names(self):
+        """Nombres de las características en el orden en que se generan"""
+        names = [f'{self.target_column}_lag_{i}' for i in range(1, self.n_lags + 1)]
+        for w in self.windows:
+            names.append(f'{self.target_column}_rolling_mean_{w}')
+            if self.rolling_std:
+                names.append(f'{self.target_column}_rolling_std_{w}')
+        return names + list(self.calendar)
+
+    @property
+    def ready(self):
+        """Indica si el buffer tiene historia suficiente para todas las características"""
+        return self.count >= self.size
+
+    def reset(self):
+        """Vacía el buffer y las sumas móviles"""
+        self.buffer = np.zeros(self.size)
+        self.pos = 0
+        self.count = 0
+        self._sums = np.zeros(len(self.windows))
+        self._sq_sums = np.zeros(len(self.windows))
+        # NaN en cada ventana: quedan fuera de las sumas y hacen NaN su media, como en `transform`
+        self._nans = np.zeros(len(self.windows), dtype=int)
+
+    def push(self, value):
+        """Agrega una nueva observación en O(1)"""
+        value = float(value)
+        missing = np.isnan(value)
+        for k, w in enumerate(self.windows):
+            if self.count >= w:
+                old = self.buffer[(self.pos - w) % self.size]
+                if np.isnan(old):
+                    self._nans[k] -= 1
+                else:
+                    self._sums[k] -= old
+                    self._sq_sums[k] -= old * old
+            if missing:
+                self._nans[k] += 1
+            else:
+                self._sums[k] += value
+                self._sq_sums[k] += value * value
+
+        self.buffer[self.pos] = value
+        self.pos = (self.pos + 1) % self.size
+        self.count += 1
+
+        if self.count % RESYNC_INTERVAL == 0:
+            self._resync()
+
+    def extend(self, values):
+        """Agrega varias observaciones en orden"""
+        for value in values:
+            self.push(value)
+
+    def features(self, timestamp=None):
+        """Vector de características para predecir el valor en `timestamp`"""
+        if not self.ready:
+            raise ValueError(
+                f"Se necesitan {self.size} observaciones previas de {self.target_column}, hay {self.count}"
+            )
+
+        out = [self.buffer[(self.pos - self._lag_offsets) % self.size]]
+        for k, w in enumerate(self.windows):
+            mean = self._sums[k] / w if not self._nans[k] else np.nan
+            out.append([mean])
+            if self.rolling_std:
+                var = (self._sq_sums[k] - w * mean * mean) / (w - 1) if w > 1 else 0.0
+                out.append([np.sqrt(max(var, 0.0)) if not np.isnan(var) else np.nan])
+        if self.calendar:
+            ts = pd.Timestamp(timestamp)
+            out.append([CALENDAR_FEATURES[name](ts) for name in self.calendar])
+
+        return np.concatenate(out).astype(float)
+
+    def transform(self, values, timestamps=None, out=None):
+        """
+        Construye la matriz de características de entrenamiento de forma vectorizada.
+        La fila j corresponde a la observación values[self.size + j] y solo usa historia previa.
+        Si se pasa `out`, se escribe en ese arreglo (por ejemplo, un bloque de columnas) sin copias extra.
+        """
+        values = np.asarray(values, dtype=float)
+        n_rows = max(len(values) - self.size, 0)
+        X = np.empty((n_rows, len(self.feature_names))) if out is None else out
+        if n_rows == 0:
+            return X
+
+        # Vista sin copia: la fila j contiene values[j:j + size], la historia de values[j + size]
+        history = sliding_window_view(values[:-1], self.size)
+
+        col = 0
+        for i in range(1, self.n_lags + 1):
+            X[:, col] = history[:, self.size - i]
+            col += 1
+        for w in self.windows:
+            recent = history[:, self.size - w:]
+            X[:, col] = recent.mean(axis=1)
+            col += 1
+            if self.rolling_std:
+                X[:, col] = recent.std(axis=1, ddof=1) if w > 1 else 0.0
+                col += 1
+        if self.calendar:
+            index = pd.DatetimeIndex(timestamps)[self.size:]
+            for name in self.calendar:
+                X[:, col] = np.asarray(CALENDAR_FEATURES[name](index), dtype=float)
+                col += 1
+
+        return X
+
+    def transform_frame(self, series, timestamps=None):
+        """Igual que `transform`, alineado al índice de `series` (NaN en el calentamiento)"""
+        frame = pd.DataFrame(np.nan, index=series.index, columns=self.feature_names)
+        X = self.transform(series.to_numpy(), timestamps)
+        frame.iloc[self.size:] = X
+        return frame
+
+    def _resync(self):
+        """Recalcula las sumas móviles desde el buffer"""
+        for k, w in enumerate(self.windows):
+            recent = self.buffer[(self.pos - np.arange(1, w + 1)) % self.size]
+            finite = recent[~np.isnan(recent)]
+            self._sums[k] = finite.sum()
+            self._sq_sums[k] = np.dot(finite, finite)
+            self._nans[k] = len(recent) - len(finite)
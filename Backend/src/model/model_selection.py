@@ -0,0 +1,285 @@
+"""
+Selección de modelos con validación cruzada temporal
+Busca el mejor regresor de un espacio pequeño de modelos e hiperparámetros:
+
+- Pliegues de ventana creciente (TimeSeriesSplit): cada pliegue entrena con el pasado
+  y evalúa con el tramo siguiente, sin mezclar el futuro en el entrenamiento.
+- Successive halving: todas las configuraciones se evalúan primero en los pliegues
+  más antiguos (los más baratos); solo la mejor fracción (1/eta) pasa a evaluarse en
+  más pliegues, hasta que las sobrevivientes se evalúan en todos.
+- Las evaluaciones (configuración × pliegue) corren en paralelo en procesos; cada
+  proceso abre las matrices del disco con memmap en lugar de recibirlas serializadas.
+- Caché en disco por hash del conjunto de datos (X, y y nombres de características):
+  matrices (.npy) y resultados por pliegue (JSON). Una nueva ejecución sobre los mismos
+  datos solo calcula lo que falta. La caché guarda solo datos, nunca pickles: el modelo
+  final se reentrena en cada ejecución a partir de las matrices. Se conservan los `cache_keep`
+  conjuntos de datos usados más recientemente; los demás se borran.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Directorio de la caché de selección de modelos
+CACHE_DIR = '.model_cache'
+# Conjuntos de datos (hashes) que conserva la caché
+CACHE_KEEP = 10
+
+# Espacio de búsqueda: (modelo, hiperparámetros)
+SEARCH_SPACE = [
+    ('linear_regression', {}),
+    ('ridge', {'alpha': 1.0}),
+    ('ridge', {'alpha': 10.0}),
+    ('random_forest', {'n_estimators': 50, 'max_depth': 12}),
+    ('random_forest', {'n_estimators': 100, 'max_depth': None}),
+    ('random_forest', {'n_estimators': 100, 'max_depth': 16, 'min_samples_leaf': 5}),
+    ('gradient_boosting', {'learning_rate': 0.1, 'max_iter': 100}),
+    ('gradient_boosting', {'learning_rate': 0.05, 'max_iter': 300}),
+]
+
+
+def build_estimator(name, params):
+    """Pipeline de escalado + regresor para una configuración del espacio de búsqueda"""
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    if name == 'linear_regression':
+        from sklearn.linear_model import LinearRegression
+        model = LinearRegression(**params)
+    elif name == 'ridge':
+        from sklearn.linear_model import Ridge
+        model = Ridge(**params)
+    elif name == 'random_forest':
+        from sklearn.ensemble import RandomForestRegressor
+        model = RandomForestRegressor(random_state=42, **params)
+    elif name == 'gradient_boosting':
+        from sklearn.ensemble import HistGradientBoostingRegressor
+        model = HistGradientBoostingRegressor(random_state=42, **params)
+    else:
+        raise ValueError(f"Modelo desconocido: {name}")
+    return Pipeline([('scaler', StandardScaler()), ('model', model)])
+
+
+def config_key(name, params):
+    """Identificador estable de una configuración"""
+    text = json.dumps([name, params], sort_keys=True)
+    return f"{name}-{hashlib.sha1(text.encode('utf-8')).hexdigest()[:10]}"
+
+
+def dataset_hash(X, y, feature_names):
+    """Hash del contenido de la matriz de características, el objetivo y los nombres de columnas"""
+    digest = hashlib.sha1()
+    digest.update(json.dumps(list(feature_names)).encode('utf-8'))
+    for array in (X, y):
+        array = np.ascontiguousarray(array, dtype=float)
+        digest.update(str(array.shape).encode('utf-8'))
+        digest.update(array.data)
+    return digest.hexdigest()[:16]
+
+
+def prune_cache(cache_dir, keep=CACHE_KEEP):
+    """
+    Borra de la caché los conjuntos de datos usados hace más tiempo (por fecha de
+    modificación del directorio), dejando los `keep` más recientes. Solo toca
+    directorios con nombre de hash. Devuelve los hashes borrados.
+    """
+    try:
+        entries = [entry for entry in os.scandir(cache_dir)
+                   if entry.is_dir(follow_symlinks=False) and re.fullmatch(r'[0-9a-f]{16}', entry.name)]
+    except FileNotFoundError:
+        return []
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    removed = []
+    for entry in entries[max(keep, 1):]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+        removed.append(entry.name)
+    return removed
+
+
+def time_series_folds(n_rows, n_splits=5, test_size=None, gap=0):
+    """
+    Pliegues de ventana creciente como (fin_entrenamiento, inicio_prueba, fin_prueba):
+    se entrena con X[:fin_entrenamiento] y se evalúa con X[inicio_prueba:fin_prueba].
+    `gap` filas separan ambos tramos (p. ej. el tamaño de la ventana de lags).
+    """
+    from sklearn.model_selection import TimeSeriesSplit
+
+    splitter = TimeSeriesSplit(n_splits=n_splits, test_size=test_size, gap=gap)
+    return [
+        (int(train[-1]) + 1, int(test[0]), int(test[-1]) + 1)
+        for train, test in splitter.split(np.empty((n_rows, 1)))
+    ]
+
+
+def _evaluate(directory, name, params, fold):
+    """Entrena una configuración en un pliegue (en un proceso aparte) y devuelve su MSE"""
+    from sklearn.metrics import mean_squared_error
+
+    X = np.load(os.path.join(directory, 'X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(directory, 'y.npy'), mmap_mode='r')
+    train_end, test_start, test_end = fold
+    start = time.perf_counter()
+    model = build_estimator(name, params)
+    model.fit(X[:train_end], y[:train_end])
+    mse = mean_squared_error(y[test_start:test_end], model.predict(X[test_start:test_end]))
+    return {'mse': float(mse), 'seconds': round(time.perf_counter() - start, 4)}
+
+
+class ModelSelection:
+    """
+    Búsqueda con successive halving sobre pliegues temporales, con caché en disco.
+    `workers` procesos evalúan las configuraciones (1 = en el proceso actual).
+    La caché queda en la ruta absoluta de `cache_dir` (relativa al directorio actual
+    al crear la búsqueda) con los `cache_keep` conjuntos de datos más recientes.
+    """
+
+    def __init__(self, X, y, feature_names, search_space=SEARCH_SPACE, n_splits=5, gap=0, eta=3,
+                 workers=None, cache_dir=CACHE_DIR, cache_keep=CACHE_KEEP):
+        self.X = X
+        self.y = y
+        self.feature_names = list(feature_names)
+        self.search_space = list(search_space)
+        self.n_splits = n_splits
+        self.gap = gap
+        self.eta = eta
+        self.workers = workers
+        self.hash = dataset_hash(X, y, self.feature_names)
+        # Absoluta: los procesos de evaluación y el modelo final usan la misma ruta aunque cambie el cwd
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.cache_keep = cache_keep
+        self.directory = os.path.join(self.cache_dir, self.hash)
+        self.folds = time_series_folds(len(y), n_splits, gap=gap)
+        self.fold_spec = f"folds{n_splits}-gap{gap}"
+        self.computed = 0
+        self.cached = 0
+
+    # --- Caché -----------------------------------------------------------------------
+
+    def _prepare(self):
+        """
+        Guarda las matrices una sola vez por conjunto de datos (los procesos las abren con memmap)
+        y marca el conjunto como el más reciente antes de podar la caché.
+        """
+        os.makedirs(os.path.join(self.directory, 'results', self.fold_spec), exist_ok=True)
+        os.utime(self.directory)
+        prune_cache(self.cache_dir, self.cache_keep)
+        for name, array in (('X', self.X), ('y', self.y)):
+            path = os.path.join(self.directory, f'{name}.npy')
+            if not os.path.exists(path):
+                temporary = f'{path}.{os.getpid()}.tmp.npy'
+                np.save(temporary, np.ascontiguousarray(array, dtype=float))
+                os.replace(temporary, path)
+        with open(os.path.join(self.directory, 'dataset.json'), 'w', encoding='utf-8') as file:
+            json.dump({'rows': len(self.y), 'feature_names': self.feature_names}, file)
+        with open(os.path.join(self.directory, 'results', self.fold_spec, 'folds.json'), 'w', encoding='utf-8') as file:
+            json.dump(self.folds, file)
+
+    def _result_path(self, key, fold_index):
+        return os.path.join(self.directory, 'results', self.fold_spec, f'{key}_{fold_index}.json')
+
+    def _load_result(self, key, fold_index):
+        try:
+            with open(self._result_path(key, fold_index), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _save_result(self, key, fold_index, result):
+        path = self._result_path(key, fold_index)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(result, file)
+        os.replace(temporary, path)
+
+    # --- Búsqueda --------------------------------------------------------------------
+
+    def _evaluate_all(self, configs, n_folds):
+        """MSE de cada configuración en los primeros `n_folds` pliegues, calculando solo lo que no está en caché"""
+        scores = {config_key(*config): {} for config in configs}
+        pending = []
+        for name, params in configs:
+            key = config_key(name, params)
+            for index in range(n_folds):
+                result = self._load_result(key, index)
+                if result is not None:
+                    scores[key][index] = result
+                    self.cached += 1
+                else:
+                    pending.append((key, name, params, index))
+
+        if pending:
+            if self.workers == 1 or len(pending) == 1:
+                results = [_evaluate(self.directory, name, params, self.folds[index])
+                           for _, name, params, index in pending]
+            else:
+                with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                    futures = [executor.submit(_evaluate, self.directory, name, params, self.folds[index])
+                               for _, name, params, index in pending]
+                    results = [future.result() for future in futures]
+            for (key, _, _, index), result in zip(pending, results):
+                self._save_result(key, index, result)
+                scores[key][index] = result
+                self.computed += 1
+        return scores
+
+    def run(self):
+        """
+        Ejecuta el successive halving y reentrena la mejor configuración con todos los datos.
+        Devuelve un dict con la mejor configuración, la tabla de resultados y el modelo.
+        """
+        self._prepare()
+        survivors = self.search_space
+        n_folds = 1
+        rungs = []
+        while True:
+            scores = self._evaluate_all(survivors, n_folds)
+            ranking = sorted(
+                survivors,
+                key=lambda config: np.mean([r['mse'] for r in scores[config_key(*config)].values()])
+            )
+            rungs.append({
+                'folds': n_folds,
+                'results': [
+                    {
+                        'model': name,
+                        'params': params,
+                        'mse': float(np.mean([r['mse'] for r in scores[config_key(name, params)].values()])),
+                        'fit_seconds': round(sum(r['seconds'] for r in scores[config_key(name, params)].values()), 4),
+                    }
+                    for name, params in ranking
+                ],
+            })
+            if n_folds >= len(self.folds):
+                break
+            # Solo la mejor fracción pasa a la siguiente ronda, con más pliegues
+            survivors = ranking[:max(1, math.ceil(len(ranking) / self.eta))]
+            n_folds = min(len(self.folds), n_folds * self.eta)
+
+        best = rungs[-1]['results'][0]
+        return {
+            'dataset_hash': self.hash,
+            'best': best,
+            'rungs': rungs,
+            'evaluations': {'computed': self.computed, 'cached': self.cached},
+            'model': self._final_model(best['model'], best['params']),
+        }
+
+    def _final_model(self, name, params):
+        """
+        Mejor configuración reentrenada con todos los datos. No se guarda en la caché:
+        cargar un pickle del directorio ejecutaría lo que alguien haya dejado ahí, y el
+        reentrenamiento (un solo ajuste, con semilla fija) es barato frente a la búsqueda.
+        """
+        return build_estimator(name, params).fit(self.X, self.y)
+
+
+def select_model(X, y, feature_names, **options):
+    """Atajo: ModelSelection(X, y, feature_names, **options).run()"""
+    return ModelSelection(X, y, feature_names, **options).run()
@@ -0,0 +1,491 @@
+"""
+Modo por bloques (out-of-core) para los scripts de análisis
+Procesa historiales que no caben en memoria: el CSV se lee en bloques de filas y
+cada bloque se parsea con la misma capa de datos de la API (SensorDataset), se
+usa y se descarta. La memoria máxima depende del tamaño de bloque, no del archivo.
+
+Dos pasadas sobre el archivo:
+1. Estadísticas por columna y por hora (combinadas entre bloques), escalado de las
+   características y una muestra uniforme (reservorio) de filas para entrenar
+   IsolationForest, que no admite entrenamiento incremental.
+2. Entrenamiento incremental (`partial_fit`) de un regresor por sensor sobre el
+   primer 80% de las filas, evaluación en el 20% final (sin mezclar el futuro en el
+   entrenamiento) y puntuación de anomalías de todas las filas.
+
+Los lags y estadísticas móviles cruzan los límites de bloque: se conserva la cola
+del bloque anterior. Se asume que el CSV está en orden de llegada (como la hoja);
+el orden y los duplicados se corrigen solo dentro de cada bloque.
+
+El tamaño de bloque se calcula a partir de un techo de memoria (`memory_limit_mb`),
+midiendo con tracemalloc el costo por fila de procesar un bloque de muestra. El techo
+es la memoria de trabajo por encima de la línea base del proceso (intérprete y
+librerías cargadas, unos 160 MB con sklearn), que no depende del archivo; `report()`
+incluye ambas medidas (RSS) para comprobarlo.
+"""
+
+import csv
+import itertools
+import os
+import resource
+import sys
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# Permitir importar el paquete `model` al ejecutar este archivo como script
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from model.feature_builder import FeatureBuilder
+from model.feature_window import FeatureWindow
+from services.dataset import SensorDataset, to_local_time
+
+# Columnas numéricas de los sensores
+NUMERIC_COLUMNS = ['tempC', 'hum%', 'mq135_raw', 'rs_r0', 'co2_ppm', 'ldr_raw', 'ldr_v', 'ldr_pct']
+
+# Techo de memoria por defecto para el procesamiento de un bloque (MB)
+DEFAULT_MEMORY_LIMIT_MB = 256
+
+# Filas del bloque de muestra usado para medir el costo por fila
+CALIBRATION_ROWS = 2000
+MIN_CHUNK_ROWS = 1000
+# Margen sobre el costo medido: la memoria residente de un bloque ronda el doble de lo que
+# registra tracemalloc (fragmentación del asignador), más temporales de sklearn
+MEMORY_SAFETY_FACTOR = 3.0
+
+# Filas de la muestra de entrenamiento de IsolationForest
+ANOMALY_SAMPLE_ROWS = 100000
+
+# Fracción final de las filas reservada para evaluar los regresores
+TEST_FRACTION = 0.2
+
+
+def peak_rss_mb():
+    """Memoria residente máxima del proceso hasta ahora (MB)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024  # bytes en macOS, KB en Linux
+
+
+def iter_csv_chunks(path, chunk_rows, skip_rows=0):
+    """Genera bloques de filas crudas (cabecera incluida en cada uno) sin leer el archivo completo"""
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header is None:
+            return
+        for _ in itertools.islice(reader, skip_rows):
+            pass
+        while True:
+            body = list(itertools.islice(reader, chunk_rows))
+            if not body:
+                return
+            yield [header] + body
+
+
+class RunningStats:
+    """Conteo, media, varianza, mínimo y máximo por columna, combinables entre bloques (Chan et al.)"""
+
+    def __init__(self, n_columns):
+        self.count = np.zeros(n_columns)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+        self.min = np.full(n_columns, np.inf)
+        self.max = np.full(n_columns, -np.inf)
+
+    def update(self, values):
+        """Agrega las filas de `values` (filas × columnas, NaN = faltante)"""
+        present = ~np.isnan(values)
+        count = present.sum(axis=0).astype(float)
+        if not count.any():
+            return
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, np.nansum(values, axis=0) / np.maximum(count, 1), 0.0)
+            m2 = np.nansum((values - mean) ** 2, axis=0)
+            total = self.count + count
+            delta = mean - self.mean
+            self.mean = np.where(total > 0, self.mean + delta * count / np.maximum(total, 1), 0.0)
+            self.m2 = self.m2 + m2 + delta ** 2 * self.count * count / np.maximum(total, 1)
+        self.count = total
+        self.min = np.fmin(self.min, np.nanmin(np.where(present, values, np.inf), axis=0))
+        self.max = np.fmax(self.max, np.nanmax(np.where(present, values, -np.inf), axis=0))
+
+    @property
+    def std(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 1, np.sqrt(self.m2 / (self.count - 1)), np.nan)
+
+    def to_frame(self, columns):
+        return pd.DataFrame({
+            'count': self.count.astype(np.int64),
+            'mean': np.where(self.count > 0, self.mean, np.nan),
+            'std': self.std,
+            'min': np.where(self.count > 0, self.min, np.nan),
+            'max': np.where(self.count > 0, self.max, np.nan),
+        }, index=columns)
+
+
+class HourlyProfile:
+    """Media por hora local del día (TIMEZONE) de cada columna, acumulada con sumas y conteos por hora"""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.sums = np.zeros((24, len(self.columns)))
+        self.counts = np.zeros((24, len(self.columns)))
+
+    def update(self, hours, values):
+        present = ~np.isnan(values)
+        for j in range(len(self.columns)):
+            self.sums[:, j] += np.bincount(hours, np.where(present[:, j], values[:, j], 0.0), minlength=24)
+            self.counts[:, j] += np.bincount(hours, present[:, j], minlength=24)
+
+    def to_frame(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = self.sums / self.counts
+        profile = pd.DataFrame(means, columns=self.columns, index=pd.Index(range(24), name='hour'))
+        return profile.dropna(how='all')
+
+
+class Reservoir:
+    """Muestra uniforme de tamaño fijo de un flujo de filas (algoritmo R, vectorizado por bloque)"""
+
+    def __init__(self, size, n_columns, seed=42):
+        self.size = size
+        self.rows = np.empty((size, n_columns))
+        self.seen = 0
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        n = len(values)
+        fill = min(max(self.size - self.seen, 0), n)
+        if fill:
+            self.rows[self.seen:self.seen + fill] = values[:fill]
+        if fill < n:
+            # La fila i del flujo reemplaza una posición al azar con probabilidad size / (i + 1)
+            positions = self.rng.integers(0, self.seen + np.arange(fill, n) + 1)
+            replace = positions < self.size
+            # Si varias filas eligen la misma posición gana la última, como en el algoritmo secuencial
+            self.rows[positions[replace]] = values[fill:][replace]
+        self.seen += n
+
+    @property
+    def sample(self):
+        return self.rows[:min(self.seen, self.size)]
+
+
+def default_regressor():
+    from sklearn.linear_model import SGDRegressor
+    return SGDRegressor(random_state=42)
+
+
+class OutOfCoreAnalysis:
+    """
+    Análisis por bloques con memoria acotada: estadísticas, regresores incrementales por
+    sensor y detección de anomalías con IsolationForest entrenado sobre una muestra.
+    `regressor` crea un estimador con `partial_fit` (por defecto SGDRegressor).
+    """
+
+    def __init__(self, csv_file, targets, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, window_size=10,
+                 anomaly_columns=NUMERIC_COLUMNS, contamination=0.05, anomaly_sample_rows=ANOMALY_SAMPLE_ROWS,
+                 regressor=default_regressor, chunk_rows=None):
+        self.csv_file = csv_file
+        self.targets = list(targets)
+        self.memory_limit_mb = memory_limit_mb
+        self.anomaly_columns = list(anomaly_columns)
+        self.contamination = contamination
+        self.anomaly_sample_rows = anomaly_sample_rows
+        self.regressor = regressor
+        self.chunk_rows = chunk_rows
+        self.windows = {
+            target: FeatureWindow(target, n_lags=window_size, windows=(window_size,)) for target in self.targets
+        }
+        self.history = max(window.size for window in self.windows.values())
+
+        self.stats = RunningStats(len(NUMERIC_COLUMNS))
+        self.hourly = HourlyProfile(NUMERIC_COLUMNS)
+        self.quality = {}
+        self.rows = 0
+        self.chunks = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.scalers = {}
+        self.feature_names = {}
+        self.feature_rows = {}
+        self.models = {}
+        self.anomaly_detector = None
+        self.anomalies = 0
+        self.scored_rows = 0
+        self.baseline_rss_mb = None
+        self._pass = None
+
+    # --- Bloques -----------------------------------------------------------------
+
+    def _frames(self):
+        """Bloques del CSV como DataFrames con las columnas numéricas y el timestamp (filas con fecha válida)"""
+        for rows in iter_csv_chunks(self.csv_file, self.chunk_rows):
+            dataset = SensorDataset.from_rows(rows, source=self.csv_file)
+            self._merge_quality(dataset.quality)
+            frame = dataset.frame
+            columns = [col for col in ['timestamp', 'deviceId'] + NUMERIC_COLUMNS if col in frame.columns]
+            frame = frame[columns].dropna(subset=['timestamp'])
+            for col in NUMERIC_COLUMNS:
+                if col not in frame.columns:
+                    frame[col] = np.nan
+            yield frame
+
+    def _merge_quality(self, report):
+        """Suma los reportes de calidad de los bloques (solo en la primera pasada)"""
+        if self._pass != 1 or not report:
+            return
+        for key, value in report.items():
+            if isinstance(value, dict):
+                totals = self.quality.setdefault(key, {})
+                for reason, count in value.items():
+                    if isinstance(count, dict):
+                        count = sum(count.values())
+                    totals[reason] = totals.get(reason, 0) + count
+            else:
+                self.quality[key] = self.quality.get(key, 0) + value
+
+    def _features(self, frame, tail):
+        """
+        Matrices de características de cada sensor para las filas del bloque, usando la
+        cola del bloque anterior como historia. Devuelve ({sensor: TargetFeatures}, nueva cola).
+        """
+        data = pd.concat([tail, frame], ignore_index=True) if tail is not None else frame.reset_index(drop=True)
+        offset = len(data) - len(frame)
+        builder = FeatureBuilder(data, NUMERIC_COLUMNS)
+        features = {}
+        for target, window in self.windows.items():
+            target_features = builder.build(window, exogenous=NUMERIC_COLUMNS)
+            # Filas de la cola ya producidas en el bloque anterior
+            keep = target_features.positions >= offset
+            if not keep.all():
+                target_features.X = target_features.X[keep]
+                target_features.y = target_features.y[keep]
+                target_features.positions = target_features.positions[keep]
+                target_features.timestamps = target_features.timestamps[keep]
+            features[target] = target_features
+        return features, data.iloc[-self.history:][['timestamp'] + NUMERIC_COLUMNS]
+
+    # --- Techo de memoria ---------------------------------------------------------
+
+    def calibrate(self):
+        """
+        Calcula el tamaño de bloque que respeta el techo de memoria midiendo un bloque de muestra.
+        Del techo se descuentan la muestra de IsolationForest y su copia sin faltantes, que
+        viven durante toda la pasada.
+        """
+        from sklearn.ensemble import IsolationForest
+        from sklearn.linear_model import SGDRegressor  # noqa: F401 (carga del regresor, parte de la línea base)
+        from sklearn.preprocessing import StandardScaler
+
+        if self.baseline_rss_mb is None:
+            self.baseline_rss_mb = peak_rss_mb()
+        if self.chunk_rows:
+            return self.chunk_rows
+
+        # Se mide todo el recorrido de un bloque: filas crudas, parseo, características,
+        # escalado y puntuación de anomalías (predict de IsolationForest reserva memoria por fila)
+        tracemalloc.start()
+        try:
+            sample = next(iter_csv_chunks(self.csv_file, CALIBRATION_ROWS), None)
+            if sample is None:
+                self.chunk_rows = MIN_CHUNK_ROWS
+                return self.chunk_rows
+            frame = SensorDataset.from_rows(sample, source=self.csv_file).frame
+            frame = frame[[col for col in ['timestamp'] + NUMERIC_COLUMNS if col in frame.columns]]
+            for col in NUMERIC_COLUMNS:
+                if col not in frame.columns:
+                    frame[col] = np.nan
+            features, _ = self._features(frame.dropna(subset=['timestamp']), None)
+            for target_features in features.values():
+                if len(target_features):
+                    StandardScaler().fit_transform(target_features.X)
+            values = frame[self.anomaly_columns].to_numpy(dtype=float)
+            values = np.where(np.isnan(values), 0.0, values)
+            if len(values):
+                IsolationForest(n_estimators=10, random_state=42).fit(values).predict(values)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        per_row = peak / max(len(sample) - 1, 1) * MEMORY_SAFETY_FACTOR
+        # La muestra de IsolationForest (y su copia al entrenar) se reserva aparte del presupuesto de cada bloque
+        reserved = 2 * self.anomaly_sample_rows * len(self.anomaly_columns) * 8
+        budget = self.memory_limit_mb * 1024 * 1024 - reserved
+        self.chunk_rows = max(MIN_CHUNK_ROWS, int(budget / per_row))
+        return self.chunk_rows
+
+    # --- Pasadas ------------------------------------------------------------------
+
+    def scan(self):
+        """Primera pasada: estadísticas, escalado de características y muestra para IsolationForest"""
+        from sklearn.ensemble import IsolationForest
+        from sklearn.preprocessing import StandardScaler
+
+        self._pass = 1
+        anomaly_index = [NUMERIC_COLUMNS.index(col) for col in self.anomaly_columns]
+        reservoir = Reservoir(self.anomaly_sample_rows, len(anomaly_index))
+        self.scalers = {target: StandardScaler() for target in self.targets}
+        self.feature_rows = {target: 0 for target in self.targets}
+
+        tail = None
+        for frame in self._frames():
+            if frame.empty:
+                continue
+            self.chunks += 1
+            self.rows += len(frame)
+            values = frame[NUMERIC_COLUMNS].to_numpy(dtype=float)
+            self.stats.update(values)
+            self.hourly.update(to_local_time(frame['timestamp']).hour.to_numpy(), values)
+            reservoir.update(values[:, anomaly_index])
+            if self.first_timestamp is None:
+                self.first_timestamp = frame['timestamp'].iloc[0]
+            self.last_timestamp = frame['timestamp'].iloc[-1]
+
+            features, tail = self._features(frame, tail)
+            for target, target_features in features.items():
+                if len(target_features):
+                    self.scalers[target].partial_fit(target_features.X)
+                    self.feature_rows[target] += len(target_features)
+                    self.feature_names[target] = target_features.feature_names
+
+        # Faltantes con la media global, como en el modo en memoria
+        sample = reservoir.sample
+        if len(sample):
+            means = self.stats.mean[anomaly_index]
+            sample = np.where(np.isnan(sample), means, sample)
+            self.anomaly_detector = IsolationForest(contamination=self.contamination, random_state=42)
+            self.anomaly_detector.fit(sample)
+        return self
+
+    def train(self, anomalies_path=None):
+        """
+        Segunda pasada: entrenamiento incremental de los regresores, evaluación en el
+        tramo final y puntuación de anomalías (escritas en `anomalies_path` si se indica).
+        """
+        from sklearn.metrics import mean_squared_error
+
+        self._pass = 2
+        anomaly_index = [NUMERIC_COLUMNS.index(col) for col in self.anomaly_columns]
+        means = self.stats.mean[anomaly_index]
+        split = {target: int(rows * (1 - TEST_FRACTION)) for target, rows in self.feature_rows.items()}
+        seen = {target: 0 for target in self.targets}
+        errors = {target: [0.0, 0] for target in self.targets}
+        models = {target: self.regressor() for target in self.targets}
+        # Objetivo estandarizado con las estadísticas de la primera pasada: el descenso por
+        # gradiente converge igual para sensores en °C que para lecturas crudas en miles
+        target_scale = {}
+        for target in self.targets:
+            index = NUMERIC_COLUMNS.index(target)
+            std = self.stats.std[index]
+            target_scale[target] = (self.stats.mean[index], std if std > 0 else 1.0)
+        fitted = set()
+        self.anomalies = self.scored_rows = 0
+        anomaly_file = open(anomalies_path, 'w', encoding='utf-8', newline='') if anomalies_path else None
+
+        try:
+            tail = None
+            for frame in self._frames():
+                if frame.empty:
+                    continue
+                features, tail = self._features(frame, tail)
+                for target, target_features in features.items():
+                    n = len(target_features)
+                    if not n:
+                        continue
+                    X = self.scalers[target].transform(target_features.X)
+                    mean, std = target_scale[target]
+                    # Filas de entrenamiento: las anteriores al corte temporal
+                    cut = min(max(split[target] - seen[target], 0), n)
+                    if cut:
+                        models[target].partial_fit(X[:cut], (target_features.y[:cut] - mean) / std)
+                        fitted.add(target)
+                    if cut < n and target in fitted:
+                        predicted = models[target].predict(X[cut:]) * std + mean
+                        errors[target][0] += mean_squared_error(target_features.y[cut:], predicted) * (n - cut)
+                        errors[target][1] += n - cut
+                    seen[target] += n
+
+                if self.anomaly_detector is not None:
+                    values = frame[self.anomaly_columns].to_numpy(dtype=float)
+                    values = np.where(np.isnan(values), means, values)
+                    is_anomaly = self.anomaly_detector.predict(values) == -1
+                    self.anomalies += int(is_anomaly.sum())
+                    self.scored_rows += len(values)
+                    if anomaly_file is not None and is_anomaly.any():
+                        rows = frame[is_anomaly].assign(
+                            anomaly_score=self.anomaly_detector.decision_function(values[is_anomaly])
+                        )
+                        rows.to_csv(anomaly_file, header=anomaly_file.tell() == 0, index=False)
+        finally:
+            if anomaly_file is not None:
+                anomaly_file.close()
+
+        self.models = {
+            target: {
+                'model': models[target],
+                'scaler': self.scalers[target],
+                'target_scale': target_scale[target],
+                'feature_columns': self.feature_names[target],
+                'train_rows': min(split[target], seen[target]),
+                'test_mse': {'sgd': errors[target][0] / errors[target][1] if errors[target][1] else None},
+            }
+            for target in self.targets if target in fitted
+        }
+        return self
+
+    def run(self, anomalies_path=None):
+        self.calibrate()
+        return self.scan().train(anomalies_path)
+
+    # --- Resultados ---------------------------------------------------------------
+
+    def report(self):
+        return {
+            'rows': self.rows,
+            'chunks': self.chunks,
+            'chunk_rows': self.chunk_rows,
+            'memory_limit_mb': self.memory_limit_mb,
+            'baseline_rss_mb': self.baseline_rss_mb,
+            'peak_rss_mb': peak_rss_mb(),
+            'date_range': [str(self.first_timestamp), str(self.last_timestamp)],
+            'quality': self.quality,
+            'statistics': self.stats.to_frame(NUMERIC_COLUMNS),
+            'hourly_profile': self.hourly.to_frame(),
+            'anomalies': {
+                'count': self.anomalies,
+                'percentage': self.anomalies / self.scored_rows * 100 if self.scored_rows else 0.0,
+                'sample_rows': min(self.rows, self.anomaly_sample_rows),
+            },
+            'models': {target: info['test_mse'] for target, info in self.models.items()},
+        }
+
+
+def run_chunked_analysis(csv_file, targets, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, anomalies_path=None,
+                         **options):
+    """Ejecuta el análisis por bloques e imprime el resumen (modo --chunked de los scripts)"""
+    print(f"🔄 Análisis por bloques de {csv_file} (techo de memoria: {memory_limit_mb} MB)...")
+    analysis = OutOfCoreAnalysis(csv_file, targets, memory_limit_mb=memory_limit_mb, **options)
+    print(f"📦 Bloques de {analysis.calibrate()} filas")
+    analysis.run(anomalies_path)
+    report = analysis.report()
+
+    print(f"✅ Datos procesados: {report['rows']} registros en {report['chunks']} bloques")
+    print(f"📅 Rango: {report['date_range'][0]} a {report['date_range'][1]}")
+    print("📊 Estadísticas por sensor:")
+    print(report['statistics'].loc[targets].round(2))
+    anomalies = report['anomalies']
+    print(f"🚨 Anomalías detectadas: {anomalies['count']} ({anomalies['percentage']:.2f}%), "
+          f"modelo entrenado con {anomalies['sample_rows']} filas de muestra")
+    if anomalies_path:
+        print(f"   - Filas anómalas guardadas en {anomalies_path}")
+    print("🤖 Regresores incrementales (MSE en el 20% final):")
+    for target, mse in report['models'].items():
+        value = mse['sgd']
+        print(f"   - {target}: {'sin datos de prueba' if value is None else f'{value:.4f}'}")
+    print(f"💾 Memoria: pico de {report['peak_rss_mb']:.0f} MB, {report['peak_rss_mb'] - report['baseline_rss_mb']:.0f} MB "
+          f"sobre la línea base de {report['baseline_rss_mb']:.0f} MB (techo: {memory_limit_mb} MB)")
+    return analysis
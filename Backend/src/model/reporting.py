@@ -0,0 +1,235 @@
+"""
+Generación de reportes en modo headless
+Renderiza los reportes por sensor (y por dispositivo) en procesos paralelos con un
+backend no interactivo y escribe artefactos PNG/JSON en un directorio de salida.
+Los cálculos compartidos entre sensores (matriz de correlación, promedios por hora)
+se hacen una sola vez por dispositivo en el proceso principal.
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from services.dataset import to_local_time
+
+# Columnas usadas en la matriz de correlación
+CORRELATION_COLUMNS = ['tempC', 'hum%', 'co2_ppm', 'ldr_raw', 'ldr_v']
+
+# Resolución por defecto de los PNG en modo batch
+REPORT_DPI = 150
+
+# Máximo de puntos dibujados por serie (la serie completa se usa para las estadísticas)
+MAX_PLOT_POINTS = 5000
+
+
+def compute_shared_statistics(data, sensors, device_column='deviceId', rollups=None):
+    """
+    Calcula una vez por dispositivo la correlación y los promedios por hora de todos los sensores.
+    Con `rollups` (RollupStore de la capa de datos) los promedios por hora salen de los
+    agregados horarios en lugar de recorrer todas las filas.
+    """
+    correlation_columns = [col for col in CORRELATION_COLUMNS if col in data.columns]
+    groups = data.groupby(device_column, sort=True) if device_column in data.columns else [(None, data)]
+
+    shared = {}
+    for device, frame in groups:
+        if rollups is not None:
+            hourly = pd.DataFrame({sensor: rollups.profile(sensor, 'hour', device)['mean'] for sensor in sensors})
+        else:
+            hourly = frame.groupby(to_local_time(frame['timestamp']).hour)[list(sensors)].mean()
+        shared[device] = {
+            'correlation': frame[correlation_columns].corr(),
+            'hourly': hourly,
+        }
+    return shared
+
+
+def build_report_jobs(data, sensors, output_dir, anomalies=None, predictions=None, metrics=None,
+                      fourth_panel='correlation', prefix='sensor_ai_analysis', dpi=REPORT_DPI,
+                      device_column='deviceId', rollups=None):
+    """Prepara un trabajo autocontenido (solo arreglos y dicts) por dispositivo y sensor"""
+    predictions = predictions or {}
+    metrics = metrics or {}
+    shared = compute_shared_statistics(data, sensors, device_column, rollups)
+    anomaly_mask = np.zeros(len(data), dtype=bool)
+    if anomalies is not None and not anomalies.empty:
+        anomaly_mask = data.index.isin(anomalies.index)
+
+    all_timestamps = _naive_timestamps(data['timestamp'])
+    multiple_devices = len(shared) > 1
+    jobs = []
+    for device, stats in shared.items():
+        if device is None:
+            rows = np.ones(len(data), dtype=bool)
+        else:
+            rows = (data[device_column] == device).to_numpy()
+        timestamps = all_timestamps[rows]
+
+        for sensor in sensors:
+            name = f'{prefix}_{device}_{sensor}' if multiple_devices else f'{prefix}_{sensor}'
+            prediction = predictions.get(sensor)
+            jobs.append({
+                'sensor': sensor,
+                'device': device,
+                'path': os.path.join(output_dir, name),
+                'timestamps': timestamps,
+                'values': data[sensor].to_numpy(dtype=float)[rows],
+                'anomalies': anomaly_mask[rows],
+                'prediction_timestamps': None if prediction is None else _naive_timestamps(prediction['timestamp']),
+                'prediction_values': None if prediction is None else prediction[f'{sensor}_predicted'].to_numpy(),
+                'correlation': stats['correlation'],
+                'hourly': stats['hourly'][sensor],
+                'metrics': metrics.get(sensor, {}),
+                'fourth_panel': fourth_panel,
+                'dpi': dpi,
+            })
+    return jobs
+
+
+def render_reports(data, sensors, output_dir, workers=None, **kwargs):
+    """
+    Renderiza los reportes en paralelo y devuelve las rutas de los artefactos generados.
+    Con workers=1 se renderiza en el proceso actual.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = build_report_jobs(data, sensors, output_dir, **kwargs)
+
+    if workers == 1 or len(jobs) <= 1:
+        results = [render_report(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(render_report, jobs))
+
+    return [path for paths in results for path in paths]
+
+
+def render_report(job):
+    """Dibuja el reporte de cuatro paneles de un sensor y escribe su PNG y JSON"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    sensor = job['sensor']
+    timestamps, values, anomalies = job['timestamps'], job['values'], job['anomalies']
+    plot_timestamps, plot_values = _downsample(timestamps, values)
+
+    fig, axes = plt.subplots(2, 2, figsize=(15, 10))
+    title = f'Análisis de IA para {sensor}'
+    if job['device'] is not None:
+        title += f' ({job["device"]})'
+    fig.suptitle(title, fontsize=16)
+
+    # 1. Serie temporal con anomalías
+    axes[0, 0].plot(plot_timestamps, plot_values, alpha=0.7, linewidth=1, label='Datos normales')
+    if anomalies.any():
+        axes[0, 0].scatter(timestamps[anomalies], values[anomalies],
+                           color='red', alpha=0.7, label='Anomalías', s=20)
+    axes[0, 0].set_title('Serie Temporal con Anomalías')
+    axes[0, 0].set_ylabel(sensor)
+    axes[0, 0].legend()
+    axes[0, 0].tick_params(axis='x', rotation=45)
+
+    # 2. Distribución de valores
+    finite = values[np.isfinite(values)]
+    axes[0, 1].hist(finite, bins=50, alpha=0.7, edgecolor='black')
+    axes[0, 1].set_title('Distribución de Valores')
+    axes[0, 1].set_xlabel(sensor)
+    axes[0, 1].set_ylabel('Frecuencia')
+
+    # 3. Predicciones futuras
+    if job['prediction_values'] is not None:
+        axes[1, 0].plot(plot_timestamps, plot_values, alpha=0.7, label='Datos históricos')
+        axes[1, 0].plot(job['prediction_timestamps'], job['prediction_values'],
+                        color='red', alpha=0.8, label='Predicciones')
+        axes[1, 0].legend()
+        axes[1, 0].tick_params(axis='x', rotation=45)
+    else:
+        axes[1, 0].text(0.5, 0.5, 'No hay predicciones disponibles',
+                        ha='center', va='center', transform=axes[1, 0].transAxes)
+    axes[1, 0].set_title('Predicciones Futuras')
+    axes[1, 0].set_ylabel(sensor)
+
+    # 4. Correlaciones (calculadas una vez por dispositivo) o patrón por hora
+    if job['fourth_panel'] == 'hourly':
+        hourly = job['hourly']
+        axes[1, 1].plot(hourly.index, hourly.values, marker='o')
+        axes[1, 1].set_title('Patrón Promedio por Hora')
+        axes[1, 1].set_xlabel('Hora del día')
+        axes[1, 1].set_ylabel(f'{sensor} promedio')
+        axes[1, 1].grid(True, alpha=0.3)
+    else:
+        corr = job['correlation']
+        image = axes[1, 1].imshow(corr.values, cmap='coolwarm', vmin=-1, vmax=1)
+        axes[1, 1].set_xticks(range(len(corr.columns)), corr.columns, rotation=45)
+        axes[1, 1].set_yticks(range(len(corr.index)), corr.index)
+        for (i, j), value in np.ndenumerate(corr.values):
+            axes[1, 1].text(j, i, f'{value:.2f}', ha='center', va='center', fontsize=9)
+        fig.colorbar(image, ax=axes[1, 1])
+        axes[1, 1].set_title('Matriz de Correlación')
+
+    fig.tight_layout()
+    png_path = f"{job['path']}.png"
+    fig.savefig(png_path, dpi=job['dpi'], bbox_inches='tight')
+    plt.close(fig)
+
+    json_path = f"{job['path']}.json"
+    with open(json_path, 'w', encoding='utf-8') as file:
+        json.dump(_summary(job, finite), file, indent=2, ensure_ascii=False)
+
+    return [png_path, json_path]
+
+
+def _naive_timestamps(series):
+    """Timestamps como datetime64 en hora local (los arreglos tz-aware serían objetos)"""
+    if series.dt.tz is not None:
+        # UTC → TIMEZONE antes de quitar la zona, para que las gráficas muestren la hora local
+        return to_local_time(series).tz_localize(None).to_numpy()
+    return series.to_numpy()
+
+
+def _downsample(timestamps, values, max_points=MAX_PLOT_POINTS):
+    """Reduce la cantidad de puntos a dibujar tomando uno de cada k"""
+    if len(values) <= max_points:
+        return timestamps, values
+    step = int(np.ceil(len(values) / max_points))
+    return timestamps[::step], values[::step]
+
+
+def _summary(job, finite):
+    """Resumen JSON del reporte de un sensor"""
+    n_anomalies = int(job['anomalies'].sum())
+    summary = {
+        'sensor': job['sensor'],
+        'device': job['device'],
+        'records': int(len(job['values'])),
+        'statistics': {
+            'mean': float(np.mean(finite)) if len(finite) else None,
+            'median': float(np.median(finite)) if len(finite) else None,
+            'min': float(np.min(finite)) if len(finite) else None,
+            'max': float(np.max(finite)) if len(finite) else None,
+            'std': float(np.std(finite, ddof=1)) if len(finite) > 1 else None,
+        },
+        'anomalies': {
+            'count': n_anomalies,
+            'percentage': n_anomalies / len(job['values']) * 100 if len(job['values']) else 0.0,
+        },
+        'hourly_mean': {int(hour): _as_float(value) for hour, value in job['hourly'].items()},
+        'metrics': {name: _as_float(value) for name, value in job['metrics'].items()},
+    }
+    if job['sensor'] in job['correlation'].columns:
+        summary['correlation'] = {col: _as_float(value) for col, value in job['correlation'][job['sensor']].items()}
+    if job['prediction_values'] is not None:
+        summary['predictions'] = [
+            {'timestamp': pd.Timestamp(ts).isoformat(), 'value': _as_float(value)}
+            for ts, value in zip(job['prediction_timestamps'], job['prediction_values'])
+        ]
+    return summary
+
+
+def _as_float(value):
+    """Convierte a float serializable (NaN → None)"""
+    value = float(value)
+    return None if np.isnan(value) else value
@@ -4,57 +4,65 @@ Modelo de IA para análisis de datos de sensores IoT
 Incluye predicción de valores futuros y detección de anomalías
 """
 
+import os
+import sys
+import argparse
+import importlib.util
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
-# Machine Learning
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.ensemble import IsolationForest
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error, mean_absolute_error
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor
+# scikit-learn, matplotlib/seaborn y TensorFlow se importan dentro de los métodos que
+# los usan: importar este módulo (p. ej. desde la API) no paga su costo de arranque.
 
-# Deep Learning para series temporales
-try:
-    import tensorflow as tf
-    from tensorflow.keras.models import Sequential
-    from tensorflow.keras.layers import LSTM, Dense, Dropout
-    from tensorflow.keras.optimizers import Adam
-    TENSORFLOW_AVAILABLE = True
-except ImportError:
-    TENSORFLOW_AVAILABLE = False
-    print("⚠️ TensorFlow no está disponible. Usando modelos tradicionales.")
+# Deep Learning para series temporales (solo se comprueba si está instalado)
+TENSORFLOW_AVAILABLE = importlib.util.find_spec("tensorflow") is not None
+
+# Permitir importar el paquete `model` al ejecutar este archivo como script
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from model.feature_builder import FeatureBuilder
+from model.feature_window import FeatureWindow
+from model.model_selection import CACHE_DIR, CACHE_KEEP, select_model
+from model.out_of_core import DEFAULT_MEMORY_LIMIT_MB, run_chunked_analysis
+from model.reporting import render_reports
+from model.sequences import make_sequences, make_tf_dataset
+from services.dataset import load_csv_dataset
+from services.rollups import rollups_for
+
+# Columnas numéricas de los sensores
+NUMERIC_COLUMNS = ['tempC', 'hum%', 'mq135_raw', 'rs_r0', 'co2_ppm', 'ldr_raw', 'ldr_v', 'ldr_pct']
 
 class SensorAIModel:
     def __init__(self, csv_file="Valores de Sensores.csv"):
         self.csv_file = csv_file
         self.data = None
-        self.scaler = StandardScaler()
+        self.scaler = None
         self.label_encoders = {}
         self.models = {}
         self.anomaly_detector = None
+        self.feature_windows = {}
+        self.feature_builder = None
+        self.rollups = None
+        self.features = {}
         
     def load_and_preprocess_data(self):
         """Carga y preprocesa los datos del CSV"""
+        from sklearn.preprocessing import LabelEncoder
+
         print("🔄 Cargando datos del CSV...")
         
-        # Cargar datos
-        self.data = pd.read_csv(self.csv_file)
-        
-        # Convertir timestamp
-        self.data['timestamp'] = pd.to_datetime(self.data['timestamp'])
-        self.data = self.data.sort_values('timestamp').reset_index(drop=True)
+        # Cargar datos con la capa compartida con la API (se parsea una sola vez:
+        # comas decimales normalizadas, timestamps en UTC y orden por tiempo)
+        dataset = load_csv_dataset(self.csv_file)
+        self.data = dataset.frame.copy(deep=False)
         
-        # Convertir números con coma decimal a punto decimal
-        numeric_columns = ['tempC', 'hum%', 'mq135_raw', 'rs_r0', 'co2_ppm', 'ldr_raw', 'ldr_v', 'ldr_pct']
-        for col in numeric_columns:
-            self.data[col] = self.data[col].astype(str).str.replace(',', '.').astype(float)
+        # Eliminar filas con timestamps inválidos
+        self.data = self.data.dropna(subset=['timestamp']).reset_index(drop=True)
         
         # Codificar variables categóricas
         categorical_columns = ['quality', 'light']
@@ -63,6 +71,13 @@ class SensorAIModel:
             self.data[f'{col}_encoded'] = le.fit_transform(self.data[col])
             self.label_encoders[col] = le
         
+        # Arreglo base compartido para las características de todos los sensores
+        self.feature_builder = FeatureBuilder(self.data, NUMERIC_COLUMNS)
+        
+        # Agregados horarios/diarios mantenidos por la capa de datos (promedios por hora de los reportes)
+        self.rollups = rollups_for(dataset)
+        self.features = {}
+        
         print(f"✅ Datos cargados: {len(self.data)} registros")
         print(f"📊 Columnas: {list(self.data.columns)}")
         print(f"📅 Rango de fechas: {self.data['timestamp'].min()} a {self.data['timestamp'].max()}")
@@ -71,11 +86,12 @@ class SensorAIModel:
     
     def detect_anomalies(self, contamination=0.1):
         """Detecta anomalías en los datos usando Isolation Forest"""
+        from sklearn.ensemble import IsolationForest
+
         print("🔍 Detectando anomalías...")
         
         # Seleccionar columnas numéricas para detección de anomalías
-        numeric_features = ['tempC', 'hum%', 'mq135_raw', 'rs_r0', 'co2_ppm', 'ldr_raw', 'ldr_v', 'ldr_pct']
-        X = self.data[numeric_features].fillna(self.data[numeric_features].mean())
+        X = self.data[NUMERIC_COLUMNS].fillna(self.data[NUMERIC_COLUMNS].mean())
         
         # Entrenar modelo de detección de anomalías
         self.anomaly_detector = IsolationForest(contamination=contamination, random_state=42)
@@ -94,43 +110,40 @@ class SensorAIModel:
         """Crea características de series temporales para predicción"""
         print(f"📈 Creando características de series temporales para {target_column}...")
         
-        # Crear ventanas deslizantes
-        for i in range(1, window_size + 1):
-            self.data[f'{target_column}_lag_{i}'] = self.data[target_column].shift(i)
-        
-        # Estadísticas móviles
-        self.data[f'{target_column}_rolling_mean'] = self.data[target_column].rolling(window=window_size).mean()
-        self.data[f'{target_column}_rolling_std'] = self.data[target_column].rolling(window=window_size).std()
+        # Lags, estadísticas móviles (solo historia previa) y características temporales,
+        # junto con las lecturas actuales de los demás sensores. self.data no se modifica.
+        window = FeatureWindow(target_column, n_lags=window_size, windows=(window_size,))
+        features = self.feature_builder.build(window, exogenous=NUMERIC_COLUMNS)
+        self.feature_windows[target_column] = window
+        self.features[target_column] = features
         
-        # Características temporales
-        self.data['hour'] = self.data['timestamp'].dt.hour
-        self.data['day_of_week'] = self.data['timestamp'].dt.dayofweek
-        self.data['day_of_year'] = self.data['timestamp'].dt.dayofyear
+        print(f"✅ Características creadas. Datos finales: {len(features)} registros, "
+              f"{len(features.feature_names)} características")
         
-        # Eliminar filas con NaN
-        self.data = self.data.dropna()
-        
-        print(f"✅ Características creadas. Datos finales: {len(self.data)} registros")
-        
-        return self.data
+        return features
     
     def train_prediction_models(self, target_column='tempC'):
         """Entrena modelos de predicción"""
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import mean_squared_error
+        from sklearn.linear_model import LinearRegression
+        from sklearn.ensemble import RandomForestRegressor
+
         print(f"🤖 Entrenando modelos de predicción para {target_column}...")
         
         # Preparar datos
-        feature_columns = [col for col in self.data.columns if col not in [
-            'timestamp', 'deviceId', 'quality', 'light', 'is_anomaly', 'anomaly_score',
-            target_column, 'quality_encoded', 'light_encoded'
-        ]]
-        
-        X = self.data[feature_columns].fillna(self.data[feature_columns].mean())
-        y = self.data[target_column]
+        if target_column not in self.features:
+            self.create_time_series_features(target_column)
+        features = self.features[target_column]
+        feature_columns = features.feature_names
+        X, y = features.X, features.y
         
-        # Dividir datos
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        # Dividir datos en orden temporal: se evalúa con el 20% más reciente
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
         
         # Normalizar características
+        self.scaler = StandardScaler()
         X_train_scaled = self.scaler.fit_transform(X_train)
         X_test_scaled = self.scaler.transform(X_test)
         
@@ -160,34 +173,62 @@ class SensorAIModel:
         
         return self.models[target_column]
     
-    def train_lstm_model(self, target_column='tempC', sequence_length=60):
+    def select_prediction_model(self, target_column='tempC', workers=None, cache_dir=CACHE_DIR, cache_keep=CACHE_KEEP):
+        """
+        Elige el regresor con validación cruzada temporal y successive halving
+        (ver model_selection.py). Los resultados se guardan en caché por hash de los datos
+        (se conservan los `cache_keep` conjuntos más recientes).
+        """
+        print(f"🧪 Seleccionando modelo para {target_column}...")
+        
+        if target_column not in self.features:
+            self.create_time_series_features(target_column)
+        features = self.features[target_column]
+        
+        selection = select_model(features.X, features.y, features.feature_names,
+                                 workers=workers, cache_dir=cache_dir, cache_keep=cache_keep)
+        best = selection['best']
+        
+        # El mejor modelo incluye su propio escalado
+        self.models[target_column] = {
+            'best': selection['model'],
+            'feature_columns': features.feature_names,
+            'test_mse': {best['model']: best['mse']},
+            'selection': {key: value for key, value in selection.items() if key != 'model'}
+        }
+        
+        evaluations = selection['evaluations']
+        print(f"✅ Mejor modelo para {target_column}: {best['model']} {best['params']} "
+              f"(MSE validación temporal: {best['mse']:.4f})")
+        print(f"   - Evaluaciones: {evaluations['computed']} calculadas, {evaluations['cached']} desde caché")
+        
+        return self.models[target_column]
+    
+    def train_lstm_model(self, target_column='tempC', sequence_length=60, batch_size=32, epochs=50):
         """Entrena modelo LSTM para predicción de series temporales"""
         if not TENSORFLOW_AVAILABLE:
             print("⚠️ TensorFlow no disponible. Saltando modelo LSTM.")
             return None
         
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.metrics import mean_squared_error
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import LSTM, Dense, Dropout
+        from tensorflow.keras.optimizers import Adam
+        
         print(f"🧠 Entrenando modelo LSTM para {target_column}...")
         
         # Preparar datos para LSTM
         data_values = self.data[target_column].values.reshape(-1, 1)
-        data_scaled = self.scaler.fit_transform(data_values)
-        
-        # Crear secuencias
-        X, y = [], []
-        for i in range(sequence_length, len(data_scaled)):
-            X.append(data_scaled[i-sequence_length:i, 0])
-            y.append(data_scaled[i, 0])
-        
-        X, y = np.array(X), np.array(y)
+        scaler = StandardScaler()
+        series = scaler.fit_transform(data_values)[:, 0].astype(np.float32)
         
-        # Dividir datos
-        split = int(0.8 * len(X))
-        X_train, X_test = X[:split], X[split:]
-        y_train, y_test = y[:split], y[split:]
-        
-        # Reshape para LSTM
-        X_train = X_train.reshape((X_train.shape[0], X_train.shape[1], 1))
-        X_test = X_test.reshape((X_test.shape[0], X_test.shape[1], 1))
+        # Secuencias como vistas sin copia (memoria O(N)) y lotes transmitidos con precarga
+        _, y = make_sequences(series, sequence_length)
+        split = int(0.8 * len(y))
+        train_ds = make_tf_dataset(series, sequence_length, stop=split, batch_size=batch_size, shuffle=True)
+        test_ds = make_tf_dataset(series, sequence_length, start=split, batch_size=batch_size)
+        y_test = y[split:]
         
         # Crear modelo LSTM
         model = Sequential([
@@ -202,21 +243,20 @@ class SensorAIModel:
         model.compile(optimizer=Adam(learning_rate=0.001), loss='mse')
         
         # Entrenar modelo
-        history = model.fit(X_train, y_train, 
-                          batch_size=32, 
-                          epochs=50, 
-                          validation_data=(X_test, y_test),
+        history = model.fit(train_ds,
+                          epochs=epochs,
+                          validation_data=test_ds,
                           verbose=0)
         
         # Evaluar modelo
-        y_pred = model.predict(X_test)
+        y_pred = model.predict(test_ds, verbose=0)
         mse = mean_squared_error(y_test, y_pred)
         
         print(f"✅ Modelo LSTM entrenado. MSE: {mse:.4f}")
         
         return {
             'model': model,
-            'scaler': self.scaler,
+            'scaler': scaler,
             'sequence_length': sequence_length,
             'mse': mse,
             'history': history
@@ -230,36 +270,38 @@ class SensorAIModel:
             print(f"❌ Modelo no encontrado para {target_column}")
             return None
         
-        # Usar el mejor modelo (Random Forest generalmente)
-        model = self.models[target_column]['random_forest']
-        feature_columns = self.models[target_column]['feature_columns']
-        
-        # Obtener los últimos valores conocidos
-        last_values = self.data[feature_columns].iloc[-1:].fillna(self.data[feature_columns].mean())
-        
-        predictions = []
-        current_values = last_values.copy()
+        # Usar el modelo elegido por la selección, o Random Forest (que se escala aparte)
+        entry = self.models[target_column]
+        model = entry.get('best', entry.get('random_forest'))
+        scale = (lambda values: values) if 'best' in entry else self.scaler.transform
+        feature_columns = entry['feature_columns']
         
-        for i in range(hours_ahead):
-            # Predecir siguiente valor
-            pred_scaled = model.predict(self.scaler.transform(current_values))
-            predictions.append(pred_scaled[0])
-            
-            # Actualizar valores para siguiente predicción
-            if f'{target_column}_lag_1' in current_values.columns:
-                current_values[f'{target_column}_lag_1'] = pred_scaled[0]
-            
-            # Actualizar otras características si es necesario
-            if f'{target_column}_rolling_mean' in current_values.columns:
-                current_values[f'{target_column}_rolling_mean'] = np.mean(predictions[-10:])
-        
-        # Crear DataFrame con predicciones
+        # Obtener los últimos valores conocidos (las columnas externas se mantienen fijas)
+        current_values = self.features[target_column].X[-1:].copy()
+
+        # Ventana con la historia más reciente del sensor
+        window = self.feature_windows[target_column]
+        window.reset()
+        window.extend(self.feature_builder.column(target_column)[-window.size:])
+        window_positions = [feature_columns.index(name) for name in window.feature_names]
+
         future_times = pd.date_range(
             start=self.data['timestamp'].iloc[-1] + timedelta(minutes=1),
             periods=hours_ahead,
             freq='1min'
         )
-        
+
+        predictions = []
+        for timestamp in future_times:
+            # Actualizar lags, estadísticas móviles y calendario en O(1)
+            current_values[0, window_positions] = window.features(timestamp)
+
+            # Predecir siguiente valor
+            pred = model.predict(scale(current_values))[0]
+            predictions.append(pred)
+            window.push(pred)
+
+        # Crear DataFrame con predicciones
         future_df = pd.DataFrame({
             'timestamp': future_times,
             f'{target_column}_predicted': predictions
@@ -269,8 +311,11 @@ class SensorAIModel:
         
         return future_df
     
-    def visualize_results(self, target_column='tempC', anomalies_df=None, predictions_df=None):
-        """Visualiza los resultados del análisis"""
+    def visualize_results(self, target_column='tempC', anomalies_df=None, predictions_df=None, show=True):
+        """Visualiza los resultados del análisis (show=False no bloquea en ejecuciones sin pantalla)"""
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
         print("📊 Generando visualizaciones...")
         
         fig, axes = plt.subplots(2, 2, figsize=(15, 10))
@@ -314,10 +359,26 @@ class SensorAIModel:
         
         plt.tight_layout()
         plt.savefig(f'sensor_ai_analysis_{target_column}.png', dpi=300, bbox_inches='tight')
-        plt.show()
+        if show:
+            plt.show()
+        plt.close(fig)
         
         print("✅ Visualizaciones guardadas como 'sensor_ai_analysis_{}.png'".format(target_column))
     
+    def generate_batch_reports(self, sensors, output_dir='reports', anomalies_df=None, predictions=None, workers=None):
+        """Genera los reportes PNG/JSON de varios sensores en paralelo y sin pantalla"""
+        print(f"📊 Generando reportes en {output_dir}...")
+        
+        metrics = {sensor: self.models[sensor]['test_mse'] for sensor in sensors if sensor in self.models}
+        paths = render_reports(self.data, sensors, output_dir, workers=workers,
+                               anomalies=anomalies_df, predictions=predictions, metrics=metrics,
+                               fourth_panel='correlation', prefix='sensor_ai_analysis',
+                               rollups=self.rollups)
+        
+        print(f"✅ {len(paths)} archivos generados en {output_dir}")
+        
+        return paths
+    
     def generate_report(self, target_column='tempC'):
         """Genera un reporte completo del análisis"""
         print(f"\n📋 GENERANDO REPORTE PARA {target_column.upper()}")
@@ -346,11 +407,35 @@ class SensorAIModel:
         
         print("\n✅ Reporte generado exitosamente")
 
-def main():
+def main(argv=None):
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Análisis de IA para datos de sensores IoT")
+    parser.add_argument("--headless", action="store_true",
+                        help="Generar reportes PNG/JSON en paralelo sin abrir ventanas")
+    parser.add_argument("--output-dir", default="reports", help="Directorio de salida en modo headless")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para renderizar reportes y seleccionar modelos")
+    parser.add_argument("--select-models", action="store_true",
+                        help="Elegir el regresor de cada sensor con validación cruzada temporal")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Caché de la selección de modelos")
+    parser.add_argument("--cache-keep", type=int, default=CACHE_KEEP,
+                        help="Conjuntos de datos que conserva la caché de la selección de modelos")
+    parser.add_argument("--chunked", action="store_true",
+                        help="Procesar el CSV por bloques con memoria acotada (historiales que no caben en RAM)")
+    parser.add_argument("--memory-limit-mb", type=int, default=DEFAULT_MEMORY_LIMIT_MB,
+                        help="Techo de memoria de trabajo (sobre la línea base del proceso) en modo --chunked")
+    parser.add_argument("--anomalies-file", default=None, help="CSV donde guardar las filas anómalas en modo --chunked")
+    args = parser.parse_args(argv)
+    
     print("🚀 Iniciando análisis de IA para datos de sensores IoT")
     print("=" * 60)
     
+    if args.chunked:
+        # Historiales grandes: estadísticas, regresores incrementales y anomalías por bloques
+        run_chunked_analysis("Valores de Sensores.csv", ['tempC', 'hum%', 'co2_ppm', 'ldr_raw'],
+                             args.memory_limit_mb, args.anomalies_file, contamination=0.05)
+        print("\n🎉 Análisis completado exitosamente!")
+        return
+    
     # Crear instancia del modelo
     ai_model = SensorAIModel("Valores de Sensores.csv")
     
@@ -362,6 +447,7 @@ def main():
     
     # Analizar diferentes sensores
     sensors_to_analyze = ['tempC', 'hum%', 'co2_ppm', 'ldr_raw']
+    all_predictions = {}
     
     for sensor in sensors_to_analyze:
         print(f"\n🔬 Analizando sensor: {sensor}")
@@ -370,21 +456,34 @@ def main():
         # Crear características de series temporales
         ai_model.create_time_series_features(target_column=sensor, window_size=10)
         
-        # Entrenar modelos de predicción
-        ai_model.train_prediction_models(target_column=sensor)
+        # Entrenar modelos de predicción (o elegir el mejor con --select-models)
+        if args.select_models:
+            ai_model.select_prediction_model(target_column=sensor, workers=args.workers, cache_dir=args.cache_dir,
+                                             cache_keep=args.cache_keep)
+        else:
+            ai_model.train_prediction_models(target_column=sensor)
         
         # Generar predicciones futuras
         predictions = ai_model.predict_future_values(target_column=sensor, hours_ahead=24)
+        all_predictions[sensor] = predictions
         
-        # Visualizar resultados
-        ai_model.visualize_results(target_column=sensor, anomalies_df=anomalies, predictions_df=predictions)
+        # Visualizar resultados (en modo headless se renderizan todos al final)
+        if not args.headless:
+            ai_model.visualize_results(target_column=sensor, anomalies_df=anomalies, predictions_df=predictions)
         
         # Generar reporte
         ai_model.generate_report(target_column=sensor)
     
+    if args.headless:
+        ai_model.generate_batch_reports(sensors_to_analyze, args.output_dir, anomalies_df=anomalies,
+                                        predictions=all_predictions, workers=args.workers)
+    
     print("\n🎉 Análisis completado exitosamente!")
     print("📁 Archivos generados:")
-    print("   - sensor_ai_analysis_*.png (visualizaciones)")
+    if args.headless:
+        print(f"   - {args.output_dir}/sensor_ai_analysis_*.png / *.json (reportes)")
+    else:
+        print("   - sensor_ai_analysis_*.png (visualizaciones)")
     print("   - Reportes en consola")
 
 if __name__ == "__main__":
@@ -0,0 +1,63 @@
+"""
+Secuencias para modelos LSTM sin duplicar datos
+Las ventanas se obtienen como vistas (sliding_window_view) sobre la serie escalada,
+por lo que la memoria es O(N) en lugar de O(N × longitud de secuencia). Solo cada
+lote se materializa al momento de entrenarlo.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def make_sequences(series, sequence_length):
+    """
+    Devuelve (X, y) como vistas sin copia: X[i] = series[i:i + L] e y[i] = series[i + L].
+    """
+    series = np.asarray(series)
+    if len(series) <= sequence_length:
+        empty = np.empty((0, sequence_length), dtype=series.dtype)
+        return empty, series[:0]
+    X = sliding_window_view(series[:-1], sequence_length)
+    y = series[sequence_length:]
+    return X, y
+
+
+def sequence_batches(series, sequence_length, start=0, stop=None, batch_size=32, shuffle=False, seed=42):
+    """Genera lotes (X, y) con forma (lote, L, 1) sobre las ventanas [start, stop)"""
+    X, y = make_sequences(series, sequence_length)
+    stop = len(X) if stop is None else stop
+    indices = np.arange(start, stop)
+    if shuffle:
+        np.random.default_rng(seed).shuffle(indices)
+
+    for offset in range(0, len(indices), batch_size):
+        batch = indices[offset:offset + batch_size]
+        if not shuffle:
+            # Índices contiguos: el corte sigue siendo una vista hasta el reshape final
+            batch = slice(batch[0], batch[-1] + 1)
+        yield X[batch][..., np.newaxis], y[batch]
+
+
+def make_tf_dataset(series, sequence_length, start=0, stop=None, batch_size=32, shuffle=False, seed=42):
+    """
+    Pipeline tf.data que transmite los lotes desde las vistas y los precarga
+    mientras el modelo entrena el lote anterior.
+    """
+    import tensorflow as tf
+
+    series = np.asarray(series, dtype=np.float32)
+    epoch = [0]
+
+    def generator():
+        # Semilla distinta por época para que el orden aleatorio cambie
+        epoch[0] += 1
+        yield from sequence_batches(series, sequence_length, start, stop, batch_size, shuffle, seed + epoch[0])
+
+    dataset = tf.data.Dataset.from_generator(
+        generator,
+        output_signature=(
+            tf.TensorSpec(shape=(None, sequence_length, 1), dtype=tf.float32),
+            tf.TensorSpec(shape=(None,), dtype=tf.float32),
+        ),
+    )
+    return dataset.prefetch(tf.data.AUTOTUNE)
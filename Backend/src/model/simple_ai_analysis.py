@@ -4,43 +4,57 @@ Análisis de IA simple para datos de sensores IoT
 Versión simplificada sin dependencias pesadas
 """
 
+import os
+import sys
+import argparse
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
-# Machine Learning básico
-from sklearn.preprocessing import StandardScaler
-from sklearn.ensemble import IsolationForest, RandomForestRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error, mean_absolute_error
-from sklearn.linear_model import LinearRegression
+# scikit-learn y matplotlib se importan dentro de los métodos que los usan
+
+# Permitir importar el paquete `model` al ejecutar este archivo como script
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from model.feature_builder import FeatureBuilder
+from model.feature_window import FeatureWindow
+from model.out_of_core import DEFAULT_MEMORY_LIMIT_MB, run_chunked_analysis
+from model.reporting import render_reports
+from services.dataset import load_csv_dataset
+from services.rollups import rollups_for
+
+# Columnas numéricas de los sensores
+NUMERIC_COLUMNS = ['tempC', 'hum%', 'mq135_raw', 'rs_r0', 'co2_ppm', 'ldr_raw', 'ldr_v', 'ldr_pct']
 
 class SimpleSensorAI:
     def __init__(self, csv_file="Valores de Sensores.csv"):
         self.csv_file = csv_file
         self.data = None
-        self.scaler = StandardScaler()
+        self.feature_builder = None
+        self.rollups = None
         
     def load_data(self):
         """Carga y preprocesa los datos"""
         print("🔄 Cargando datos...")
         
-        # Cargar CSV
-        self.data = pd.read_csv(self.csv_file)
+        # Cargar CSV con la capa compartida con la API (se parsea una sola vez:
+        # comas decimales normalizadas, timestamps en UTC y orden por tiempo)
+        dataset = load_csv_dataset(self.csv_file)
+        self.data = dataset.frame.copy(deep=False)
         
-        # Convertir timestamp (manejar diferentes formatos)
-        self.data['timestamp'] = pd.to_datetime(self.data['timestamp'], errors='coerce')
         # Eliminar filas con timestamps inválidos
-        self.data = self.data.dropna(subset=['timestamp'])
-        self.data = self.data.sort_values('timestamp').reset_index(drop=True)
+        self.data = self.data.dropna(subset=['timestamp']).reset_index(drop=True)
         
-        # Convertir números con coma decimal
-        numeric_columns = ['tempC', 'hum%', 'mq135_raw', 'rs_r0', 'co2_ppm', 'ldr_raw', 'ldr_v', 'ldr_pct']
-        for col in numeric_columns:
-            self.data[col] = self.data[col].astype(str).str.replace(',', '.').astype(float)
+        # Arreglo base compartido para las características de todos los sensores
+        self.feature_builder = FeatureBuilder(self.data, NUMERIC_COLUMNS)
+        
+        # Agregados horarios/diarios mantenidos por la capa de datos: los patrones por hora
+        # y por día de la semana se combinan desde ahí en lugar de agrupar todas las filas
+        self.rollups = rollups_for(dataset)
         
         print(f"✅ Datos cargados: {len(self.data)} registros")
         print(f"📅 Rango: {self.data['timestamp'].min()} a {self.data['timestamp'].max()}")
@@ -49,6 +63,8 @@ class SimpleSensorAI:
     
     def detect_anomalies(self, sensor='tempC'):
         """Detecta anomalías en un sensor específico"""
+        from sklearn.ensemble import IsolationForest
+
         print(f"🔍 Detectando anomalías en {sensor}...")
         
         # Usar múltiples sensores para mejor detección
@@ -70,38 +86,28 @@ class SimpleSensorAI:
     
     def predict_future(self, sensor='tempC', hours=24):
         """Predice valores futuros usando Random Forest"""
+        from sklearn.ensemble import RandomForestRegressor
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import mean_squared_error, mean_absolute_error
+
         print(f"🔮 Prediciendo {sensor} para las próximas {hours} horas...")
         
         # Asegurar que timestamp sea datetime
         if not pd.api.types.is_datetime64_any_dtype(self.data['timestamp']):
             self.data['timestamp'] = pd.to_datetime(self.data['timestamp'], errors='coerce')
         
-        # Crear características temporales
-        self.data['hour'] = self.data['timestamp'].dt.hour
-        self.data['minute'] = self.data['timestamp'].dt.minute
-        self.data['day_of_week'] = self.data['timestamp'].dt.dayofweek
-        
-        # Crear lags (valores anteriores)
-        for i in range(1, 6):
-            self.data[f'{sensor}_lag_{i}'] = self.data[sensor].shift(i)
-        
-        # Media móvil
-        self.data[f'{sensor}_ma_5'] = self.data[sensor].rolling(window=5).mean()
-        self.data[f'{sensor}_ma_10'] = self.data[sensor].rolling(window=10).mean()
-        
-        # Eliminar NaN
-        data_clean = self.data.dropna()
-        
-        # Preparar datos para entrenamiento
-        feature_cols = [col for col in data_clean.columns if col not in [
-            'timestamp', 'deviceId', 'quality', 'light', 'is_anomaly', 'anomaly_score', sensor
-        ]]
+        # Lags, medias móviles (solo historia previa) y características temporales,
+        # construidas por sensor sin modificar self.data
+        window = FeatureWindow(sensor, n_lags=5, windows=(5, 10), rolling_std=False,
+                               calendar=('hour', 'minute', 'day_of_week'))
+        features = self.feature_builder.build(window, exogenous=NUMERIC_COLUMNS)
+        feature_cols = features.feature_names
         
-        X = data_clean[feature_cols]
-        y = data_clean[sensor]
+        X = features.X
+        y = features.y
         
-        # Dividir datos
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        # Dividir datos en orden temporal: se evalúa con el 20% más reciente
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
         
         # Entrenar modelo
         model = RandomForestRegressor(n_estimators=100, random_state=42)
@@ -117,30 +123,27 @@ class SimpleSensorAI:
         print(f"   - MAE: {mae:.4f}")
         
         # Generar predicciones futuras
-        last_row = data_clean.iloc[-1:].copy()
-        predictions = []
-        
-        for i in range(hours):
-            # Predecir siguiente valor
-            pred = model.predict(last_row[feature_cols])[0]
-            predictions.append(pred)
-            
-            # Actualizar lags para siguiente predicción
-            for j in range(4, 0, -1):
-                last_row[f'{sensor}_lag_{j+1}'] = last_row[f'{sensor}_lag_{j}']
-            last_row[f'{sensor}_lag_1'] = pred
-            
-            # Actualizar medias móviles
-            last_row[f'{sensor}_ma_5'] = np.mean(predictions[-5:]) if len(predictions) >= 5 else pred
-            last_row[f'{sensor}_ma_10'] = np.mean(predictions[-10:]) if len(predictions) >= 10 else pred
-        
-        # Crear DataFrame con predicciones
+        last_row = features.X[-1:].copy()
+        window.extend(self.feature_builder.column(sensor)[-window.size:])
+        window_positions = [feature_cols.index(name) for name in window.feature_names]
+
         future_times = pd.date_range(
             start=self.data['timestamp'].iloc[-1] + timedelta(minutes=1),
             periods=hours,
             freq='1min'
         )
-        
+
+        predictions = []
+        for timestamp in future_times:
+            # Actualizar lags, medias móviles y calendario en O(1)
+            last_row[0, window_positions] = window.features(timestamp)
+
+            # Predecir siguiente valor
+            pred = model.predict(last_row)[0]
+            predictions.append(pred)
+            window.push(pred)
+
+        # Crear DataFrame con predicciones
         future_df = pd.DataFrame({
             'timestamp': future_times,
             f'{sensor}_predicted': predictions
@@ -152,17 +155,11 @@ class SimpleSensorAI:
         """Analiza patrones en los datos"""
         print(f"📈 Analizando patrones en {sensor}...")
         
-        # Asegurar que timestamp sea datetime
-        if not pd.api.types.is_datetime64_any_dtype(self.data['timestamp']):
-            self.data['timestamp'] = pd.to_datetime(self.data['timestamp'], errors='coerce')
-        
-        # Estadísticas por hora
-        self.data['hour'] = self.data['timestamp'].dt.hour
-        hourly_stats = self.data.groupby('hour')[sensor].agg(['mean', 'std', 'min', 'max'])
+        # Estadísticas por hora (combinadas desde los agregados horarios)
+        hourly_stats = self.rollups.profile(sensor, by='hour')[['mean', 'std', 'min', 'max']]
         
         # Estadísticas por día de la semana
-        self.data['day_of_week'] = self.data['timestamp'].dt.dayofweek
-        daily_stats = self.data.groupby('day_of_week')[sensor].agg(['mean', 'std'])
+        daily_stats = self.rollups.profile(sensor, by='day_of_week')[['mean', 'std']]
         
         print(f"📊 Estadísticas por hora:")
         print(hourly_stats.round(2))
@@ -172,8 +169,10 @@ class SimpleSensorAI:
         
         return hourly_stats, daily_stats
     
-    def create_visualizations(self, sensor='tempC', anomalies=None, predictions=None):
-        """Crea visualizaciones del análisis"""
+    def create_visualizations(self, sensor='tempC', anomalies=None, predictions=None, show=True):
+        """Crea visualizaciones del análisis (show=False no bloquea en ejecuciones sin pantalla)"""
+        import matplotlib.pyplot as plt
+
         print("📊 Generando gráficos...")
         
         fig, axes = plt.subplots(2, 2, figsize=(15, 10))
@@ -209,7 +208,7 @@ class SimpleSensorAI:
             axes[1, 0].set_title('Predicciones Futuras')
         
         # 4. Patrones por hora
-        hourly_avg = self.data.groupby(self.data['timestamp'].dt.hour)[sensor].mean()
+        hourly_avg = self.rollups.profile(sensor, by='hour')['mean']
         axes[1, 1].plot(hourly_avg.index, hourly_avg.values, marker='o')
         axes[1, 1].set_title('Patrón Promedio por Hora')
         axes[1, 1].set_xlabel('Hora del día')
@@ -218,10 +217,25 @@ class SimpleSensorAI:
         
         plt.tight_layout()
         plt.savefig(f'simple_ai_analysis_{sensor}.png', dpi=300, bbox_inches='tight')
-        plt.show()
+        if show:
+            plt.show()
+        plt.close(fig)
         
         print(f"✅ Gráfico guardado como 'simple_ai_analysis_{sensor}.png'")
     
+    def create_batch_reports(self, sensors, output_dir='reports', anomalies=None, predictions=None, workers=None):
+        """Genera los reportes PNG/JSON de varios sensores en paralelo y sin pantalla"""
+        print(f"📊 Generando reportes en {output_dir}...")
+        
+        paths = render_reports(self.data, sensors, output_dir, workers=workers,
+                               anomalies=anomalies, predictions=predictions,
+                               fourth_panel='hourly', prefix='simple_ai_analysis',
+                               rollups=self.rollups)
+        
+        print(f"✅ {len(paths)} archivos generados en {output_dir}")
+        
+        return paths
+    
     def generate_summary_report(self, sensor='tempC'):
         """Genera un reporte resumen"""
         print(f"\n📋 REPORTE DE ANÁLISIS PARA {sensor.upper()}")
@@ -245,7 +259,7 @@ class SimpleSensorAI:
         
         # Patrones temporales
         print(f"\n⏰ Patrones temporales:")
-        hourly_avg = self.data.groupby(self.data['timestamp'].dt.hour)[sensor].mean()
+        hourly_avg = self.rollups.profile(sensor, by='hour')['mean']
         min_hour = hourly_avg.idxmin()
         max_hour = hourly_avg.idxmax()
         print(f"   - Hora más baja: {min_hour}:00 ({hourly_avg[min_hour]:.2f})")
@@ -253,11 +267,31 @@ class SimpleSensorAI:
         
         print(f"\n✅ Análisis completado para {sensor}")
 
-def main():
+def main(argv=None):
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Análisis de IA simple para sensores IoT")
+    parser.add_argument("--headless", action="store_true",
+                        help="Generar reportes PNG/JSON en paralelo sin abrir ventanas")
+    parser.add_argument("--output-dir", default="reports", help="Directorio de salida en modo headless")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para renderizar reportes")
+    parser.add_argument("--chunked", action="store_true",
+                        help="Procesar el CSV por bloques con memoria acotada (historiales que no caben en RAM)")
+    parser.add_argument("--memory-limit-mb", type=int, default=DEFAULT_MEMORY_LIMIT_MB,
+                        help="Techo de memoria de trabajo (sobre la línea base del proceso) en modo --chunked")
+    parser.add_argument("--anomalies-file", default=None, help="CSV donde guardar las filas anómalas en modo --chunked")
+    args = parser.parse_args(argv)
+    
     print("🚀 Análisis de IA Simple para Sensores IoT")
     print("=" * 50)
     
+    if args.chunked:
+        # Historiales grandes: estadísticas, regresores incrementales y anomalías por bloques
+        run_chunked_analysis("Valores de Sensores.csv", ['tempC', 'hum%', 'co2_ppm', 'ldr_raw'],
+                             args.memory_limit_mb, args.anomalies_file,
+                             anomaly_columns=['tempC', 'hum%', 'co2_ppm', 'ldr_raw'], contamination=0.1)
+        print(f"\n🎉 Análisis completado!")
+        return
+    
     # Crear instancia
     ai = SimpleSensorAI("Valores de Sensores.csv")
     
@@ -266,6 +300,7 @@ def main():
     
     # Analizar sensores principales
     sensors = ['tempC', 'hum%', 'co2_ppm', 'ldr_raw']
+    all_predictions = {}
     
     for sensor in sensors:
         print(f"\n🔬 Analizando {sensor}...")
@@ -279,16 +314,25 @@ def main():
         
         # Generar predicciones
         predictions, model = ai.predict_future(sensor, hours=24)
+        all_predictions[sensor] = predictions
         
-        # Crear visualizaciones
-        ai.create_visualizations(sensor, anomalies, predictions)
+        # Crear visualizaciones (en modo headless se renderizan todas al final)
+        if not args.headless:
+            ai.create_visualizations(sensor, anomalies, predictions)
         
         # Generar reporte
         ai.generate_summary_report(sensor)
     
+    if args.headless:
+        ai.create_batch_reports(sensors, args.output_dir, anomalies=anomalies,
+                                predictions=all_predictions, workers=args.workers)
+    
     print(f"\n🎉 Análisis completado!")
     print(f"📁 Archivos generados:")
-    print(f"   - simple_ai_analysis_*.png")
+    if args.headless:
+        print(f"   - {args.output_dir}/simple_ai_analysis_*.png / *.json")
+    else:
+        print(f"   - simple_ai_analysis_*.png")
 
 if __name__ == "__main__":
     main()
@@ -9,6 +9,11 @@ from .root import root_bp
 from .data import data_bp
 from .sensors import sensors_bp
 from .devices import devices_bp
+from .metrics import metrics_bp
+from .exports import exports_bp
+from .sources import sources_bp
+from .analytics import analytics_bp
+from .jobs import jobs_bp
 
 
 def register_routes(app):
@@ -25,4 +30,19 @@ def register_routes(app):
     app.register_blueprint(sensors_bp)
 
     # Devices endpoint (GET /devices)
-    app.register_blueprint(devices_bp)
\ No newline at end of file
+    app.register_blueprint(devices_bp)
+
+    # Data sources (GET /sources) and row ingestion (POST /ingest)
+    app.register_blueprint(sources_bp)
+
+    # Cross-sensor analytics (GET /analytics/correlation)
+    app.register_blueprint(analytics_bp)
+
+    # Background jobs (GET /jobs, POST /jobs/<name>)
+    app.register_blueprint(jobs_bp)
+
+    # Bulk exports (POST /exports, GET /exports/<id>)
+    app.register_blueprint(exports_bp)
+
+    # Prometheus metrics (GET /metrics)
+    app.register_blueprint(metrics_bp)
\ No newline at end of file
@@ -0,0 +1,39 @@
+from flask import Blueprint, request, jsonify, Response
+from services.analytics import resolve_window, correlation_report
+from services.cache import query_key, get_query_result, set_query_result
+from services.dataset import get_dataset
+from services.metrics import timed, span
+
+analytics_bp = Blueprint("analytics", __name__)
+
+@analytics_bp.route("/analytics/correlation", methods=["GET"])
+@timed("route.analytics_correlation")
+def get_correlation():
+    try:
+        # Same window on the same data → the report is computed once for every server process
+        dataset = get_dataset()
+        cache_key = query_key("analytics", dataset, request.args)
+        body = get_query_result(cache_key)
+        if body is not None:
+            return Response(body, mimetype="application/json")
+
+        window, error = resolve_window(
+            dataset,
+            sensors=request.args.get("sensors"),
+            device_ids=request.args.get("device_id"),
+            start_date_str=request.args.get("start_date"),
+            end_date_str=request.args.get("end_date"),
+            step=request.args.get("step"),
+            tolerance=request.args.get("tolerance"),
+            max_lag=request.args.get("max_lag"),
+        )
+        if error:
+            return jsonify({"error": error}), 404
+
+        report = correlation_report(dataset, window)
+        with span("serialize_json"):
+            response = jsonify(report)
+        set_query_result(cache_key, response.get_data())
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,30 +1,92 @@
-from flask import Blueprint, request, jsonify
-from services.data_service import get_data_with_filters
+from flask import Blueprint, request, jsonify, Response
+from services.cache import query_key, get_query_result, set_query_result
+from services.data_service import get_raw_data, LAYOUTS
+from services.dataset import get_dataset
+from services.rollups import get_rollup_data
+from services.sync import poll_hint
+from services.metrics import timed, span
 
 data_bp = Blueprint("data", __name__)
 
+
+def _with_sync_hints(response, dataset, device_id):
+    """Tell polling clients when new data is expected (Retry-After, in seconds)."""
+    hint = poll_hint(dataset, device_id)
+    response.headers["Retry-After"] = str(hint["next_poll_seconds"])
+    if hint["reporting_interval_seconds"] is not None:
+        response.headers["X-Reporting-Interval"] = str(hint["reporting_interval_seconds"])
+    return response
+
+
 @data_bp.route("/data", methods=["GET"])
+@timed("route.data")
 def get_data():
     try:
         sensor = request.args.get("sensor")
         device_id = request.args.get("device_id")
         start_date = request.args.get("start_date")
         end_date = request.args.get("end_date")
+        since = request.args.get("since")
+        resolution = request.args.get("resolution", "raw")
+        layout = request.args.get("layout", "records")
+        if layout not in LAYOUTS:
+            return jsonify({"error": f"Invalid layout '{layout}'. Use records or columnar"}), 404
+        if since and resolution != "raw":
+            return jsonify({"error": "since only applies to raw data (resolution=raw)"}), 404
+
+        # Same query on the same data → response body shared by every server process; the
+        # dataset is passed on so the body is built from the data the cache key names
+        dataset = get_dataset()
+        cache_key = query_key("data", dataset, request.args)
+        body = get_query_result(cache_key)
+        if body is not None:
+            return _with_sync_hints(Response(body, mimetype="application/json"), dataset, device_id)
+
+        # Aggregated resolutions are served from the hourly/daily rollups
+        data, error, high_water_mark = None, None, None
+        if resolution != "raw":
+            data, resolution, error = get_rollup_data(
+                resolution, sensor=sensor, device_id=device_id, start_date_str=start_date, end_date_str=end_date,
+                layout=layout, dataset=dataset
+            )
 
-        data, error = get_data_with_filters(sensor, start_date, end_date, device_id)
+        if resolution == "raw" and not error:
+            # layout=columnar skips the per-row dicts; since= only reads the rows after the high-water mark
+            data, high_water_mark, error = get_raw_data(
+                sensor=sensor, device_id=device_id, start_date_str=start_date, end_date_str=end_date,
+                since_str=since, layout=layout, dataset=dataset
+            )
 
         if error:
             return jsonify({"error": error}), 404
 
-        return jsonify({
-            "records": len(data),
-            "filters": {
-                "sensor": sensor,
-                "device_id": device_id,
-                "start_date": start_date,
-                "end_date": end_date
-            },
-            "data": data
-        })
+        filters = {
+            "sensor": sensor,
+            "device_id": device_id,
+            "start_date": start_date,
+            "end_date": end_date,
+            "since": since
+        }
+        with span("serialize_json"):
+            if layout == "columnar":
+                response = jsonify({
+                    "layout": layout,
+                    "records": data["records"],
+                    "filters": filters,
+                    "resolution": resolution,
+                    "high_water_mark": high_water_mark,
+                    "header": data["header"],
+                    "data": data["data"]
+                })
+            else:
+                response = jsonify({
+                    "records": len(data),
+                    "filters": filters,
+                    "resolution": resolution,
+                    "high_water_mark": high_water_mark,
+                    "data": data
+                })
+        set_query_result(cache_key, response.get_data())
+        return _with_sync_hints(response, dataset, device_id)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1,9 +1,11 @@
 from flask import Blueprint, jsonify
 from services.data_service import load_sheet_data
+from services.metrics import timed
 
 devices_bp = Blueprint("devices", __name__)
 
 @devices_bp.route("/devices", methods=["GET"])
+@timed("route.devices")
 def get_devices():
     try:
         all_data = load_sheet_data()
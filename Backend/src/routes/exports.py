@@ -0,0 +1,51 @@
+from flask import Blueprint, request, jsonify, send_file, url_for
+from services.exports import export_manager, validate_export_request
+from services.metrics import timed
+
+exports_bp = Blueprint("exports", __name__)
+
+@exports_bp.route("/exports", methods=["POST"])
+@timed("route.exports")
+def create_export():
+    try:
+        # Filters may be sent as JSON body, form data or query string
+        params = request.get_json(silent=True) or request.form or request.args
+        filters, export_format, error = validate_export_request(params)
+
+        if error:
+            return jsonify({"error": error}), 400
+
+        job = export_manager.submit(filters, export_format)
+        status_url = url_for("exports.get_export", job_id=job.id)
+        return jsonify({**job.to_dict(), "url": status_url}), 202, {"Location": status_url}
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@exports_bp.route("/exports/<job_id>", methods=["GET"])
+@timed("route.export_status")
+def get_export(job_id):
+    try:
+        job = export_manager.get(job_id)
+        if job is None:
+            return jsonify({"error": f"Export '{job_id}' not found"}), 404
+
+        if job.status == "failed":
+            return jsonify(job.to_dict()), 500
+        if job.status != "completed":
+            return jsonify(job.to_dict()), 202
+        if not job.file_available:
+            # Swept after the retention period (or removed)
+            return jsonify({**job.to_dict(), "error": "Export file is no longer available"}), 410
+
+        # Finished → serve the file; conditional=True enables Range and If-None-Match handling
+        response = send_file(
+            job.path,
+            mimetype=job.mimetype,
+            as_attachment=True,
+            download_name=job.filename,
+            conditional=True,
+        )
+        response.headers["X-Export-Rows"] = str(job.rows_written)
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,38 @@
+from flask import Blueprint, jsonify
+from config.settings import JOBS_TOKEN, JOBS_TOKEN_HEADER
+from services.auth import token_matches
+from services.scheduler import scheduler
+from services.metrics import timed
+
+jobs_bp = Blueprint("jobs", __name__)
+
+@jobs_bp.route("/jobs", methods=["GET"])
+@timed("route.jobs")
+def get_jobs():
+    try:
+        jobs = scheduler.status()
+        return jsonify({
+            "jobs": jobs,
+            "total": len(jobs)
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@jobs_bp.route("/jobs/<name>", methods=["POST"])
+@timed("route.run_job")
+def run_job(name):
+    try:
+        # Jobs can take minutes of CPU: only callers with the token may start them
+        if not JOBS_TOKEN:
+            return jsonify({"error": "Running jobs on demand is disabled (set ECOMONITOR_JOBS_TOKEN)"}), 403
+        if not token_matches(JOBS_TOKEN_HEADER, JOBS_TOKEN):
+            return jsonify({"error": f"Missing or invalid {JOBS_TOKEN_HEADER}"}), 401
+
+        started = scheduler.run_now(name)
+        if started is None:
+            return jsonify({"error": f"Job '{name}' not found"}), 404
+        if not started:
+            return jsonify({"error": f"Job '{name}' is already running (or runs in another server process)"}), 409
+        return jsonify({"job": name, "status": "started"}), 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -10,7 +10,13 @@ def root():
         "endpoints": {
             "/data": "Get sensor data with filters",
             "/sensors": "List available sensors",
-            "/devices": "List available devices"
+            "/devices": "List available devices",
+            "/sources": "Health and refresh state of each data source",
+            "/ingest": "POST rows (JSON with timestamp, deviceId and sensor columns) into the ingest buffer",
+            "/analytics/correlation": "Correlation, covariance and lagged cross-correlation of sensors and devices aligned on a common time grid",
+            "/exports": "POST filters to export matching rows to gzip CSV or Parquet; GET /exports/<id> for progress and download",
+            "/jobs": "Background jobs (refresh, rollups, anomaly scans, retraining) and their last runs; POST /jobs/<name> runs one now (X-Jobs-Token)",
+            "/metrics": "Prometheus metrics (request latency, stage timings, cache and upstream counters)"
         },
         "filters": {
             "sensor": f"One of: {', '.join(SENSORS.keys())}",
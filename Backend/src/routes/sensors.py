@@ -1,9 +1,11 @@
 from flask import Blueprint, jsonify
 from config.settings import SENSORS
+from services.metrics import timed
 
 sensors_bp = Blueprint("sensors", __name__)
 
 @sensors_bp.route("/sensors", methods=["GET"])
+@timed("route.sensors")
 def get_sensors():
     return jsonify({
         "sensors": SENSORS,
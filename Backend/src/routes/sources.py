@@ -0,0 +1,49 @@
+from flask import Blueprint, request, jsonify
+from config.settings import INGEST_TOKEN, INGEST_TOKEN_HEADER
+from services.auth import token_matches
+from services.sources import registry, ingest, INGEST_HEADERS
+from services.metrics import timed
+
+sources_bp = Blueprint("sources", __name__)
+
+@sources_bp.route("/sources", methods=["GET"])
+@timed("route.sources")
+def get_sources():
+    try:
+        sources = registry.status()
+        return jsonify({
+            "sources": sources,
+            "total": len(sources)
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@sources_bp.route("/ingest", methods=["POST"])
+@timed("route.ingest")
+def post_ingest():
+    try:
+        # Ingested rows are served by /data: only callers with the token may add them
+        if not INGEST_TOKEN:
+            return jsonify({"error": "Ingestion is disabled (set ECOMONITOR_INGEST_TOKEN)"}), 403
+        if not token_matches(INGEST_TOKEN_HEADER, INGEST_TOKEN):
+            return jsonify({"error": f"Missing or invalid {INGEST_TOKEN_HEADER}"}), 401
+
+        payload = request.get_json(silent=True)
+        records = payload if isinstance(payload, list) else [payload]
+
+        # Every row needs at least the device and its timestamp
+        for record in records:
+            if not isinstance(record, dict) or not record.get("timestamp") or not record.get("deviceId"):
+                return jsonify({"error": "Expected a JSON object (or list of objects) with timestamp and deviceId"}), 400
+            # Every key becomes a column of the dataset: only the sheet headers are accepted
+            unknown = [key for key in record if key not in INGEST_HEADERS]
+            if unknown:
+                return jsonify({"error": f"Unknown fields: {', '.join(map(str, unknown[:10]))}. "
+                                         f"Allowed: {', '.join(INGEST_HEADERS)}"}), 400
+
+        accepted = ingest(records, request.args.get("source", "ingest"))
+        return jsonify({"accepted": accepted}), 202
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -8,4 +8,9 @@ Exposes data service functions for external use.
 from .data_service import (
     load_sheet_data,
     get_data_with_filters
+)
+from .dataset import (
+    SensorDataset,
+    get_dataset,
+    load_csv_dataset
 )
\ No newline at end of file
@@ -0,0 +1,295 @@
+"""
+analytics.py
+-------------
+Cross-sensor analytics over a common time grid.
+
+Devices report on their own clocks, so readings are first aligned: every
+(device, sensor) series is resampled onto one grid of `step` seconds with a
+vectorized as-of join (the last reading at or before each grid point, if it
+is at most `tolerance` seconds old). On the aligned matrix:
+
+- correlation and covariance matrices, over the grid points where both
+  series have a value (pairwise complete, like pandas `corr`/`cov`)
+- lagged cross-correlation of every pair of series up to `max_lag`,
+  computed for all lags at once with FFTs of the masked series
+
+Results are cached by the route per query and dataset version (query cache).
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from config.settings import (
+    SENSORS,
+    ANALYTICS_MAX_GRID_POINTS,
+    ANALYTICS_MAX_SERIES,
+    ANALYTICS_MIN_PERIODS,
+    ANALYTICS_MAX_LAG,
+)
+from services.data_service import parse_date_range
+from services.dataset import to_python_values
+from services.metrics import span, timed
+from services.sync import device_activity
+
+SECOND = 1_000_000_000
+DEFAULT_STEP_SECONDS = 60
+PAIR_BATCH = 16  # pairs transformed together by the lagged cross-correlation
+
+
+def _parse_seconds(name, value):
+    if value in (None, ""):
+        return None, None
+    try:
+        seconds = float(value)
+    except ValueError:
+        return None, f"Invalid {name} '{value}'. Use a number of seconds"
+    if not math.isfinite(seconds) or seconds < 0:
+        return None, f"Invalid {name} '{value}'. Use a number of seconds"
+    return seconds, None
+
+
+def _split(value):
+    return [item.strip() for item in value.split(",") if item.strip()] if value else []
+
+
+def resolve_window(dataset, sensors=None, device_ids=None, start_date_str=None, end_date_str=None,
+                   step=None, tolerance=None, max_lag=None):
+    """
+    Query parameters → analysis window, or (None, error_message).
+
+    `sensors` and `device_ids` are comma-separated (default: every numeric
+    sensor of the dataset / every device). The default step is the slowest
+    reporting interval of the selected devices, widened when the window would
+    need more than ANALYTICS_MAX_GRID_POINTS points; `tolerance` defaults to
+    one step.
+    """
+    sensor_names = _split(sensors) or [
+        name for name, config in SENSORS.items()
+        if config["type"] == "numeric" and config["column"] in dataset.columns
+    ]
+    for name in sensor_names:
+        if name not in SENSORS:
+            return None, f"Sensor '{name}' not found"
+        if SENSORS[name]["type"] != "numeric":
+            return None, f"Sensor '{name}' is categorical"
+        if SENSORS[name]["column"] not in dataset.columns:
+            return None, f"Sensor '{name}' has no data"
+
+    activity = dataset.derived("device_activity", device_activity)
+    devices = _split(device_ids) or sorted(activity)
+    for device in devices:
+        if device not in activity:
+            return None, f"Device '{device}' not found"
+
+    series = [(device, name) for device in devices for name in sensor_names]
+    if len(series) < 2:
+        return None, "Select at least two series (sensors × devices)"
+    if len(series) > ANALYTICS_MAX_SERIES:
+        return None, f"Too many series ({len(series)}); select at most {ANALYTICS_MAX_SERIES}"
+
+    start, end, error = parse_date_range(start_date_str, end_date_str)
+    if error:
+        return None, error
+    step_seconds, error = _parse_seconds("step", step)
+    tolerance_seconds, error_tolerance = _parse_seconds("tolerance", tolerance)
+    lag_seconds, error_lag = _parse_seconds("max_lag", max_lag)
+    if error or error_tolerance or error_lag:
+        return None, error or error_tolerance or error_lag
+    if step_seconds == 0:
+        return None, "step must be positive"
+
+    # Window bounds: the requested range, clipped to the time span of the data
+    valid = len(dataset) - int(dataset.timestamps.isna().sum())
+    if not valid:
+        return None, "No data available"
+    times = dataset.timestamps.asi8
+    first, last = int(times[0]), int(times[valid - 1])
+    start_ns = max(first, start.value) if start is not None else first
+    end_ns = min(last, end.value) if end is not None else last
+    if end_ns < start_ns:
+        return None, "No data in the selected range"
+
+    if step_seconds is None:
+        intervals = [activity[device][0] for device in devices if activity[device][0]]
+        step_seconds = math.ceil(max(intervals)) if intervals else DEFAULT_STEP_SECONDS
+        span_seconds = (end_ns - start_ns) / SECOND
+        step_seconds = max(step_seconds, math.ceil(span_seconds / ANALYTICS_MAX_GRID_POINTS))
+    step_ns = max(int(step_seconds * SECOND), 1)
+
+    # Grid points are multiples of the step, so overlapping windows share them
+    grid_start = start_ns // step_ns * step_ns
+    points = (end_ns - grid_start) // step_ns + 1
+    if points > ANALYTICS_MAX_GRID_POINTS:
+        return None, (f"The window needs {points} grid points at a {step_seconds:g}s step "
+                      f"(max {ANALYTICS_MAX_GRID_POINTS}); use a larger step or a shorter range")
+
+    lags = int((lag_seconds or 0) * SECOND // step_ns)
+    if lags > ANALYTICS_MAX_LAG:
+        return None, f"max_lag is {lags} steps; at most {ANALYTICS_MAX_LAG} steps are allowed"
+
+    return {
+        "series": series,
+        "start": grid_start,
+        "points": int(points),
+        "step": step_ns,
+        "tolerance": int(tolerance_seconds * SECOND) if tolerance_seconds is not None else step_ns,
+        "lags": lags,
+    }, None
+
+
+def asof(times, values, grid, tolerance):
+    """Value of the last reading at or before each grid point, NaN when none is within `tolerance` ns."""
+    if not len(times):
+        return np.full(len(grid), np.nan)
+    index = np.searchsorted(times, grid, "right") - 1
+    found = index >= 0
+    index = np.where(found, index, 0)
+    found &= grid - times[index] <= tolerance
+    return np.where(found, values[index], np.nan)
+
+
+@timed("analytics_align")
+def align(dataset, window):
+    """Grid (epoch ns) and the (points × series) matrix of the window's series resampled onto it."""
+    grid = window["start"] + np.arange(window["points"], dtype=np.int64) * window["step"]
+    start = pd.Timestamp(grid[0] - window["tolerance"], tz="UTC")
+    end = pd.Timestamp(grid[-1], tz="UTC")
+    times = dataset.timestamps.asi8
+
+    matrix = np.empty((len(grid), len(window["series"])), dtype=np.float64)
+    positions = {}
+    for index, (device, sensor) in enumerate(window["series"]):
+        if device not in positions:
+            positions[device] = dataset.select(device, start, end)
+        rows = positions[device]
+        values = dataset.columns[SENSORS[sensor]["column"]][rows]
+        present = ~np.isnan(values)  # a missing value does not hide the previous reading
+        matrix[:, index] = asof(times[rows][present], values[present], grid, window["tolerance"])
+    return grid, matrix
+
+
+def pairwise_stats(x, y, min_periods=ANALYTICS_MIN_PERIODS):
+    """
+    Covariance and correlation of every column of `x` with every column of
+    `y` over the rows where both have a value. Returns (observations,
+    covariance, correlation); pairs with fewer than `min_periods` rows are NaN.
+    """
+    mask_x, mask_y = ~np.isnan(x), ~np.isnan(y)
+    x, y = np.where(mask_x, x, 0.0), np.where(mask_y, y, 0.0)
+    mask_x, mask_y = mask_x.astype(np.float64), mask_y.astype(np.float64)
+    return _finish(
+        mask_x.T @ mask_y, x.T @ mask_y, mask_x.T @ y, (x * x).T @ mask_y, mask_x.T @ (y * y), x.T @ y, min_periods
+    )
+
+
+def _finish(n, sum_x, sum_y, sum_xx, sum_yy, sum_xy, min_periods):
+    """Moment sums → (observations, covariance, correlation)."""
+    n = np.rint(n)  # counts from FFTs carry rounding noise
+    with np.errstate(invalid="ignore", divide="ignore"):
+        covariance = (sum_xy - sum_x * sum_y / n) / (n - 1)
+        variance_x = (sum_xx - sum_x * sum_x / n) / (n - 1)
+        variance_y = (sum_yy - sum_y * sum_y / n) / (n - 1)
+        correlation = np.clip(covariance / np.sqrt(variance_x * variance_y), -1.0, 1.0)
+    too_few = n < max(min_periods, 2)
+    covariance[too_few] = np.nan
+    correlation[too_few | (variance_x <= 0) | (variance_y <= 0)] = np.nan
+    return n.astype(np.int64), covariance, correlation
+
+
+def lagged_correlation(matrix, lags, min_periods=ANALYTICS_MIN_PERIODS):
+    """
+    Cross-correlation of every pair (i < j) for lags -lags..lags steps:
+    result[p, lags + l] = corr(series_i(t), series_j(t + l)). The six masked
+    sums behind each correlation are cross-correlations of the series, their
+    squares and their masks, computed for all lags at once with real FFTs.
+    Returns (pairs, correlations).
+    """
+    points, count = matrix.shape
+    pairs = [(i, j) for i in range(count) for j in range(i + 1, count)]
+    size = 1 << (points + lags - 1).bit_length()  # no circular wrap-around for |lag| <= lags
+    mask = ~np.isnan(matrix)
+    values = np.where(mask, matrix, 0.0)
+    spectra = {
+        "mask": np.fft.rfft(mask.astype(np.float64), size, axis=0).T,
+        "value": np.fft.rfft(values, size, axis=0).T,
+        "square": np.fft.rfft(values * values, size, axis=0).T,
+    }
+    offsets = np.r_[np.arange(size - lags, size), np.arange(lags + 1)]  # lags -lags..lags
+
+    result = np.empty((len(pairs), 2 * lags + 1), dtype=np.float64)
+    for batch in range(0, len(pairs), PAIR_BATCH):
+        first = np.array([i for i, _ in pairs[batch:batch + PAIR_BATCH]])
+        second = np.array([j for _, j in pairs[batch:batch + PAIR_BATCH]])
+
+        def cross(a, b):
+            # sum over t of a_i(t) * b_j(t + lag), for every lag
+            return np.fft.irfft(np.conj(spectra[a][first]) * spectra[b][second], size, axis=1)[:, offsets]
+
+        result[batch:batch + PAIR_BATCH] = _finish(
+            cross("mask", "mask"), cross("value", "mask"), cross("mask", "value"),
+            cross("square", "mask"), cross("mask", "square"), cross("value", "value"), min_periods,
+        )[2]
+    return pairs, result
+
+
+def _matrix(values):
+    return [to_python_values(row) for row in values]
+
+
+@timed("analytics_correlation")
+def correlation_report(dataset, window):
+    """Aligned window → correlation, covariance and (with lags) lagged cross-correlation."""
+    grid, matrix = align(dataset, window)
+
+    with span("analytics_stats"):
+        # Centered series: the moment sums below do not lose precision on large offsets (e.g. CO2 ppm)
+        with np.errstate(invalid="ignore"):
+            present = (~np.isnan(matrix)).sum(axis=0)
+            means = np.where(present > 0, np.nansum(matrix, axis=0) / np.maximum(present, 1), 0.0)
+        centered = matrix - means
+        observations, covariance, correlation = pairwise_stats(centered, centered)
+
+    keys = [f"{device}:{sensor}" for device, sensor in window["series"]]
+    step_seconds = window["step"] / SECOND
+    report = {
+        "window": {
+            "start": pd.Timestamp(grid[0], tz="UTC").isoformat(),
+            "end": pd.Timestamp(grid[-1], tz="UTC").isoformat(),
+            "step_seconds": step_seconds,
+            "tolerance_seconds": window["tolerance"] / SECOND,
+            "points": len(grid),
+        },
+        "series": [
+            {
+                "key": key,
+                "device_id": device,
+                "sensor": sensor,
+                "unit": SENSORS[sensor]["unit"],
+                "coverage": round(float(present[index]) / len(grid), 4),
+                "mean": float(means[index]) if present[index] else None,
+            }
+            for index, (key, (device, sensor)) in enumerate(zip(keys, window["series"]))
+        ],
+        "correlation": _matrix(correlation),
+        "covariance": _matrix(covariance),
+        "observations": observations.tolist(),
+    }
+
+    if window["lags"]:
+        with span("analytics_lagged"):
+            pairs, lagged = lagged_correlation(centered, window["lags"])
+        lags_seconds = (np.arange(-window["lags"], window["lags"] + 1) * step_seconds).tolist()
+        report["lagged"] = []
+        for (i, j), correlations in zip(pairs, lagged):
+            defined = ~np.isnan(correlations)
+            best = int(np.argmax(np.where(defined, np.abs(correlations), -1))) if defined.any() else None
+            report["lagged"].append({
+                "series": [keys[i], keys[j]],
+                "lags_seconds": lags_seconds,
+                "correlation": to_python_values(correlations),
+                "best_lag_seconds": lags_seconds[best] if best is not None else None,
+                "best_correlation": float(correlations[best]) if best is not None else None,
+            })
+    return report
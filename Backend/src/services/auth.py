@@ -0,0 +1,20 @@
+"""
+auth.py
+--------
+Shared-secret checks for the requests that cost CPU or change data:
+profiling, POST /jobs/<name> and POST /ingest.
+
+Each feature has its own token (config/settings.py, from the environment)
+sent in its own header; a feature without a configured token is refused.
+"""
+
+import hmac
+
+from flask import request
+
+
+def token_matches(header, token):
+    """The request carries `token` in `header` (compared in constant time); False when no token is set."""
+    if not token:
+        return False
+    return hmac.compare_digest(request.headers.get(header, "").encode("utf-8"), token.encode("utf-8"))
@@ -0,0 +1,268 @@
+"""
+cache.py
+---------
+Shared cache backends.
+
+Several server processes (gunicorn workers) share parsed source snapshots,
+/data results and export job states through one backend, so each sheet is
+downloaded and parsed once instead of once per process:
+
+- `MemoryCache`: in-process LRU with per-key TTL (single process, or tests)
+- `RedisCache`: minimal Redis (RESP) client, for a local redis-server or any
+  Redis-compatible server (e.g. benchmarks/fake_redis.py)
+
+Values are bytes. Backend errors are treated as cache misses: a cache that is
+down slows the API down but never breaks it.
+"""
+
+import hashlib
+import socket
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from config.settings import CACHE_BACKEND, CACHE_KEY_PREFIX, MEMORY_CACHE_MAX_BYTES, QUERY_CACHE_TTL, QUERY_CACHE_MAX_BYTES
+from services.metrics import CACHE_REQUESTS
+
+
+class CacheBackend:
+    """Interface of a cache backend (keys are str, values bytes, ttl in seconds)."""
+
+    shared = False  # seen by every server process (not just this one)
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def add(self, key, value, ttl=None):
+        """Set only if the key does not exist; returns True when set (used as a lock)."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache bounded by the total size of its values."""
+
+    def __init__(self, max_bytes=MEMORY_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, expires_at or None)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            self._remove(key)
+            return None
+        return entry
+
+    def _remove(self, key):
+        value, _ = self._entries.pop(key)
+        self._size -= len(value)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key, time.time())
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _store(self, key, value, ttl):
+        if key in self._entries:
+            self._remove(key)
+        if len(value) > self.max_bytes:
+            return
+        self._entries[key] = (value, time.time() + ttl if ttl else None)
+        self._size += len(value)
+        while self._size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key, value, ttl=None):
+        with self._lock:
+            if self._live(key, time.time()) is not None:
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisCache(CacheBackend):
+    """
+    Redis backend speaking RESP directly (GET, SET with PX/NX, DEL), with one
+    connection per thread. Only the commands above are needed, so there is no
+    dependency on a client library.
+    """
+
+    shared = True
+
+    def __init__(self, host="127.0.0.1", port=6379, db=0, password=None, timeout=2.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._local = threading.local()
+
+    @classmethod
+    def from_url(cls, url):
+        parsed = urlparse(url)
+        db = int(parsed.path.lstrip("/") or 0)
+        return cls(parsed.hostname or "127.0.0.1", parsed.port or 6379, db, parsed.password)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = self._local.conn = (sock, sock.makefile("rb"))
+            if self.password:
+                self._call(conn, "AUTH", self.password)
+            if self.db:
+                self._call(conn, "SELECT", self.db)
+        return conn
+
+    def _close(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            conn[1].close()
+            conn[0].close()
+
+    @staticmethod
+    def _encode(args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n" % len(arg))
+            parts.append(arg)
+            parts.append(b"\r\n")
+        return b"".join(parts)
+
+    @classmethod
+    def _read_reply(cls, reader):
+        line = reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by the cache server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode("utf-8")
+        if kind == b"-":
+            raise RedisError(payload.decode("utf-8"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Connection closed by the cache server")
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            return None if length < 0 else [cls._read_reply(reader) for _ in range(length)]
+        raise RedisError(f"Unexpected reply: {line[:50]!r}")
+
+    def _call(self, conn, *args):
+        conn[0].sendall(self._encode(args))
+        return self._read_reply(conn[1])
+
+    def execute(self, *args):
+        """Send one command; raises OSError/RedisError on failure."""
+        try:
+            return self._call(self._connection(), *args)
+        except (OSError, ValueError):
+            self._close()
+            raise
+
+    def _safe(self, default, *args):
+        try:
+            return self.execute(*args)
+        except (OSError, RedisError):
+            return default
+
+    def get(self, key):
+        return self._safe(None, "GET", key)
+
+    def set(self, key, value, ttl=None):
+        args = ["SET", key, value] + (["PX", int(ttl * 1000)] if ttl else [])
+        self._safe(None, *args)
+
+    def add(self, key, value, ttl=None):
+        args = ["SET", key, value, "NX"] + (["PX", int(ttl * 1000)] if ttl else [])
+        return self._safe(None, *args) == "OK"
+
+    def delete(self, key):
+        self._safe(None, "DEL", key)
+
+
+def build_cache(spec):
+    """Backend for a CACHE_BACKEND value: "memory" or a redis:// URL."""
+    if isinstance(spec, CacheBackend):
+        return spec
+    if spec == "memory":
+        return MemoryCache()
+    if spec.startswith("redis://"):
+        return RedisCache.from_url(spec)
+    raise ValueError(f"Unknown cache backend '{spec}'. Use 'memory' or a redis:// URL")
+
+
+_cache = build_cache(CACHE_BACKEND)
+
+
+def get_cache():
+    return _cache
+
+
+def configure_cache(spec):
+    """Replace the process-wide backend (e.g. from a benchmark or a worker hook)."""
+    global _cache
+    _cache = build_cache(spec)
+    return _cache
+
+
+def cache_key(*parts):
+    return CACHE_KEY_PREFIX + ":".join(str(part) for part in parts)
+
+
+def query_key(namespace, dataset, params):
+    """
+    Key for a query result on `dataset`, or None when the dataset has no
+    digest (its content is not identified across processes).
+    """
+    if getattr(dataset, "digest", None) is None:
+        return None
+    query = "&".join(f"{name}={value}" for name, value in sorted(params.items()))
+    return cache_key("query", namespace, dataset.digest, hashlib.sha1(query.encode("utf-8")).hexdigest())
+
+
+def get_query_result(key):
+    if key is None:
+        return None
+    value = get_cache().get(key)
+    CACHE_REQUESTS.inc(cache="query", result="hit" if value is not None else "miss")
+    return value
+
+
+def set_query_result(key, body):
+    if key is not None and len(body) <= QUERY_CACHE_MAX_BYTES:
+        get_cache().set(key, body, QUERY_CACHE_TTL)
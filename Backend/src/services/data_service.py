@@ -4,174 +4,282 @@ data_service.py
 Business logic for loading, cleaning, and filtering sensor data.
 """
 
-import requests
-import csv
-import io
 from datetime import datetime
-from config.settings import SHEET_URLS, CSV_FILE, SENSORS
+import numpy as np
+import pandas as pd
+from config.settings import SENSORS
+from services.dataset import SensorDataset, get_dataset, to_python_values
+from services.metrics import timed
 
+# Response layouts of /data: a list of row objects, or parallel arrays (see columnar_payload)
+LAYOUTS = ("records", "columnar")
 
+
+@timed("load_sheet_data")
 def load_sheet_data():
     """
     Loads data from Google Sheets (preferred) or CSV fallback.
     Returns a list of dictionaries (rows).
+    The parsed dataset is cached by the shared data layer; treat the list as read-only.
     """
-    # Try each Google Sheet URL
-    for i, sheet_url in enumerate(SHEET_URLS):
-        try:
-            response = requests.get(sheet_url, timeout=10)
-            response.raise_for_status()
-
-            # If Google returns an HTML error page
-            if response.text.strip().startswith("<HTML>"):
-                raise Exception("Google Sheet not publicly accessible")
-
-            csv_data = csv.reader(io.StringIO(response.text))
-            rows = list(csv_data)
-            if not rows:
-                raise Exception("Google Sheet is empty")
-
-            return _process_csv_data(rows)
-        except Exception:
-            continue
-
-    # Fallback → local CSV file
-    try:
-        with open(CSV_FILE, "r", encoding="utf-8") as file:
-            csv_reader = csv.reader(file)
-            rows = list(csv_reader)
-
-        if not rows:
-            raise Exception("Local CSV is empty")
-
-        return _process_csv_data(rows)
-    except Exception as e:
-        print(f"[ERROR] Failed to load CSV: {e}")
-        return []
+    return get_dataset().records
 
 
+@timed("_process_csv_data")
 def _process_csv_data(rows):
     """
     Convert CSV rows into a list of dictionaries.
     Cleans numeric values and preserves timestamps.
     """
-    headers = rows[0]
-    data = []
-
-    for row in rows[1:]:
-        if len(row) >= len(headers):  # Ignore incomplete rows
-            row_dict = {}
-            for i, header in enumerate(headers):
-                value = row[i] if i < len(row) else ""
-                row_dict[header] = value
-
-            processed_row = {}
-            for key, value in row_dict.items():
-                if key == "timestamp":
-                    processed_row[key] = value
-                elif key == "deviceId":
-                    processed_row[key] = value
-                elif key in ["quality", "light"]:
-                    processed_row[key] = value
-                else:
-                    try:
-                        processed_row[key] = float(value.replace(",", ".")) if value else None
-                    except (ValueError, AttributeError):
-                        processed_row[key] = value
-            data.append(processed_row)
-
-    return data
-
-
-def _parse_iso_date(date_str):
-    """Convert ISO string to datetime object."""
+    return SensorDataset.from_rows(rows).records
+
+
+def parse_date_param(date_str):
+    """Parse a start_date/end_date query value (YYYY-MM-DD or ISO). Returns None when invalid."""
     try:
         return datetime.fromisoformat(date_str.replace("Z", "+00:00"))
     except Exception:
-        return None
+        try:
+            return datetime.strptime(date_str, "%Y-%m-%d")
+        except Exception:
+            return None
 
 
-def _filter_by_date(data, start_date=None, end_date=None):
-    """Filter dataset by date range."""
-    if not data:
-        return []
+def to_utc_timestamp(value):
+    """Parsed date filter → UTC pandas Timestamp; dates without an offset are taken as UTC."""
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize("UTC") if timestamp.tzinfo is None else timestamp.tz_convert("UTC")
 
-    filtered = []
-    for item in data:
-        item_date = _parse_iso_date(item.get("timestamp"))
-        if not item_date:
-            continue
 
-        if start_date and item_date < start_date:
-            continue
-        if end_date and item_date > end_date:
+def parse_date_range(start_date_str=None, end_date_str=None):
+    """start_date/end_date query values → (start, end, error_message) as UTC timestamps (None when absent)."""
+    bounds = []
+    for name, value in (("start_date", start_date_str), ("end_date", end_date_str)):
+        if not value:
+            bounds.append(None)
             continue
+        parsed = parse_date_param(value)
+        if parsed is None:
+            return None, None, f"Invalid {name} format. Use YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS"
+        bounds.append(to_utc_timestamp(parsed))
+    return bounds[0], bounds[1], None
+
+
+# Arrival mark of a source missing from `since`: all of its rows are new
+NO_MARK = np.iinfo(np.int64).min
+
+
+def parse_since(since_str):
+    """
+    `since` query value → {source name: epoch-ms arrival mark}, or None when invalid.
+    Accepts a previous high_water_mark ("name:ms,name:ms"), or epoch milliseconds
+    or an ISO date for every source (key None).
+    """
+    if since_str.isdigit():
+        return {None: int(since_str)}
+    parsed = parse_date_param(since_str)
+    if parsed is not None:
+        return {None: to_epoch_ms(to_utc_timestamp(parsed))}
+    marks = {}
+    for part in since_str.split(","):
+        name, _, value = part.rpartition(":")
+        if not name or not value.isdigit():
+            return None
+        marks[name] = int(value)
+    return marks
+
+
+def to_epoch_ms(timestamp):
+    return int(pd.Timestamp(timestamp).value // 1_000_000)
+
+
+def _row_sources(dataset):
+    """(source names, index of each row's source); a dataset that is not merged is one unnamed source."""
+    if dataset.runs is not None:
+        return dataset.runs
+    return [None], np.zeros(len(dataset), dtype=np.int32)
 
-        filtered.append(item)
 
-    return filtered
+def arrived_after(dataset, positions, marks):
+    """The `positions` of rows that arrived after their source's mark in `marks`."""
+    names, codes = _row_sources(dataset)
+    limits = np.array([marks.get(name, marks.get(None, NO_MARK)) for name in names], dtype=np.int64)
+    return positions[dataset.arrival_ms()[positions] > limits[codes[positions]]]
 
 
+def high_water_mark(dataset, positions, marks=None):
+    """
+    Cursor for the next delta: per source, the latest arrival among the
+    selected rows, or its previous mark when none of them is from it.
+    "name:ms,name:ms" (plain epoch ms for a dataset that is not merged);
+    None when there is nothing to mark.
+    """
+    marks = marks or {}
+    names, codes = _row_sources(dataset)
+    arrivals, codes = dataset.arrival_ms()[positions], codes[positions]
+    latest = []
+    for index, name in enumerate(names):
+        mine = arrivals[codes == index]
+        mark = int(mine.max()) if len(mine) else marks.get(name, marks.get(None))
+        if mark is not None:
+            latest.append((name, mark))
+    if not latest:
+        return None
+    if names == [None]:
+        return str(latest[0][1])
+    return ",".join(f"{name}:{mark}" for name, mark in latest)
+
+
+class RowSelection:
+    """Rows of the dataset matching the /data filters (positions in time order), shared by every layout."""
+
+    def __init__(self, dataset, positions, sensor, since, mark):
+        self.dataset = dataset
+        self.positions = positions
+        self.sensor = sensor
+        self.since = since
+        self.high_water_mark = mark
+
+
+@timed("select_rows")
+def select_rows(sensor=None, device_id=None, start_date_str=None, end_date_str=None, since_str=None,
+                dataset=None):
+    """
+    Validate the /data filters and select the matching rows by binary search
+    on the columnar dataset (`dataset`, default the current one). With a sensor, rows without a value for it are
+    left out. `since` keeps only the rows that arrived after that high-water
+    mark, whatever their reading time, so late uploads are delivered too.
+    Returns (RowSelection, error_message).
+    """
+    if sensor and sensor not in SENSORS:
+        return None, f"Sensor '{sensor}' not found"
+    start, end, error = parse_date_range(start_date_str, end_date_str)
+    if error:
+        return None, error
+    since = None
+    if since_str:
+        since = parse_since(since_str)
+        if since is None:
+            return None, "Invalid since format. Use a high_water_mark, epoch milliseconds or YYYY-MM-DDTHH:MM:SS"
+
+    dataset = get_dataset() if dataset is None else dataset
+    positions = dataset.select(device_id, start, end)
+    if since is not None:
+        positions = arrived_after(dataset, positions, since)
+
+    # The mark covers every selected reading, so the next delta starts after all of them
+    mark = high_water_mark(dataset, positions, since)
+    if sensor:
+        values = dataset.columns.get(SENSORS[sensor]["column"])
+        positions = positions[pd.notna(values[positions])] if values is not None else positions[:0]
+    return RowSelection(dataset, positions, sensor, since, mark), None
+
+
+def records_payload(selection):
+    """Selected rows as the default records layout: row objects, or per-sensor records with a sensor."""
+    records = selection.dataset.records
+    rows = [records[position] for position in selection.positions]
+    return _sensor_records(rows, selection.sensor) if selection.sensor else rows
+
+
+@timed("get_data_with_filters")
 def get_data_with_filters(sensor=None, device_id=None, start_date_str=None, end_date_str=None):
     """
     Apply filters to the dataset.
     Returns (filtered_data, error_message).
     """
     try:
-        # Load full dataset
-        all_data = load_sheet_data()
-
-        # Device filter
-        if device_id:
-            all_data = [item for item in all_data if item.get("deviceId") == device_id]
-
-        # Date filters
-        start_date = None
-        end_date = None
-
-        if start_date_str:
-            try:
-                start_date = datetime.fromisoformat(start_date_str.replace("Z", "+00:00"))
-            except Exception:
-                try:
-                    start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
-                except Exception:
-                    return None, "Invalid start_date format. Use YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS"
-
-        if end_date_str:
-            try:
-                end_date = datetime.fromisoformat(end_date_str.replace("Z", "+00:00"))
-            except Exception:
-                try:
-                    end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
-                except Exception:
-                    return None, "Invalid end_date format. Use YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS"
-
-        filtered_data = _filter_by_date(all_data, start_date, end_date)
-
-        # Sensor filter
-        if sensor:
-            if sensor not in SENSORS:
-                return None, f"Sensor '{sensor}' not found"
-
-            column = SENSORS[sensor]["column"]
-            sensor_data = []
-
-            for item in filtered_data:
-                if column in item and item[column] is not None:
-                    sensor_data.append({
-                        "timestamp": item["timestamp"],
-                        "deviceId": item["deviceId"],
-                        "value": item[column],
-                        "unit": SENSORS[sensor]["unit"],
-                        "sensor": sensor,
-                        "type": SENSORS[sensor]["type"]
-                    })
-
-            return sensor_data, None
-
-        # Default → return full dataset
-        return filtered_data, None
+        selection, error = select_rows(sensor, device_id, start_date_str, end_date_str)
+        if error:
+            return None, error
+        return records_payload(selection), None
+
+    except Exception as e:
+        return None, str(e)
+
+
+def _sensor_records(rows, sensor):
+    """Rows → per-sensor records (rows without a value for the sensor are skipped)."""
+    column = SENSORS[sensor]["column"]
+    sensor_data = []
+
+    for item in rows:
+        if column in item and item[column] is not None:
+            sensor_data.append({
+                "timestamp": item["timestamp"],
+                "deviceId": item["deviceId"],
+                "value": item[column],
+                "unit": SENSORS[sensor]["unit"],
+                "sensor": sensor,
+                "type": SENSORS[sensor]["type"]
+            })
+
+    return sensor_data
+
+
+def columnar_payload(timestamps, devices, values, extra=None):
+    """
+    Compact layout=columnar body: sensor metadata and the device dictionary
+    once in `header`, then parallel arrays of epoch-millisecond timestamps,
+    device indexes and one value array per sensor (`extra` adds more arrays,
+    e.g. rollup statistics). `timestamps` are UTC epoch nanoseconds.
+    """
+    codes, uniques = pd.factorize(devices)
+    return {
+        "records": len(timestamps),
+        "header": {
+            "timestamp": "epoch_ms",
+            "devices": uniques.tolist(),
+            "sensors": {
+                name: {key: SENSORS[name][key] for key in ("unit", "type", "description")} for name in values
+            },
+        },
+        "data": {
+            "timestamp": (timestamps // 1_000_000).tolist(),
+            "device": codes.tolist(),
+            "values": {name: to_python_values(column) for name, column in values.items()},
+            **{name: to_python_values(column) for name, column in (extra or {}).items()},
+        },
+    }
+
+
+def columnar_rows_payload(selection):
+    """
+    Selected rows as the layout=columnar payload: with a sensor, its value
+    array; without one, every configured sensor gets a value array (null
+    where missing).
+    """
+    dataset, positions = selection.dataset, selection.positions
+    if not len(dataset):
+        return columnar_payload(np.array([], dtype=np.int64), np.array([], dtype=object), {})
+    names = [selection.sensor] if selection.sensor else [
+        name for name, config in SENSORS.items() if config["column"] in dataset.columns
+    ]
+    values = {}
+    for name in names:
+        column = dataset.columns.get(SENSORS[name]["column"])
+        values[name] = column[positions] if column is not None else np.full(len(positions), np.nan)
+    return columnar_payload(dataset.timestamps.asi8[positions], dataset.columns["deviceId"][positions], values)
+
+
+LAYOUT_PAYLOADS = {"records": records_payload, "columnar": columnar_rows_payload}
+
+
+@timed("get_raw_data")
+def get_raw_data(sensor=None, device_id=None, start_date_str=None, end_date_str=None, since_str=None,
+                 layout="records", dataset=None):
+    """
+    Raw rows of `dataset` (default the current one) for /data in the requested
+    layout, optionally only those newer than `since`. Both layouts are built
+    from the same row selection.
+    Returns (data, high_water_mark, error_message); the high-water mark is
+    the value to send as `since` next time.
+    """
+    try:
+        selection, error = select_rows(sensor, device_id, start_date_str, end_date_str, since_str, dataset)
+        if error:
+            return None, None, error
+        return LAYOUT_PAYLOADS[layout](selection), selection.high_water_mark, None
 
     except Exception as e:
-        return None, str(e)
\ No newline at end of file
+        return None, None, str(e)
@@ -0,0 +1,529 @@
+"""
+dataset.py
+-----------
+Shared data-access layer for the API and the AI models.
+
+Sensor tables are parsed once into a columnar `SensorDataset` (NumPy arrays per
+column, decimal commas normalized, validated and sorted by timestamp) and cached. The Flask
+routes consume the legacy list-of-dicts view (`records`), the model classes a
+pandas view (`frame`) built over the same arrays without copying.
+"""
+
+import csv
+import io
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import requests
+
+from config.settings import SHEET_URLS, CSV_FILE, SENSORS, DATA_CACHE_TTL, TIMEZONE
+from services.metrics import span, CACHE_REQUESTS, UPSTREAM_REQUESTS, UPSTREAM_FALLBACKS
+from services.quality import validate
+
+# Columns kept as text; every other column is parsed as a number
+TEXT_COLUMNS = {"timestamp", "deviceId"} | {
+    cfg["column"] for cfg in SENSORS.values() if cfg["type"] == "categorical"
+}
+
+
+class SensorDataset:
+    """
+    Immutable, columnar snapshot of a sensor table.
+
+    `columns` maps each CSV header to a NumPy array: float64 for numeric
+    columns (NaN for empty, non-numeric or out-of-range cells), object arrays
+    for text columns. Tables parsed with `from_rows` went through the
+    data-quality stage: every row has a timestamp and a device, rows are in
+    time order and (deviceId, timestamp) is unique.
+    """
+
+    def __init__(self, headers, columns, timestamps, source=None, version=0):
+        self.headers = list(headers)
+        self.columns = columns
+        self.timestamps = timestamps  # datetime64[ns, UTC] DatetimeIndex
+        self.source = source
+        self.version = version
+        self.digest = None  # content id shared by every process serving the same data
+        self.quality = None  # report of the data-quality stage (see services/quality.py)
+        self.arrivals = None  # epoch ms each row reached the server (see track_arrivals); None → its reading time
+        self.runs = None  # merged datasets: (source names, index of each row's source)
+        self.loaded_at = time.time()
+        self._frame = None
+        self._records = None
+        self._derived = {}
+
+    def __getstate__(self):
+        # Pickled for worker processes: the derived views and values are rebuilt lazily
+        return {**self.__dict__, "_frame": None, "_records": None, "_derived": {}}
+
+    def derived(self, key, compute):
+        """Value derived from this (immutable) dataset, computed by `compute(self)` on first use."""
+        value = self._derived.get(key)
+        if value is None:
+            value = self._derived[key] = compute(self)
+        return value
+
+    def arrival_ms(self):
+        """Epoch-ms arrival time of each row; the reading time for rows loaded without one."""
+        if self.arrivals is not None:
+            return self.arrivals
+        return self.derived("arrival_ms", lambda dataset: dataset.timestamps.asi8 // 1_000_000)
+
+    def to_bytes(self):
+        """
+        Data-only serialization for the shared cache (an .npz archive, no
+        pickle): numeric columns as float64, text columns as integer codes
+        plus their distinct values in JSON, the metadata in JSON.
+        """
+        names = list(self.columns)
+        arrays = {"timestamps": self.timestamps.asi8}
+        if self.arrivals is not None:
+            arrays["arrivals"] = self.arrivals
+        for index, name in enumerate(names):
+            values = self.columns[name]
+            if values.dtype == object:
+                codes, uniques = pd.factorize(values)  # missing cells → -1
+                arrays[f"codes{index}"] = codes
+                values = _json_array(uniques.tolist())
+            arrays[f"column{index}"] = values
+        arrays["meta"] = _json_array({
+            "headers": self.headers, "columns": names, "source": self.source, "version": self.version,
+            "digest": self.digest, "quality": self.quality,
+        })
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Dataset written by to_bytes(); never unpickles anything."""
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            meta = _from_json_array(arrays["meta"])
+            columns = {}
+            for index, name in enumerate(meta["columns"]):
+                values = arrays[f"column{index}"]
+                if f"codes{index}" in arrays:
+                    codes = arrays[f"codes{index}"]
+                    uniques = np.array(_from_json_array(values) + [None], dtype=object)
+                    values = uniques[codes]  # code -1 picks the trailing None
+                columns[name] = values
+            timestamps = pd.DatetimeIndex(arrays["timestamps"].view("datetime64[ns]")).tz_localize("UTC")
+            arrivals = arrays["arrivals"] if "arrivals" in arrays else None
+        dataset = cls(meta["headers"], columns, timestamps, meta["source"], meta["version"])
+        dataset.digest = meta["digest"]
+        dataset.quality = meta["quality"]
+        dataset.arrivals = arrivals
+        return dataset
+
+    @classmethod
+    def from_rows(cls, rows, source=None, version=0):
+        """Build a dataset from raw CSV rows (header row first)."""
+        if not rows:
+            return cls.empty(source, version)
+
+        headers = rows[0]
+        width = len(headers)
+        body = rows[1:]
+        incomplete = 0
+        if any(len(row) != width for row in body):
+            # Drop incomplete rows, trim extra cells
+            complete = [row[:width] for row in body if len(row) >= width]
+            incomplete = len(body) - len(complete)
+            body = complete
+        raw_columns = list(zip(*body)) if body else [() for _ in headers]
+
+        columns = {}
+        for header, values in zip(headers, raw_columns):
+            if header in TEXT_COLUMNS:
+                columns[header] = np.array(values, dtype=object)
+            else:
+                columns[header] = _parse_numeric(values)
+
+        timestamps = parse_timestamps(columns.get("timestamp", np.array([], dtype=object))).asi8
+
+        # Reject/clear invalid data, order by time and drop re-uploaded duplicates
+        with span("validate_dataset"):
+            columns, timestamps, report = validate(columns, timestamps, TEXT_COLUMNS, incomplete)
+
+        dataset = cls(headers, columns, pd.DatetimeIndex(timestamps.view("datetime64[ns]")).tz_localize("UTC"),
+                      source, version)
+        dataset.quality = report
+        return dataset
+
+    @classmethod
+    def empty(cls, source=None, version=0):
+        return cls([], {}, pd.DatetimeIndex([], tz="UTC"), source, version)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def numeric_columns(self):
+        return [name for name, values in self.columns.items() if values.dtype == np.float64]
+
+    def select(self, device_id=None, start=None, end=None):
+        """
+        Positions of the rows matching a device and an inclusive time range, in
+        time order. `start`/`end` are tz-aware timestamps; rows without a valid
+        timestamp are never selected. The range is found by binary search since
+        rows are sorted by time.
+        """
+        valid = len(self) - int(self.timestamps.isna().sum())  # NaT rows are sorted last
+        values = self.timestamps.asi8[:valid]
+        low = np.searchsorted(values, pd.Timestamp(start).value, "left") if start is not None else 0
+        high = np.searchsorted(values, pd.Timestamp(end).value, "right") if end is not None else valid
+        positions = np.arange(low, high)
+        if device_id and len(positions):
+            positions = positions[self.columns["deviceId"][low:high] == device_id]
+        return positions
+
+    @property
+    def frame(self):
+        """
+        pandas view for the models: arrays are shared, not copied, and `timestamp`
+        is the parsed UTC timestamp. Use `frame.copy(deep=False)` before adding columns.
+        """
+        if self._frame is None:
+            data = {name: values for name, values in self.columns.items()}
+            if "timestamp" in data:
+                data["timestamp"] = self.timestamps
+            self._frame = pd.DataFrame(data, copy=False)
+        return self._frame
+
+    @property
+    def records(self):
+        """
+        Legacy list-of-dicts view used by the API (built once per dataset).
+        Callers must treat it as read-only; it is shared between requests.
+        """
+        if self._records is None:
+            with span("build_records"):
+                self._records = self._build_records()
+        return self._records
+
+    def _build_records(self):
+        values = [to_python_values(self.columns[header]) for header in self.headers]
+        return [dict(zip(self.headers, row)) for row in zip(*values)]
+
+
+def _json_array(value):
+    return np.frombuffer(json.dumps(value).encode("utf-8"), dtype=np.uint8)
+
+
+def _from_json_array(array):
+    return json.loads(array.tobytes().decode("utf-8"))
+
+
+def _parse_numeric(values):
+    """Vectorized decimal-comma parsing; falls back to the legacy mixed column on garbage."""
+    try:
+        # Fast path: one string replace for the whole column, then C-level parsing.
+        # The length check rejects cells that split into several numbers.
+        parsed = np.fromstring("\n".join(values).replace(",", "."), dtype=np.float64, sep="\n")
+        if len(parsed) == len(values):
+            return parsed
+    except ValueError:
+        pass  # empty cells or non-numeric text
+
+    raw = pd.Series(values, dtype=object)
+    parsed = pd.to_numeric(raw.str.replace(",", ".", regex=False), errors="coerce")
+    invalid = parsed.isna() & (raw != "")
+    if not invalid.any():
+        return parsed.to_numpy(dtype=np.float64)
+
+    mixed = []
+    for value in values:
+        try:
+            mixed.append(float(value.replace(",", ".")) if value else None)
+        except (ValueError, AttributeError):
+            mixed.append(value)
+    return np.array(mixed, dtype=object)
+
+
+def parse_timestamps(raw):
+    """
+    Parse ISO-8601 timestamps to a UTC DatetimeIndex (NaT when unparseable).
+
+    The ESP32 format 'YYYY-MM-DDTHH:MM:SS±HH:MM' is decoded with NumPy on the
+    fixed character positions; anything else goes through pandas' ISO parser.
+    """
+    raw = np.asarray(raw, dtype=object)
+    result = np.full(len(raw), np.iinfo(np.int64).min, dtype=np.int64)  # NaT
+    if len(raw) == 0:
+        return pd.DatetimeIndex(result.view("datetime64[ns]")).tz_localize("UTC")
+
+    text = raw.astype(str)
+    fast = np.char.str_len(text) == len("2025-01-01T00:00:00-06:00")
+    if fast.any():
+        chars = text[fast].astype("U25")
+        codes = chars.view(np.uint32).reshape(-1, 25)
+        sign = codes[:, 19]
+        separators_ok = (
+            (codes[:, [4, 7]] == ord("-")).all(axis=1) & (codes[:, 10] == ord("T"))
+            & (codes[:, [13, 16, 22]] == ord(":")).all(axis=1)
+            & ((sign == ord("+")) | (sign == ord("-")))
+        )
+        try:
+            local = chars.astype("U19").astype("datetime64[s]").astype(np.int64)
+        except ValueError:
+            separators_ok[:] = False
+            local = np.zeros(len(chars), dtype=np.int64)
+        digits = codes.astype(np.int64) - ord("0")
+        offset = (digits[:, 20] * 10 + digits[:, 21]) * 3600 + (digits[:, 23] * 10 + digits[:, 24]) * 60
+        offset = np.where(sign == ord("-"), -offset, offset)
+
+        fast_positions = np.flatnonzero(fast)
+        result[fast_positions[separators_ok]] = (local - offset)[separators_ok] * 1_000_000_000
+        fast[fast_positions[~separators_ok]] = False
+
+    slow = ~fast
+    if slow.any():
+        parsed = pd.to_datetime(pd.Series(raw[slow], dtype=object), format="ISO8601", utc=True, errors="coerce")
+        result[slow] = parsed.dt.as_unit("ns").astype("int64").to_numpy()
+
+    return pd.DatetimeIndex(result.view("datetime64[ns]")).tz_localize("UTC")
+
+
+class ArrivalLedger:
+    """
+    Row keys (hash of deviceId and timestamp) and arrival times (epoch ms) of
+    a source's last run: all track_arrivals needs to stamp the next one. It is
+    small and data only, so processes share it through the cache.
+    """
+
+    def __init__(self, keys, arrivals):
+        self.keys = keys
+        self.arrivals = arrivals
+
+    @classmethod
+    def of(cls, dataset):
+        return cls(_row_keys(dataset), dataset.arrival_ms())
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        np.savez(buffer, keys=self.keys, arrivals=self.arrivals)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            return cls(arrays["keys"], arrays["arrivals"])
+
+
+def track_arrivals(dataset, previous=None, now=None):
+    """
+    Arrival times (epoch ms) for a new run of a source, returned with its
+    keys as the run's ArrivalLedger: rows already in the `previous` ledger
+    keep theirs, new rows arrive `now`, after every earlier arrival. On a
+    first load the rows are taken as having arrived at their reading time,
+    so a restart does not send the history to delta clients again.
+    """
+    times = dataset.timestamps.asi8 // 1_000_000
+    now_ms = int((time.time() if now is None else now) * 1000)
+    row_keys = _row_keys(dataset)
+    if previous is None:
+        return ArrivalLedger(row_keys, np.minimum(times, now_ms))
+    known = previous.arrivals
+    if len(known):
+        now_ms = max(now_ms, int(known.max()) + 1)
+    keys = pd.Index(previous.keys)
+    first = ~keys.duplicated()
+    matches = keys[first].get_indexer(row_keys)
+    return ArrivalLedger(row_keys, np.where(matches >= 0, known[first][matches], now_ms).astype(np.int64))
+
+
+def _row_keys(dataset):
+    """64-bit hash of each row's (deviceId, timestamp)."""
+    devices = dataset.columns.get("deviceId", np.full(len(dataset), "", dtype=object))
+    keys = pd.DataFrame({"deviceId": devices, "timestamp": dataset.timestamps.asi8})
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+def to_local_time(timestamps):
+    """UTC timestamps (DatetimeIndex, Series or epoch-ns int64) → DatetimeIndex in the sites' TIMEZONE."""
+    if isinstance(timestamps, np.ndarray) and timestamps.dtype == np.int64:
+        timestamps = timestamps.view("datetime64[ns]")
+    index = pd.DatetimeIndex(timestamps)
+    return (index.tz_localize("UTC") if index.tz is None else index).tz_convert(TIMEZONE)
+
+
+def to_python_values(values):
+    """Column → list of Python values with None for missing numbers."""
+    if values.dtype == np.float64:
+        return np.where(np.isnan(values), None, values).tolist()
+    return values.tolist()
+
+
+def fetch_rows(sheet_urls=None, csv_file=None, name=None):
+    """
+    Download raw CSV rows from Google Sheets (preferred, URLs tried in order) or
+    the CSV fallback. Defaults to SHEET_URLS / CSV_FILE; `name` prefixes the
+    source label of the upstream metrics.
+    Returns (rows, source) or ([], None) when nothing could be loaded.
+    """
+    sheet_urls = SHEET_URLS if sheet_urls is None else sheet_urls
+    csv_file = CSV_FILE if csv_file is None else csv_file
+    prefix = f"{name}/" if name else ""
+
+    # Try each Google Sheet URL
+    for index, sheet_url in enumerate(sheet_urls):
+        source = f"{prefix}sheet_{index}"
+        try:
+            with span("download_sheet"):
+                response = requests.get(sheet_url, timeout=10)
+                response.raise_for_status()
+
+            # If Google returns an HTML error page
+            if response.text.strip().startswith("<HTML>"):
+                raise Exception("Google Sheet not publicly accessible")
+
+            with span("read_csv"):
+                rows = list(csv.reader(io.StringIO(response.text)))
+            if not rows:
+                raise Exception("Google Sheet is empty")
+
+            UPSTREAM_REQUESTS.inc(source=source, outcome="success")
+            return rows, sheet_url
+        except Exception:
+            UPSTREAM_REQUESTS.inc(source=source, outcome="failure")
+            continue
+
+    if not csv_file:
+        return [], None
+
+    # Fallback → local CSV file
+    UPSTREAM_FALLBACKS.inc()
+    try:
+        with span("read_csv"):
+            rows = read_csv_rows(csv_file)
+        UPSTREAM_REQUESTS.inc(source=f"{prefix}csv", outcome="success")
+        return rows, csv_file
+    except Exception as e:
+        UPSTREAM_REQUESTS.inc(source=f"{prefix}csv", outcome="failure")
+        print(f"[ERROR] Failed to load CSV: {e}")
+        return [], None
+
+
+def read_csv_rows(path):
+    """Read raw rows from a local CSV file."""
+    with open(path, "r", encoding="utf-8") as file:
+        rows = list(csv.reader(file))
+    if not rows:
+        raise Exception("Local CSV is empty")
+    return rows
+
+
+class DataStore:
+    """
+    Thread-safe cache holding the current dataset. The loader (called with
+    `force` and returning a SensorDataset) is only called when the last check is older than `ttl`
+    seconds (or on refresh()). A loader may return the cached dataset again
+    when nothing changed; only new datasets get a new version and are
+    passed to the listeners.
+    """
+
+    def __init__(self, loader, ttl=DATA_CACHE_TTL, name="api"):
+        self.loader = loader
+        self.ttl = ttl
+        self.name = name  # label for the cache metrics
+        self.listeners = []  # called with each newly loaded dataset
+        self._dataset = None
+        self._checked_at = 0.0
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def _fresh(self):
+        return self._dataset is not None and time.time() - self._checked_at < self.ttl
+
+    def get(self, force_refresh=False):
+        if not force_refresh and self._fresh():
+            CACHE_REQUESTS.inc(cache=self.name, result="hit")
+            return self._dataset
+
+        with self._lock:
+            # Another thread may have refreshed while we waited
+            if not force_refresh and self._fresh():
+                CACHE_REQUESTS.inc(cache=self.name, result="hit")
+                return self._dataset
+
+            CACHE_REQUESTS.inc(cache=self.name, result="miss")
+            dataset = self.loader(force_refresh)
+            self._checked_at = time.time()
+            if dataset is self._dataset:
+                return dataset
+
+            self._version += 1
+            dataset.version = self._version
+            # Failed loads are not cached, so the next request retries
+            if len(dataset):
+                self._dataset = dataset
+                self._notify(dataset)
+            return dataset
+
+    def _notify(self, dataset):
+        for listener in self.listeners:
+            try:
+                listener(dataset)
+            except Exception as e:
+                print(f"[ERROR] Dataset refresh listener failed: {e}")
+
+    def refresh(self):
+        return self.get(force_refresh=True)
+
+    def expire(self):
+        """Check the sources again on the next get(), keeping the current dataset meanwhile."""
+        self._checked_at = 0.0
+
+    def invalidate(self):
+        with self._lock:
+            self._dataset = None
+
+
+def _load_from_sources(force=False):
+    # Imported here: the source registry builds on this module
+    from services.sources import registry
+
+    return registry.load(force)
+
+
+# Process-wide store backing the API
+_store = DataStore(_load_from_sources)
+
+# Local CSV datasets (models), keyed by absolute path and invalidated on file change
+_csv_cache = {}
+_csv_lock = threading.Lock()
+
+
+def get_dataset(force_refresh=False):
+    """Current API dataset (cached for DATA_CACHE_TTL seconds)."""
+    return _store.get(force_refresh)
+
+
+def expire_dataset():
+    """Make the next get_dataset() check the sources (e.g. after rows were ingested)."""
+    _store.expire()
+
+
+def add_refresh_listener(listener):
+    """Call `listener(dataset)` every time the API dataset is (re)loaded."""
+    _store.listeners.append(listener)
+
+
+def load_csv_dataset(path):
+    """Parse a local CSV once and reuse it until the file changes."""
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    with _csv_lock:
+        cached = _csv_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            CACHE_REQUESTS.inc(cache="csv", result="hit")
+            return cached[1]
+        CACHE_REQUESTS.inc(cache="csv", result="miss")
+        with span("parse_dataset"):
+            dataset = SensorDataset.from_rows(read_csv_rows(path), source=path)
+        _csv_cache[path] = (mtime, dataset)
+        return dataset
@@ -0,0 +1,322 @@
+"""
+exports.py
+-----------
+Asynchronous bulk exports.
+
+`POST /exports` validates the filters and queues an `ExportJob`; a small
+thread pool writes the matching rows to EXPORT_DIR in chunks (gzip CSV or
+Parquet), so large ranges never go through the JSON response path.
+Rows are selected on the columnar dataset, not on the legacy records.
+
+Job states are also published to the shared cache, so any server process
+can report progress and serve a finished file from EXPORT_DIR. A state read
+from the cache is data only: the file served is always EXPORT_DIR/<name
+built from the checked id and format>, never a path taken from the cache.
+
+Files older than EXPORT_RETENTION (by modification time, whichever process
+or run wrote them) and abandoned partial files are swept from EXPORT_DIR.
+"""
+
+import gzip
+import importlib.util
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from config.settings import SENSORS, EXPORT_DIR, EXPORT_CHUNK_ROWS, EXPORT_WORKERS, EXPORT_RETENTION
+from services.cache import get_cache, cache_key
+from services.data_service import parse_date_param, parse_date_range
+from services.dataset import get_dataset
+from services.metrics import span, EXPORT_JOBS
+
+EXPORT_FORMATS = {
+    "csv": {"extension": "csv.gz", "mimetype": "application/gzip"},
+    "parquet": {"extension": "parquet", "mimetype": "application/vnd.apache.parquet"},
+}
+
+
+class ExportJob:
+    """State of one export; updated by the worker thread, read by the API."""
+
+    def __init__(self, filters, export_format):
+        self.id = uuid.uuid4().hex
+        self.filters = filters
+        self.format = export_format
+        self.status = "queued"  # queued → running → completed | failed
+        self.error = None
+        self.total_rows = None
+        self.rows_written = 0
+        self.path = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    # Fields published to the shared cache (the file path is not one of them)
+    STATE_FIELDS = ("id", "filters", "format", "status", "error", "total_rows", "rows_written",
+                    "created_at", "finished_at")
+
+    @classmethod
+    def from_state(cls, state, directory):
+        """
+        Job published by another process, or None when the state is malformed.
+        The file path is rebuilt from the checked id and format inside `directory`.
+        """
+        if not isinstance(state, dict) or any(field not in state for field in cls.STATE_FIELDS):
+            return None
+        if not isinstance(state["id"], str) or not JOB_ID.fullmatch(state["id"]) or state["format"] not in EXPORT_FORMATS:
+            return None
+        job = cls.__new__(cls)
+        for field in cls.STATE_FIELDS:
+            setattr(job, field, state[field])
+        job.path = os.path.join(directory, job.filename) if job.status == "completed" else None
+        return job
+
+    def state(self):
+        return {field: getattr(self, field) for field in self.STATE_FIELDS}
+
+    @property
+    def file_available(self):
+        """Completed and its file still exists (it may have been swept after the retention period)."""
+        return self.status == "completed" and self.path is not None and os.path.exists(self.path)
+
+    @property
+    def filename(self):
+        return f"export_{self.id}.{EXPORT_FORMATS[self.format]['extension']}"
+
+    @property
+    def mimetype(self):
+        return EXPORT_FORMATS[self.format]["mimetype"]
+
+    def to_dict(self):
+        progress = None
+        if self.total_rows:
+            progress = round(self.rows_written / self.total_rows, 4)
+        elif self.status == "completed":
+            progress = 1.0
+        return {
+            "id": self.id,
+            "status": self.status,
+            "format": self.format,
+            "filters": self.filters,
+            "total_rows": self.total_rows,
+            "rows_written": self.rows_written,
+            "progress": progress,
+            "size_bytes": os.path.getsize(self.path) if self.file_available else None,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def validate_export_request(params):
+    """
+    Check the filters of an export request.
+    Returns (filters, export_format, error_message).
+    """
+    export_format = (params.get("format") or "csv").lower()
+    if export_format not in EXPORT_FORMATS:
+        return None, None, f"Invalid format '{export_format}'. Use one of: {', '.join(EXPORT_FORMATS)}"
+    if export_format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        return None, None, "Parquet exports require pyarrow to be installed"
+
+    filters = {name: params.get(name) or None for name in ("sensor", "device_id", "start_date", "end_date")}
+    if filters["sensor"] and filters["sensor"] not in SENSORS:
+        return None, None, f"Sensor '{filters['sensor']}' not found"
+    for name in ("start_date", "end_date"):
+        if filters[name] and parse_date_param(filters[name]) is None:
+            return None, None, f"Invalid {name} format. Use YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS"
+    return filters, export_format, None
+
+
+def _chunk_frame(dataset, positions, sensor):
+    """Rows at `positions` as a DataFrame shaped like the /data response."""
+    if not sensor:
+        return pd.DataFrame({header: dataset.columns[header][positions] for header in dataset.headers})
+
+    config = SENSORS[sensor]
+    values = dataset.columns[config["column"]][positions]
+    frame = pd.DataFrame({
+        "timestamp": dataset.columns["timestamp"][positions],
+        "deviceId": dataset.columns["deviceId"][positions],
+        "value": values,
+        "unit": config["unit"],
+        "sensor": sensor,
+        "type": config["type"],
+    })
+    return frame[frame["value"].notna()]
+
+
+class _CsvGzipWriter:
+    def __init__(self, path):
+        self.file = gzip.open(path, "wt", encoding="utf-8", newline="")
+        self.header = True
+
+    def write(self, frame):
+        frame.to_csv(self.file, header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+
+    def write(self, frame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema, compression="snappy")
+        # Chunks can differ in inferred types (e.g. an all-empty column); align to the first schema
+        self.writer.write_table(table.cast(self.writer.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+WRITERS = {"csv": _CsvGzipWriter, "parquet": _ParquetWriter}
+
+# Job ids are uuid4().hex
+JOB_ID = re.compile(r"[0-9a-f]{32}")
+# Seconds between two sweeps of the export directory
+SWEEP_INTERVAL = 60
+
+
+class ExportManager:
+    """Keeps track of export jobs and runs them on a bounded thread pool."""
+
+    def __init__(self, directory=EXPORT_DIR, workers=EXPORT_WORKERS, chunk_rows=EXPORT_CHUNK_ROWS,
+                 retention=EXPORT_RETENTION):
+        # Absolute: Flask's send_file resolves relative paths against the app root, not the cwd
+        self.directory = os.path.abspath(directory)
+        self.chunk_rows = chunk_rows
+        self.retention = retention
+        self._jobs = {}
+        self._swept_at = 0.0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export")
+
+    def submit(self, filters, export_format):
+        self._expire_old_jobs()
+        job = ExportJob(filters, export_format)
+        with self._lock:
+            self._jobs[job.id] = job
+        EXPORT_JOBS.inc(format=export_format, status="queued")
+        self._publish(job)
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        self._expire_old_jobs()
+        if not JOB_ID.fullmatch(job_id):
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            # Submitted to another server process
+            state = get_cache().get(cache_key("export", job_id))
+            if state is not None:
+                try:
+                    job = ExportJob.from_state(json.loads(state), self.directory)
+                except ValueError:
+                    job = None
+                if job is not None and job.id != job_id:
+                    job = None
+        return job
+
+    def _publish(self, job):
+        get_cache().set(cache_key("export", job.id), json.dumps(job.state()).encode("utf-8"), self.retention)
+
+    def _run(self, job):
+        job.status = "running"
+        self._publish(job)
+        tmp_path = None
+        try:
+            with span("export"):
+                os.makedirs(self.directory, exist_ok=True)
+                path = os.path.join(self.directory, job.filename)
+                tmp_path = f"{path}.part"
+
+                dataset = get_dataset()
+                if not len(dataset):
+                    raise Exception("No data available")
+                start, end, _ = parse_date_range(job.filters["start_date"], job.filters["end_date"])
+                positions = dataset.select(job.filters["device_id"], start, end)
+                if job.filters["sensor"]:
+                    # Only rows with a value for the sensor are exported
+                    values = dataset.columns.get(SENSORS[job.filters["sensor"]]["column"])
+                    positions = positions[pd.notna(values[positions])] if values is not None else positions[:0]
+                job.total_rows = len(positions)
+
+                writer = WRITERS[job.format](tmp_path)
+                try:
+                    # An empty export still gets one (empty) chunk so the file has a header/schema
+                    for offset in range(0, len(positions), self.chunk_rows) or [0]:
+                        chunk = positions[offset:offset + self.chunk_rows]
+                        frame = _chunk_frame(dataset, chunk, job.filters["sensor"])
+                        writer.write(frame)
+                        job.rows_written += len(frame)
+                        self._publish(job)
+                finally:
+                    writer.close()
+
+                os.replace(tmp_path, path)
+                job.path = path
+                job.status = "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        finally:
+            job.finished_at = time.time()
+            self._publish(job)
+            EXPORT_JOBS.inc(format=job.format, status=job.status)
+
+    def _expire_old_jobs(self):
+        """Forget finished jobs after the retention period and sweep old files from the directory."""
+        now = time.time()
+        with self._lock:
+            expired = [job for job in self._jobs.values()
+                       if job.finished_at is not None and now - job.finished_at > self.retention]
+            for job in expired:
+                del self._jobs[job.id]
+            sweep = now - self._swept_at >= min(SWEEP_INTERVAL, self.retention)
+            if sweep:
+                self._swept_at = now
+        if sweep:
+            self.sweep(now)
+
+    def sweep(self, now=None):
+        """
+        Delete export files (and leftover .part files) not modified for the
+        retention period, including those of other processes and earlier runs.
+        A running export rewrites its .part file with every chunk.
+        """
+        now = time.time() if now is None else now
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if not entry.name.startswith("export_") or not entry.is_file(follow_symlinks=False):
+                continue
+            try:
+                if now - entry.stat().st_mtime > self.retention:
+                    os.remove(entry.path)
+            except OSError:
+                pass  # removed by another process
+
+
+# Process-wide export manager used by the API
+export_manager = ExportManager()
@@ -0,0 +1,191 @@
+"""
+instrumentation.py
+-------------------
+Flask hooks recording request latency and per-stage spans, plus the opt-in
+per-request profiler.
+
+Every response carries a Server-Timing header with the spans recorded while
+handling it. When a profile token is configured, a request sent with the
+PROFILE_HEADER header ("cprofile" or "pyinstrument") and that token is
+profiled and the report written to PROFILE_DIR; its file name (not the
+server path) is returned in X-Profile-File. Profiles are rate-limited per
+process and old reports are deleted.
+"""
+
+import cProfile
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+from flask import g, request
+
+from config.settings import (
+    PROFILE_HEADER,
+    PROFILE_TOKEN_HEADER,
+    PROFILE_TOKEN,
+    PROFILING_ENABLED,
+    PROFILE_DIR,
+    PROFILE_MIN_INTERVAL,
+    PROFILE_MAX_FILES,
+)
+from services.auth import token_matches
+from services.metrics import REQUEST_LATENCY, start_request_spans, end_request_spans
+
+# Query parameters that make up the "filters" label of the latency histogram
+FILTER_PARAMS = ("sensor", "device_id", "start_date", "end_date", "since", "resolution", "layout")
+
+
+def filter_combination(args):
+    """Label for the filters present in a query string, e.g. 'sensor+device_id' or 'none'."""
+    used = [name for name in FILTER_PARAMS if args.get(name)]
+    return "+".join(used) if used else "none"
+
+
+def server_timing(spans, total):
+    """Server-Timing header value; repeated stages are summed, in first-seen order."""
+    durations = {}
+    for stage, seconds in spans:
+        durations[stage] = durations.get(stage, 0.0) + seconds
+    durations["total"] = total
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in durations.items())
+
+
+class _CProfileSession:
+    extension = "prof"
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop(self, path):
+        self.profiler.disable()
+        self.profiler.dump_stats(path)
+
+    def cancel(self):
+        self.profiler.disable()
+
+
+class _PyinstrumentSession:
+    extension = "html"
+
+    def __init__(self):
+        from pyinstrument import Profiler  # optional dependency
+
+        self.profiler = Profiler()
+        self.profiler.start()
+
+    def stop(self, path):
+        self.profiler.stop()
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(self.profiler.output_html())
+
+    def cancel(self):
+        self.profiler.stop()
+
+
+PROFILERS = {"cprofile": _CProfileSession, "pyinstrument": _PyinstrumentSession}
+
+
+_profile_lock = threading.Lock()
+_last_profile = 0.0
+
+
+def _profile_allowed():
+    """Profiling is on, the request carries the token and no other profile started recently."""
+    global _last_profile
+    if not PROFILING_ENABLED or not token_matches(PROFILE_TOKEN_HEADER, PROFILE_TOKEN):
+        return False, None
+    with _profile_lock:
+        now = time.monotonic()
+        if now - _last_profile < PROFILE_MIN_INTERVAL:
+            return False, f"Profiling is limited to one request every {PROFILE_MIN_INTERVAL} seconds"
+        _last_profile = now
+    return True, None
+
+
+def _start_profiler(mode):
+    session_class = PROFILERS.get(mode.strip().lower())
+    if session_class is None:
+        return None, f"Unknown profiler '{mode}'. Use one of: {', '.join(PROFILERS)}"
+    try:
+        return session_class(), None
+    except ImportError:
+        return None, f"Profiler '{mode}' is not installed"
+    except ValueError as e:
+        # Another profiler is already active in this thread
+        return None, str(e)
+
+
+def _profile_path(extension):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    endpoint = re.sub(r"[^A-Za-z0-9]+", "_", request.path).strip("_") or "root"
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return os.path.join(PROFILE_DIR, f"{stamp}_{endpoint}.{extension}")
+
+
+def _prune_profiles():
+    """Delete all but the newest PROFILE_MAX_FILES reports (file names start with their timestamp)."""
+    names = sorted(name for name in os.listdir(PROFILE_DIR) if not name.startswith("."))
+    for name in names[:max(len(names) - PROFILE_MAX_FILES, 0)]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, name))
+        except OSError:
+            pass  # removed by another process
+
+
+def init_instrumentation(app):
+    """Register the request hooks on the Flask app."""
+
+    @app.before_request
+    def _start_request():
+        g.request_started = time.perf_counter()
+        g.span_token = start_request_spans()
+
+        mode = request.headers.get(PROFILE_HEADER)
+        if mode and PROFILING_ENABLED:
+            allowed, g.profiler_error = _profile_allowed()
+            if allowed:
+                g.profiler, g.profiler_error = _start_profiler(mode)
+
+    @app.after_request
+    def _finish_request(response):
+        started = g.pop("request_started", None)
+        token = g.pop("span_token", None)
+        if started is None or token is None:
+            return response
+
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            path = _profile_path(profiler.extension)
+            profiler.stop(path)
+            _prune_profiles()
+            response.headers["X-Profile-File"] = os.path.basename(path)
+        error = g.pop("profiler_error", None)
+        if error:
+            response.headers["X-Profile-Error"] = error
+
+        total = time.perf_counter() - started
+        spans = end_request_spans(token)
+        response.headers["Server-Timing"] = server_timing(spans, total)
+
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_LATENCY.observe(
+            total,
+            endpoint=endpoint,
+            method=request.method,
+            status=response.status_code,
+            filters=filter_combination(request.args),
+        )
+        return response
+
+    @app.teardown_request
+    def _cleanup_request(exc):
+        # after_request is skipped on unhandled errors; don't leak spans or a running profiler
+        token = g.pop("span_token", None)
+        if token is not None:
+            end_request_spans(token)
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.cancel()
@@ -0,0 +1,144 @@
+"""
+jobs.py
+--------
+Background jobs run by the scheduler (services/scheduler.py).
+
+- refresh_sources / update_rollups: light, run on a scheduler thread of every
+  server process (each process keeps its own dataset and rollups)
+- scan_anomalies / retrain_models: heavy, run in a separate process with the
+  dataset as argument; they only import scikit-learn there, so the API
+  process never pays for it
+
+Each job returns a small JSON-able summary shown in GET /jobs.
+"""
+
+import numpy as np
+
+from config.settings import (
+    SENSORS,
+    ANOMALY_SCAN_HOURS,
+    ANOMALY_SAMPLE_ROWS,
+    ANOMALY_CONTAMINATION,
+    RETRAIN_TARGETS,
+    RETRAIN_MAX_ROWS,
+    MODEL_CACHE_DIR,
+    MODEL_CACHE_KEEP,
+)
+from services.dataset import get_dataset, expire_dataset
+
+HOUR = 3600 * 1_000_000_000
+TOP_ANOMALIES = 20
+MIN_TRAINING_ROWS = 100
+
+
+def _numeric_columns(dataset):
+    return [
+        config["column"] for config in SENSORS.values()
+        if config["type"] == "numeric" and config["column"] in dataset.columns
+    ]
+
+
+def _valid_rows(dataset):
+    return len(dataset) - int(dataset.timestamps.isna().sum())  # NaT rows are sorted last
+
+
+def refresh_sources():
+    """Reload the sources that are due, so requests find a fresh dataset instead of loading it."""
+    expire_dataset()
+    dataset = get_dataset()
+    return {"rows": len(dataset), "version": dataset.version}
+
+
+def update_rollups():
+    """Bring the hourly/daily rollups up to date with the current dataset."""
+    from services.rollups import api_rollups
+
+    api_rollups.update(get_dataset())
+    return api_rollups.last_update
+
+
+def scan_anomalies(dataset, hours=ANOMALY_SCAN_HOURS, sample_rows=ANOMALY_SAMPLE_ROWS,
+                   contamination=ANOMALY_CONTAMINATION):
+    """
+    IsolationForest fitted on a uniform sample of the history, scoring the
+    readings of the last `hours`. Missing values are filled with the column means.
+    """
+    from sklearn.ensemble import IsolationForest
+
+    columns = _numeric_columns(dataset)
+    valid = _valid_rows(dataset)
+    if not valid or not columns:
+        return {"rows_scanned": 0, "anomalies": 0}
+
+    values = np.column_stack([dataset.columns[column][:valid] for column in columns])
+    with np.errstate(invalid="ignore"):
+        means = np.nan_to_num(np.nanmean(values, axis=0))
+    fill = lambda rows: np.where(np.isnan(rows), means, rows)
+
+    rng = np.random.default_rng(42)
+    sample = np.sort(rng.choice(valid, size=min(valid, sample_rows), replace=False))
+    detector = IsolationForest(contamination=contamination, random_state=42).fit(fill(values[sample]))
+
+    times = dataset.timestamps.asi8[:valid]
+    start = int(np.searchsorted(times, times[-1] - hours * HOUR, "left"))
+    scores = detector.decision_function(fill(values[start:]))
+    flagged = np.flatnonzero(scores < 0)
+    devices, counts = np.unique(dataset.columns["deviceId"][start + flagged].astype(str), return_counts=True)
+    worst = flagged[np.argsort(scores[flagged])[:TOP_ANOMALIES]]
+
+    return {
+        "window_start": dataset.timestamps[start].isoformat(),
+        "window_end": dataset.timestamps[valid - 1].isoformat(),
+        "rows_scanned": valid - start,
+        "anomalies": len(flagged),
+        "by_device": dict(zip(devices.tolist(), counts.tolist())),
+        "most_anomalous": [
+            {
+                "timestamp": dataset.timestamps[start + offset].isoformat(),
+                "deviceId": dataset.columns["deviceId"][start + offset],
+                "score": round(float(scores[offset]), 4),
+                **{column: None if np.isnan(value) else float(value)
+                   for column, value in zip(columns, values[start + offset])},
+            }
+            for offset in worst
+        ],
+    }
+
+
+def retrain_models(dataset, targets=RETRAIN_TARGETS, max_rows=RETRAIN_MAX_ROWS, cache_dir=MODEL_CACHE_DIR,
+                   cache_keep=MODEL_CACHE_KEEP):
+    """
+    Model selection (time-series CV with successive halving) per target sensor
+    on the most recent rows. Results are cached by dataset hash, so a run on
+    unchanged data only reloads them; the cache keeps the `cache_keep` most
+    recent datasets.
+    """
+    from model.feature_builder import FeatureBuilder
+    from model.feature_window import FeatureWindow
+    from model.model_selection import select_model
+
+    columns = _numeric_columns(dataset)
+    valid = _valid_rows(dataset)
+    frame = dataset.frame.iloc[max(valid - max_rows, 0):valid]
+    builder = FeatureBuilder(frame, columns)
+
+    summary = {}
+    for target in targets:
+        if target not in columns:
+            continue
+        features = builder.build(FeatureWindow(target, n_lags=10, windows=(10,)), exogenous=columns)
+        if len(features) < MIN_TRAINING_ROWS:
+            summary[target] = {"error": f"only {len(features)} complete rows"}
+            continue
+        selection = select_model(features.X, features.y, features.feature_names, workers=1, cache_dir=cache_dir,
+                                   cache_keep=cache_keep)
+        best = selection["best"]
+        summary[target] = {
+            "model": best["model"],
+            "params": best["params"],
+            "mse": best["mse"],
+            "rows": len(features),
+            "dataset_hash": selection["dataset_hash"],
+            "evaluations": selection["evaluations"],
+        }
+    return summary
@@ -0,0 +1,247 @@
+"""
+metrics.py
+-----------
+In-process metrics (counters, gauges, histograms) and timing spans.
+
+Everything is rendered in the Prometheus text exposition format by
+`render_metrics()` and served on GET /metrics. Spans opened during a request
+are also collected per request so they can be returned as a Server-Timing header.
+"""
+
+import contextvars
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Prometheus' default latency buckets, extended for multi-second sheet downloads
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Spans recorded during the current request (None outside of a request)
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def collect(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    """Current value that can go up and down, optionally split by labels."""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """Cumulative-bucket histogram, optionally split by labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [per-bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels):
+        series = self._series.get(tuple(str(labels[name]) for name in self.labelnames))
+        return series[-1] if series else 0
+
+    def sum(self, **labels):
+        series = self._series.get(tuple(str(labels[name]) for name in self.labelnames))
+        return series[-2] if series else 0.0
+
+    def collect(self):
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, hits in zip(self.buckets, series[:-2]):
+                cumulative += hits
+                labels = _format_labels(self.labelnames + ("le",), key + (_format_value(float(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames + ("le",), key + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(float(series[-2]))}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class Registry:
+    """Holds metrics in registration order and renders them for /metrics."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric '{metric.name}' already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "ecomonitor_request_duration_seconds",
+    "HTTP request latency by endpoint and combination of filters used.",
+    ("endpoint", "method", "status", "filters"),
+))
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "ecomonitor_stage_duration_seconds",
+    "Time spent in each instrumented processing stage.",
+    ("stage",),
+))
+UPSTREAM_REQUESTS = REGISTRY.register(Counter(
+    "ecomonitor_upstream_requests_total",
+    "Attempts to load data from each source (sheet URLs, CSV fallback) by outcome.",
+    ("source", "outcome"),
+))
+UPSTREAM_FALLBACKS = REGISTRY.register(Counter(
+    "ecomonitor_upstream_fallbacks_total",
+    "Loads that had to fall back to the local CSV file because no sheet URL worked.",
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "ecomonitor_cache_requests_total",
+    "Dataset cache lookups by cache and result (hit/miss).",
+    ("cache", "result"),
+))
+EXPORT_JOBS = REGISTRY.register(Counter(
+    "ecomonitor_export_jobs_total",
+    "Export jobs by format and status (queued, completed, failed).",
+    ("format", "status"),
+))
+ROLLUP_UPDATES = REGISTRY.register(Counter(
+    "ecomonitor_rollup_updates_total",
+    "Rollup table updates by granularity and mode (incremental or full rebuild).",
+    ("granularity", "mode"),
+))
+QUALITY_ISSUES = REGISTRY.register(Gauge(
+    "ecomonitor_quality_issues",
+    "Rows rejected (incomplete, invalid_timestamp, missing_device, duplicate) and values cleared "
+    "(non_numeric, out_of_range) by the data-quality stage in each source's current run.",
+    ("source", "reason"),
+))
+JOB_RUNS = REGISTRY.register(Counter(
+    "ecomonitor_job_runs_total",
+    "Background job runs by job and result (ok, error, skipped while still running or claimed by another process).",
+    ("job", "result"),
+))
+JOB_DURATION = REGISTRY.register(Histogram(
+    "ecomonitor_job_duration_seconds",
+    "Background job run time.",
+    ("job",),
+    buckets=(0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0),
+))
+
+
+def render_metrics():
+    """Prometheus text exposition of every registered metric."""
+    return REGISTRY.render()
+
+
+@contextmanager
+def span(stage):
+    """
+    Time a block of code: observed in the stage histogram and, during a
+    request, appended to the request's span list (Server-Timing header).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.observe(elapsed, stage=stage)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((stage, elapsed))
+
+
+def timed(stage):
+    """Decorator form of `span`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_request_spans():
+    """Begin collecting spans for the current request; returns a token for `end_request_spans`."""
+    return _request_spans.set([])
+
+
+def end_request_spans(token):
+    """Stop collecting and return the (stage, seconds) spans of the current request."""
+    spans = _request_spans.get() or []
+    _request_spans.reset(token)
+    return spans
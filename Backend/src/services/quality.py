@@ -0,0 +1,126 @@
+"""
+quality.py
+-----------
+Data-quality stage run on every table as it is parsed.
+
+All checks are vectorized over the columns:
+- rows without a parseable timestamp or without a deviceId are rejected
+- non-numeric text in numeric columns and readings outside the sensor's
+  `range` (see SENSORS) are cleared to NaN
+- rows are ordered by timestamp (stable), and readings re-uploaded by a
+  device (same deviceId and timestamp) are kept once, first occurrence wins;
+  device ids are hashed to integer codes so the check is a cheap sort
+
+Every load returns a report with the number of rows rejected and values
+cleared per reason; it is kept on the dataset (`dataset.quality`). The
+sources publish the totals of their current run as a gauge, so re-parsing
+an unchanged sheet does not count its issues again.
+"""
+
+import numpy as np
+import pandas as pd
+
+from config.settings import SENSORS
+
+NAT = np.iinfo(np.int64).min
+
+# Numeric column -> (min, max) valid range
+RANGES = {cfg["column"]: cfg["range"] for cfg in SENSORS.values() if cfg.get("range")}
+
+
+def _clean_numeric(header, values, cleared):
+    """Numeric column → float64 with garbage and out-of-range readings cleared (counted in `cleared`)."""
+    if values.dtype != np.float64:
+        # Legacy mixed column: floats, None and the original non-numeric strings
+        parsed = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+        garbage = int(np.count_nonzero(np.isnan(parsed) & pd.notna(values)))
+        if garbage:
+            cleared["non_numeric"][header] = garbage
+        values = parsed
+
+    low, high = RANGES.get(header, (None, None))
+    if low is not None or high is not None:
+        with np.errstate(invalid="ignore"):
+            outside = np.zeros(len(values), dtype=bool)
+            if low is not None:
+                outside |= values < low
+            if high is not None:
+                outside |= values > high
+        if outside.any():
+            cleared["out_of_range"][header] = int(np.count_nonzero(outside))
+            values = np.where(outside, np.nan, values)
+    return values
+
+
+def validate(columns, timestamps, text_columns, incomplete_rows=0):
+    """
+    Clean parsed columns. `timestamps` are UTC epoch nanoseconds (NaT as
+    int64 min), `text_columns` the headers kept as text.
+    Returns (columns, timestamps, report): the kept rows in time order.
+    """
+    rows = len(timestamps)
+    rejected = {"incomplete": incomplete_rows, "invalid_timestamp": 0, "missing_device": 0, "duplicate": 0}
+    cleared = {"non_numeric": {}, "out_of_range": {}}
+
+    keep = timestamps != NAT
+    rejected["invalid_timestamp"] = int(rows - np.count_nonzero(keep))
+    devices = columns.get("deviceId")
+    if devices is not None:
+        # Hash the device ids once: integer codes for the duplicate check (-1 = missing)
+        codes, uniques = pd.factorize(devices)
+        missing = codes == -1
+        for empty in np.flatnonzero(uniques == ""):
+            missing |= codes == empty
+        rejected["missing_device"] = int(np.count_nonzero(missing & keep))
+        keep &= ~missing
+
+    columns = {
+        header: values if header in text_columns else _clean_numeric(header, values, cleared)
+        for header, values in columns.items()
+    }
+
+    # Order by time; counting the rows the upload had out of order
+    positions = np.flatnonzero(keep)
+    times = timestamps[positions]
+    reordered = int(np.count_nonzero(times[1:] < times[:-1]))
+    if reordered:
+        order = np.argsort(times, kind="stable")
+        positions, times = positions[order], times[order]
+
+    # Duplicates share their timestamp, so only rows with an equal neighbour are
+    # checked: sorted by (timestamp, device code), a duplicate equals its predecessor
+    if devices is not None and len(times) > 1:
+        ties = np.zeros(len(times), dtype=bool)
+        equal = times[1:] == times[:-1]
+        ties[1:] |= equal
+        ties[:-1] |= equal
+        candidates = np.flatnonzero(ties)
+        if len(candidates):
+            candidate_codes = codes[positions[candidates]]
+            order = np.lexsort((candidate_codes, times[candidates]))  # stable: first occurrence first
+            same = (np.diff(times[candidates][order]) == 0) & (np.diff(candidate_codes[order]) == 0)
+            duplicates = candidates[order[1:][same]]
+            if len(duplicates):
+                rejected["duplicate"] = len(duplicates)
+                unique = np.ones(len(times), dtype=bool)
+                unique[duplicates] = False
+                positions, times = positions[unique], times[unique]
+
+    if len(positions) != rows or reordered:
+        columns = {header: values[positions] for header, values in columns.items()}
+
+    report = {
+        "rows_read": rows + incomplete_rows,
+        "rows_kept": len(positions),
+        "rows_reordered": reordered,
+        "rejected_rows": rejected,
+        "cleared_values": cleared,
+    }
+    return columns, times, report
+
+
+def issue_totals(report):
+    """Report → {reason: rows rejected or values cleared}, every reason included."""
+    totals = dict(report["rejected_rows"])
+    totals.update({reason: sum(counts.values()) for reason, counts in report["cleared_values"].items()})
+    return totals
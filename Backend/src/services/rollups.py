@@ -0,0 +1,307 @@
+"""
+rollups.py
+-----------
+Materialized hourly and daily rollups per device and numeric column.
+
+Each table holds count, sum, sum of squares, min and max per (deviceId, bucket),
+from which mean and standard deviation are derived. Tables are updated
+incrementally when a new dataset arrives: buckets before the last bucket
+seen are kept and only the buckets touched by newer rows are re-aggregated.
+If older rows changed (late or edited rows), the table is rebuilt.
+
+Buckets are stored as UTC epoch nanoseconds, like the dataset timestamps.
+Hourly buckets start on UTC hours (the same as local hours for whole-hour
+offsets); daily buckets start at local midnight in the sites' TIMEZONE (23 or
+25 hours long across a DST change), and are reported in local time.
+Hour-of-day and day-of-week profiles are computed in TIMEZONE as well.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config.settings import SENSORS, ROLLUP_RAW_MAX_DAYS, ROLLUP_HOURLY_MAX_DAYS
+from services.data_service import parse_date_range, columnar_payload
+from services.dataset import get_dataset, add_refresh_listener, to_local_time
+from services.metrics import span, ROLLUP_UPDATES
+
+HOUR = 3600 * 1_000_000_000
+GRANULARITIES = ("hour", "day")
+STATS = ("count", "sum", "sum_sq", "min", "max")
+
+
+def _empty_table(columns):
+    index = pd.MultiIndex.from_arrays([np.array([], dtype=object), np.array([], dtype=np.int64)],
+                                      names=["deviceId", "bucket"])
+    return pd.DataFrame(index=index, columns=pd.MultiIndex.from_product([columns, STATS]), dtype=np.float64)
+
+
+def bucket_starts(timestamps, granularity):
+    """Start (UTC epoch ns) of the bucket of each UTC epoch-ns timestamp."""
+    if granularity == "hour":
+        return timestamps // HOUR * HOUR
+    # Local midnight; ambiguous or missing local times can't occur at midnight in TIMEZONE
+    return to_local_time(timestamps).normalize().asi8
+
+
+def bucket_ends(starts, granularity):
+    """End (exclusive, UTC epoch ns) of the buckets starting at `starts`."""
+    if granularity == "hour":
+        return starts + HOUR
+    return (to_local_time(starts) + pd.DateOffset(days=1)).asi8
+
+
+def aggregate(dataset, positions, granularity, columns):
+    """Aggregate the rows at `positions` into (deviceId, bucket) × (column, stat)."""
+    if not len(positions):
+        return _empty_table(columns)
+
+    timestamps = dataset.timestamps.asi8[positions]
+    keys = [
+        pd.Index(dataset.columns["deviceId"][positions], name="deviceId"),
+        pd.Index(bucket_starts(timestamps, granularity), name="bucket"),
+    ]
+    values = pd.DataFrame({column: dataset.columns[column][positions] for column in columns})
+    stats = values.groupby(keys, sort=True).agg(["count", "sum", "min", "max"])
+    sums_sq = (values * values).groupby(keys, sort=True).sum()
+    sums_sq.columns = pd.MultiIndex.from_product([columns, ["sum_sq"]])
+    table = pd.concat([stats, sums_sq], axis=1)[pd.MultiIndex.from_product([columns, STATS])]
+    return table.astype(np.float64)
+
+
+def _same_rows(old, new, end, columns):
+    """The first `end` rows of two datasets hold the same timestamps, devices and `columns` values."""
+    if not np.array_equal(old.timestamps.asi8[:end], new.timestamps.asi8[:end]):
+        return False
+    if not np.array_equal(old.columns["deviceId"][:end], new.columns["deviceId"][:end]):
+        return False
+    return all(np.array_equal(old.columns[column][:end], new.columns[column][:end], equal_nan=True)
+               for column in columns)
+
+
+def _finalize(count, total, total_sq, minimum, maximum):
+    """Count/sum/sum_sq/min/max arrays → mean and sample std (NaN where undefined), like pandas."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        variance = (total_sq - total * mean) / (count - 1)
+    std = np.sqrt(np.clip(variance, 0, None))
+    std[count < 2] = np.nan
+    mean[count == 0] = np.nan
+    return {"count": count, "mean": mean, "std": std, "min": minimum, "max": maximum}
+
+
+class RollupStore:
+    """
+    Hourly and daily rollups for one data source. `update(dataset)` is cheap
+    to call repeatedly: it only does work when it receives a new dataset.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.columns = []
+        self.last_update = None
+        self._dataset = None
+        self._lock = threading.Lock()
+
+    def update(self, dataset):
+        with self._lock:
+            if dataset is self._dataset or not len(dataset):
+                return self
+            with span("rollup_update"):
+                self._update(dataset)
+            self._dataset = dataset
+        return self
+
+    def _update(self, dataset):
+        columns = dataset.numeric_columns
+        valid = len(dataset) - int(dataset.timestamps.isna().sum())  # NaT rows are sorted last
+        new_times = dataset.timestamps.asi8[:valid]
+
+        previous = self._dataset
+        incremental = previous is not None and columns == self.columns
+        if incremental:
+            old_valid = len(previous) - int(previous.timestamps.isna().sum())
+            old_times = previous.timestamps.asi8[:old_valid]
+            incremental = old_valid > 0
+
+        summary = {"rows_aggregated": 0, "buckets_touched": 0}
+        for granularity in GRANULARITIES:
+            mode = "full"
+            start = 0
+            if incremental:
+                # Everything before the last bucket of the previous dataset is final,
+                # provided those rows did not change (same count, timestamps, devices and values)
+                cutoff = bucket_starts(old_times[-1:], granularity)[0]
+                old_prefix = np.searchsorted(old_times, cutoff, "left")
+                new_prefix = np.searchsorted(new_times, cutoff, "left")
+                if old_prefix == new_prefix and _same_rows(previous, dataset, new_prefix, columns):
+                    mode, start = "incremental", new_prefix
+
+            touched = aggregate(dataset, np.arange(start, valid), granularity, columns)
+            if mode == "incremental":
+                kept = self.tables[granularity]
+                kept = kept[kept.index.get_level_values("bucket") < cutoff]
+                table = pd.concat([kept, touched]).sort_index()
+            else:
+                table = touched
+
+            self.tables[granularity] = table
+            summary["rows_aggregated"] += int(valid - start)
+            summary["buckets_touched"] += len(touched)
+            summary[granularity] = mode
+            ROLLUP_UPDATES.inc(granularity=granularity, mode=mode)
+
+        self.columns = columns
+        self.last_update = {"version": dataset.version, **summary}
+
+    def query(self, granularity, column, device_id=None, start=None, end=None):
+        """
+        Rollup rows for one column as a DataFrame with deviceId, bucket (start,
+        UTC for hours and TIMEZONE for days), count, mean, std, min and max. `start`/`end` are tz-aware timestamps;
+        a bucket is included when it overlaps the range.
+        """
+        table = self.tables.get(granularity)
+        if table is None or column not in self.columns:
+            return pd.DataFrame(columns=["deviceId", "bucket", "count", "mean", "std", "min", "max"])
+
+        devices = table.index.get_level_values("deviceId")
+        buckets = table.index.get_level_values("bucket").to_numpy()
+        mask = np.ones(len(table), dtype=bool)
+        if device_id:
+            mask &= (devices == device_id)
+        if start is not None:
+            mask &= bucket_ends(buckets, granularity) > pd.Timestamp(start).value
+        if end is not None:
+            mask &= buckets <= pd.Timestamp(end).value
+
+        stats = table[column][mask]
+        result = _finalize(*(stats[stat].to_numpy(dtype=np.float64) for stat in STATS))
+        starts = pd.DatetimeIndex(buckets[mask].view("datetime64[ns]")).tz_localize("UTC")
+        frame = pd.DataFrame({
+            "deviceId": devices[mask],
+            "bucket": to_local_time(starts) if granularity == "day" else starts,
+            **result,
+        })
+        return frame[frame["count"] > 0].reset_index(drop=True)
+
+    def profile(self, column, by="hour", device_id=None):
+        """
+        Cyclic profile (mean/std/min/max/count) by local hour of day or day of
+        week (TIMEZONE), combined from the hourly rollups instead of a groupby
+        over raw rows. UTC hour buckets map to local hours for whole-hour offsets.
+        """
+        table = self.tables.get("hour")
+        if table is None or column not in self.columns:
+            return pd.DataFrame(columns=["mean", "std", "min", "max", "count"])
+
+        stats = table[column]
+        if device_id is not None:
+            stats = stats[stats.index.get_level_values("deviceId") == device_id]
+        buckets = to_local_time(stats.index.get_level_values("bucket").to_numpy())
+        key = pd.Index(buckets.hour if by == "hour" else buckets.dayofweek, name=by)
+        grouped = stats.groupby(key)
+        combined = grouped[["count", "sum", "sum_sq"]].sum().join(grouped["min"].min()).join(grouped["max"].max())
+        result = _finalize(*(combined[stat].to_numpy(dtype=np.float64) for stat in STATS))
+        profile = pd.DataFrame(result, index=combined.index)[["mean", "std", "min", "max", "count"]]
+        return profile[profile["count"] > 0]
+
+
+# Rollups of the API dataset, refreshed whenever the data layer loads a new dataset
+api_rollups = RollupStore()
+add_refresh_listener(api_rollups.update)
+
+# Rollups of other datasets (e.g. local CSVs used by the models), one store per source
+_source_rollups = {}
+_source_lock = threading.Lock()
+
+
+def rollups_for(dataset):
+    """Up-to-date rollups of a dataset, updated incrementally per source."""
+    with _source_lock:
+        store = _source_rollups.setdefault(dataset.source, RollupStore())
+    return store.update(dataset)
+
+
+def choose_resolution(start, end, first, last):
+    """
+    Resolution for resolution=auto: raw rows for short ranges, hourly rollups
+    up to ROLLUP_HOURLY_MAX_DAYS, daily rollups beyond.
+    """
+    start = start if start is not None else first
+    end = end if end is not None else last
+    days = (end - start).total_seconds() / 86400
+    if days <= ROLLUP_RAW_MAX_DAYS:
+        return "raw"
+    if days <= ROLLUP_HOURLY_MAX_DAYS:
+        return "hour"
+    return "day"
+
+
+def get_rollup_data(resolution, sensor=None, device_id=None, start_date_str=None, end_date_str=None,
+                    layout="records", dataset=None):
+    """
+    Sensor data of `dataset` (default the current one) at hourly or daily
+    resolution (or resolution=auto), as a list
+    of records or, with layout="columnar", a columnar payload (bucket means as
+    values plus count/min/max/std arrays).
+    Returns (data, resolution, error_message); resolution "raw" means the
+    caller should serve raw rows.
+    """
+    try:
+        if resolution not in GRANULARITIES and resolution != "auto":
+            return None, None, f"Invalid resolution '{resolution}'. Use raw, hour, day or auto"
+        if not sensor:
+            return None, None, "An aggregated resolution requires a sensor"
+        if sensor not in SENSORS:
+            return None, None, f"Sensor '{sensor}' not found"
+        if SENSORS[sensor]["type"] != "numeric":
+            return None, None, f"Sensor '{sensor}' is categorical and has no rollups"
+
+        start, end, error = parse_date_range(start_date_str, end_date_str)
+        if error:
+            return None, None, error
+
+        dataset = get_dataset() if dataset is None else dataset
+        api_rollups.update(dataset)
+        if resolution == "auto":
+            valid = dataset.timestamps.dropna()
+            if not len(valid):
+                return None, "raw", None
+            resolution = choose_resolution(start, end, valid[0], valid[-1])
+            if resolution == "raw":
+                return None, "raw", None
+
+        config = SENSORS[sensor]
+        with span("rollup_query"):
+            frame = api_rollups.query(resolution, config["column"], device_id, start, end)
+            if layout == "columnar":
+                data = columnar_payload(
+                    pd.DatetimeIndex(frame["bucket"]).asi8,
+                    frame["deviceId"].to_numpy(dtype=object),
+                    {sensor: frame["mean"].to_numpy(dtype=np.float64)},
+                    extra={
+                        "count": frame["count"].to_numpy(dtype=np.int64),
+                        **{stat: frame[stat].to_numpy(dtype=np.float64) for stat in ("min", "max", "std")},
+                    },
+                )
+                return data, resolution, None
+
+            data = []
+            for row in frame.itertuples(index=False):
+                data.append({
+                    "timestamp": row.bucket.isoformat(),
+                    "deviceId": row.deviceId,
+                    "value": float(row.mean),
+                    "count": int(row.count),
+                    "min": float(row.min),
+                    "max": float(row.max),
+                    "std": None if np.isnan(row.std) else float(row.std),
+                    "unit": config["unit"],
+                    "sensor": sensor,
+                    "type": config["type"],
+                })
+        return data, resolution, None
+
+    except Exception as e:
+        return None, None, str(e)
@@ -0,0 +1,365 @@
+"""
+scheduler.py
+-------------
+In-process scheduler for the background jobs (services/jobs.py), started
+with the app.
+
+Every job runs on its own interval (SCHEDULER_JOBS), varied by
+±SCHEDULER_JITTER on each run so server processes drift apart. A job that
+is still running when it is due again is skipped, not queued.
+
+- Light jobs (refresh, rollups) run on a small thread pool and work on this
+  process' dataset; every server process runs them.
+- Heavy jobs (anomaly scans, retraining) receive the dataset and run in a
+  process pool, so their CPU time never competes with the request threads.
+  They are shared: with several gunicorn workers a run happens in one
+  process only. With a shared cache backend (Redis) a process claims each
+  run in the cache first and publishes the outcome for GET /jobs in the
+  others. With the per-process memory cache no claim is visible to the other
+  workers, so only the process holding the host lock file
+  (SCHEDULER_LOCK_FILE) runs them; when it exits (e.g. a recycled worker)
+  another process takes the lock on its next claim.
+
+Runs are counted in ecomonitor_job_runs_total and timed in
+ecomonitor_job_duration_seconds; failures are logged.
+
+The scheduler is started explicitly by the server (`python app.py`, or the
+gunicorn post_worker_init hook), never when the app module is imported, and
+stops before the interpreter shuts the thread pools down.
+"""
+
+import atexit
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+
+try:
+    import fcntl  # POSIX file locks
+except ImportError:
+    fcntl = None
+
+from config.settings import (
+    SCHEDULER_ENABLED,
+    SCHEDULER_THREADS,
+    SCHEDULER_PROCESSES,
+    SCHEDULER_JITTER,
+    SCHEDULER_JOBS,
+    SCHEDULER_LOCK_FILE,
+    MODEL_CACHE_DIR,
+    MODEL_CACHE_KEEP,
+)
+from services import jobs
+from services.cache import get_cache, cache_key
+from services.dataset import get_dataset
+from services.metrics import JOB_RUNS, JOB_DURATION
+
+# Seconds the scheduler loop sleeps at most between checks
+TICK = 1.0
+
+
+def _isoformat(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def _dataset_inputs():
+    return (get_dataset(),)
+
+
+class HostLock:
+    """
+    Exclusive lock file held by one process of this host until it exits or
+    releases it; elects the process running shared jobs without a shared cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def held(self):
+        """Take the lock if it is free; True while this process holds it (always without fcntl)."""
+        if fcntl is None:
+            return True
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            file = open(self.path, "a")
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:  # held by another process
+                file.close()
+                return False
+            self._file = file
+        return True
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()  # closing drops the lock
+            self._file = None
+
+
+class Job:
+    """A periodic job and the state of its last run."""
+
+    def __init__(self, name, func, interval, heavy=False, inputs=None, shared=None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.heavy = heavy
+        self.inputs = inputs  # called on the scheduler thread; its result is passed to func
+        self.shared = heavy if shared is None else shared
+        self.next_run = None
+        self.running = False
+        self.last_started = None
+        self.last_finished = None
+        self.last_duration = None
+        self.last_error = None
+        self.last_result = None
+        self.runs = 0
+        self.failures = 0
+
+    # Fields published to the shared cache for shared jobs
+    STATE_FIELDS = ("last_started", "last_finished", "last_duration", "last_error", "last_result")
+
+    def state(self):
+        return {field: getattr(self, field) for field in self.STATE_FIELDS}
+
+    def to_dict(self, published=None):
+        info = {
+            "name": self.name,
+            "interval": self.interval,
+            "heavy": self.heavy,
+            "shared": self.shared,
+            "running": self.running,
+            "next_run": _isoformat(self.next_run),
+            "runs": self.runs,
+            "failures": self.failures,
+            **self.state(),
+        }
+        # A more recent run finished in another process
+        if published and (published["last_finished"] or 0) > (self.last_finished or 0):
+            info.update(published)
+        info["last_started"] = _isoformat(info["last_started"])
+        info["last_finished"] = _isoformat(info["last_finished"])
+        return info
+
+
+def default_jobs(config=SCHEDULER_JOBS):
+    """The jobs of services/jobs.py with the intervals of SCHEDULER_JOBS; interval 0 disables a job."""
+    definitions = [
+        Job("refresh_sources", jobs.refresh_sources, 0),
+        Job("rollups", jobs.update_rollups, 0),
+        Job("anomaly_scan", jobs.scan_anomalies, 0, heavy=True, inputs=_dataset_inputs),
+        # Paths are resolved here and passed along, not re-read in the job process
+        Job("retrain_models",
+            functools.partial(jobs.retrain_models, cache_dir=MODEL_CACHE_DIR, cache_keep=MODEL_CACHE_KEEP),
+            0, heavy=True, inputs=_dataset_inputs),
+    ]
+    enabled = []
+    for job in definitions:
+        job.interval = config.get(job.name, {}).get("interval", 0)
+        if job.interval > 0:
+            enabled.append(job)
+    return enabled
+
+
+class Scheduler:
+    def __init__(self, job_list, threads=SCHEDULER_THREADS, processes=SCHEDULER_PROCESSES, jitter=SCHEDULER_JITTER,
+                 lock_file=SCHEDULER_LOCK_FILE):
+        self.jobs = {job.name: job for job in job_list}
+        self.processes = processes
+        self.jitter = jitter
+        self.host_lock = HostLock(lock_file)
+        self.logger = logging.getLogger(__name__)
+        # Heavy jobs hold a thread while they wait for their process, so they get their own
+        self._threads = ThreadPoolExecutor(max_workers=threads + processes, thread_name_prefix="job")
+        self._process_pool = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    # --- Timing ------------------------------------------------------------------------
+
+    def _jittered(self, interval):
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        now = time.time()
+        for job in self.jobs.values():
+            # Refreshing soon warms the dataset; the rest start after part of their interval
+            fraction = 0.0 if job.name == "refresh_sources" else random.uniform(0.1, 0.5)
+            job.next_run = now + job.interval * fraction
+        self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+        self.host_lock.release()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            now = time.time()
+            for job in self.jobs.values():
+                if job.next_run <= now:
+                    job.next_run = now + self._jittered(job.interval)
+                    self._dispatch(job)
+            upcoming = min((job.next_run for job in self.jobs.values()), default=now + TICK)
+            self._wake.wait(min(max(upcoming - time.time(), 0), TICK))
+            self._wake.clear()
+
+    # --- Running -----------------------------------------------------------------------
+
+    def _claim(self, job):
+        """
+        Shared jobs run in one process per interval: the first one to add the key
+        to a shared cache wins; with a per-process cache, the holder of the host lock.
+        """
+        if not job.shared:
+            return True
+        cache = get_cache()
+        if not cache.shared:
+            return self.host_lock.held()
+        ttl = max(1, int(job.interval * (1 - self.jitter)))
+        return cache.add(cache_key("job", job.name), str(time.time()).encode("utf-8"), ttl)
+
+    def _start_shared(self, job):
+        """
+        Mark a shared job as running for every process. Returns False when it is
+        running in another one (or, with a per-process cache, runs in another one).
+        """
+        cache = get_cache()
+        if not cache.shared:
+            return self.host_lock.held()
+        return cache.add(cache_key("job-running", job.name), str(time.time()).encode("utf-8"), max(job.interval, 60))
+
+    def _finish_shared(self, job):
+        cache = get_cache()
+        if cache.shared:
+            cache.delete(cache_key("job-running", job.name))
+
+    def _dispatch(self, job, force=False):
+        with self._lock:
+            if job.running or not (force or self._claim(job)) or (job.shared and not self._start_shared(job)):
+                JOB_RUNS.inc(job=job.name, result="skipped")
+                return False
+            job.running = True
+        try:
+            self._threads.submit(self._run, job)
+        except RuntimeError:  # stopped
+            job.running = False
+            if job.shared:
+                self._finish_shared(job)
+            return False
+        return True
+
+    def _processes(self):
+        with self._lock:
+            if self._process_pool is None:
+                # spawn: a fork would copy the server's threads and locks into the child
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"))
+            return self._process_pool
+
+    def _execute(self, job):
+        arguments = job.inputs() if job.inputs else ()
+        if not job.heavy:
+            return job.func(*arguments)
+        try:
+            return self._processes().submit(job.func, *arguments).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a new pool on the next run
+            with self._lock:
+                self._process_pool = None
+            raise
+
+    def _run(self, job):
+        job.last_started = time.time()
+        start = time.perf_counter()
+        try:
+            job.last_result = self._execute(job)
+            job.last_error = None
+            result = "ok"
+        except Exception as e:
+            job.last_error = f"{type(e).__name__}: {e}"
+            job.failures += 1
+            result = "error"
+            if self._stop.is_set():
+                # Interrupted by the shutdown (e.g. its pools no longer accept work)
+                self.logger.info("Job %s interrupted by shutdown: %s", job.name, job.last_error)
+            else:
+                self.logger.exception("Job %s failed", job.name)
+        finally:
+            job.last_duration = round(time.perf_counter() - start, 4)
+            job.last_finished = time.time()
+            job.runs += 1
+            job.running = False
+            if job.shared:
+                self._finish_shared(job)
+        JOB_RUNS.inc(job=job.name, result=result)
+        JOB_DURATION.observe(job.last_duration, job=job.name)
+        if job.shared:
+            self._publish(job)
+
+    def _publish(self, job):
+        state = json.dumps(job.state(), default=str).encode("utf-8")
+        get_cache().set(cache_key("job-status", job.name), state, max(job.interval * 2, 60))
+
+    # --- API ---------------------------------------------------------------------------
+
+    def status(self):
+        cache = get_cache()
+        statuses = []
+        for job in self.jobs.values():
+            published = None
+            if job.shared:
+                state = cache.get(cache_key("job-status", job.name))
+                published = json.loads(state) if state is not None else None
+            statuses.append(job.to_dict(published))
+        return statuses
+
+    def run_now(self, name):
+        """
+        Run a job immediately in this process (its schedule is unchanged).
+        Returns False if it is already running (in any process, for shared jobs),
+        None if there is no such job.
+        """
+        job = self.jobs.get(name)
+        if job is None:
+            return None
+        return self._dispatch(job, force=True)
+
+
+# Process-wide scheduler used by the API
+scheduler = Scheduler(default_jobs())
+
+
+def start_scheduler(logger=None):
+    """
+    Start the background jobs, unless disabled or running inside a worker process
+    of a pool. Called by the server entry points; `logger` receives job failures.
+    """
+    if not SCHEDULER_ENABLED or multiprocessing.parent_process() is not None:
+        return None
+    if logger is not None:
+        scheduler.logger = logger
+    # Stop before concurrent.futures refuses new work at exit: threading's exit hooks
+    # run newest first, before the atexit ones (plain atexit where unavailable)
+    register = getattr(threading, "_register_atexit", atexit.register)
+    register(scheduler.stop)
+    return scheduler.start()
@@ -0,0 +1,74 @@
+"""
+sync.py
+--------
+Polling hints for incremental clients (/data?since=).
+
+A device's reporting interval is the median gap between its recent
+readings. Clients are told to poll again when the next reading of the
+devices they follow is expected, so steady-state sync traffic follows the
+rate at which data arrives.
+"""
+
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from config.settings import SYNC_INTERVAL_WINDOW, SYNC_MIN_POLL_SECONDS, SYNC_MAX_POLL_SECONDS, SYNC_OFFLINE_FACTOR
+
+
+def device_activity(dataset):
+    """deviceId -> (reporting interval in seconds or None, epoch seconds of the last reading)."""
+    devices = dataset.columns.get("deviceId")
+    if devices is None or not len(dataset):
+        return {}
+
+    times = dataset.timestamps.asi8
+    codes, uniques = pd.factorize(devices)
+    codes[times == np.iinfo(np.int64).min] = -1
+    # Group rows by device keeping time order (stable sort), then look at each device's tail
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1), "left")
+
+    activity = {}
+    for code, device in enumerate(uniques):
+        device_times = times[order[bounds[code]:bounds[code + 1]]]
+        if not len(device_times):
+            continue
+        gaps = np.diff(device_times[-(SYNC_INTERVAL_WINDOW + 1):])
+        gaps = gaps[gaps > 0]
+        interval = float(np.median(gaps)) / 1e9 if len(gaps) else None
+        activity[device] = (interval, device_times[-1] / 1e9)
+    return activity
+
+
+def poll_hint(dataset, device_id=None, now=None):
+    """
+    Seconds until the next poll is worthwhile for a client following one
+    device (or all of them), and the reporting interval used.
+    Returns {"next_poll_seconds": int, "reporting_interval_seconds": float or None}.
+    """
+    now = time.time() if now is None else now
+    activity = dataset.derived("device_activity", device_activity)
+    if device_id:
+        followed = [activity[device_id]] if device_id in activity else []
+    else:
+        followed = list(activity.values())
+
+    waits, intervals = [], []
+    for interval, last in followed:
+        if interval is None:
+            continue
+        intervals.append(interval)
+        if now - last > SYNC_OFFLINE_FACTOR * interval:
+            continue  # silent device: nothing to expect soon
+        expected = last + interval
+        # Overdue readings are usually just being uploaded: check again within one interval
+        waits.append(expected - now if expected > now else interval)
+
+    wait = min(waits) if waits else SYNC_MAX_POLL_SECONDS
+    return {
+        "next_poll_seconds": int(min(max(math.ceil(wait), SYNC_MIN_POLL_SECONDS), SYNC_MAX_POLL_SECONDS)),
+        "reporting_interval_seconds": round(min(intervals), 3) if intervals else None,
+    }
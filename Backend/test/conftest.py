@@ -0,0 +1,97 @@
+"""
+conftest.py
+------------
+Fixtures for the pytest suite (run from the Backend folder: `python -m pytest test`).
+
+The app reads a small CSV written per test instead of the Google Sheets,
+with an empty in-memory cache and the background scheduler disabled.
+test_api.py is a manual script against a running server and is not collected.
+"""
+
+import csv
+import os
+import sys
+
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+os.environ.setdefault("ECOMONITOR_SCHEDULER", "0")
+
+collect_ignore = ["test_api.py"]
+
+HEADERS = [
+    "timestamp", "deviceId", "tempC", "hum%", "mq135_raw", "rs_r0", "co2_ppm",
+    "quality", "ldr_raw", "ldr_v", "ldr_pct", "light",
+]
+DEVICES = ["esp32-1", "esp32-2"]
+# Readings every 15 minutes from 2025-09-17T00:00:00-06:00 (06:00 UTC), 3 days
+FIRST_READING = "2025-09-17T00:00:00-06:00"
+READINGS_PER_DEVICE = 3 * 24 * 4
+# Token POST /ingest requires in the tests
+INGEST_AUTH = {"X-Ingest-Token": "ingest-secret"}
+
+
+def sensor_rows(devices=DEVICES, readings=READINGS_PER_DEVICE, day=17, hour=0):
+    """Sheet-like rows (header first); every 10th co2 reading of esp32-2 is empty."""
+    rows = [HEADERS]
+    for step in range(readings):
+        minutes = hour * 60 + step * 15
+        stamp = f"2025-09-{day + minutes // 1440:02d}T{minutes // 60 % 24:02d}:{minutes % 60:02d}:00-06:00"
+        for number, device in enumerate(devices):
+            co2 = "" if device == "esp32-2" and step % 10 == 0 else str(400 + step % 50)
+            rows.append([
+                stamp, device, f"{20 + number + step % 8 / 2:.1f}".replace(".", ","), str(50 + step % 20),
+                "1400", "2,000", co2, "Buena", "2000", "1,611", "48", "Poca luz",
+            ])
+    return rows
+
+
+def write_csv(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        csv.writer(file).writerows(rows)
+    return str(path)
+
+
+@pytest.fixture
+def sensor_csv(tmp_path):
+    return write_csv(tmp_path / "sensors.csv", sensor_rows())
+
+
+@pytest.fixture
+def cache():
+    """A fresh MemoryCache as the shared cache."""
+    from services.cache import configure_cache, get_cache, MemoryCache
+
+    original = get_cache()
+    configure_cache(MemoryCache())
+    yield get_cache()
+    configure_cache(original)
+
+
+@pytest.fixture
+def app_env(sensor_csv, tmp_path, monkeypatch):
+    """The app serving `sensor_csv` plus an ingest buffer; yields the registry."""
+    import routes.sources
+    import services.dataset as dataset_module
+    from services.cache import configure_cache, get_cache, MemoryCache
+    from services.sources import registry, CsvSource, IngestSource
+
+    original_sources, original_cache = registry.sources, get_cache()
+    registry.set_sources([CsvSource("test", sensor_csv, refresh_interval=0), IngestSource("ingest", directory=tmp_path / "ingest")])
+    configure_cache(MemoryCache())
+    dataset_module._store.invalidate()
+    dataset_module.expire_dataset()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(routes.sources, "INGEST_TOKEN", INGEST_AUTH["X-Ingest-Token"])
+    yield registry
+    registry.set_sources(original_sources)
+    configure_cache(original_cache)
+    dataset_module._store.invalidate()
+
+
+@pytest.fixture
+def client(app_env):
+    from app import app
+
+    return app.test_client()
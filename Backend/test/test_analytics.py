@@ -0,0 +1,101 @@
+"""
+test_analytics.py
+------------------
+Cross-sensor analytics (services/analytics.py) against pandas and brute-force
+references.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from config.settings import SENSORS
+from services.analytics import asof, pairwise_stats, lagged_correlation, correlation_report, resolve_window
+from services.dataset import get_dataset
+
+SECOND = 1_000_000_000
+
+
+def _matrix(points=400, series=4, gaps=0.15, seed=4):
+    rng = np.random.default_rng(seed)
+    base = np.cumsum(rng.normal(size=points))
+    matrix = np.column_stack([base * (k + 1) + rng.normal(scale=2, size=points) + 400 * k for k in range(series)])
+    matrix[rng.random(matrix.shape) < gaps] = np.nan
+    return matrix
+
+
+def test_pairwise_stats_match_pandas():
+    matrix = _matrix()
+    matrix[:390, 3] = np.nan  # too few points left for this column
+    observations, covariance, correlation = pairwise_stats(matrix, matrix, min_periods=20)
+
+    frame = pd.DataFrame(matrix)
+    assert np.allclose(correlation, frame.corr(min_periods=20).to_numpy(), equal_nan=True)
+    assert np.allclose(covariance, frame.cov(min_periods=20).to_numpy(), equal_nan=True)
+    mask = frame.notna().to_numpy().astype(int)
+    assert np.array_equal(observations, mask.T @ mask)
+    assert np.isnan(correlation[3, :3]).all()
+
+
+def _brute_force_lag(x, y, lag, min_periods):
+    """corr(x(t), y(t + lag)) over the t where both exist, like pandas."""
+    shifted = pd.Series(y).shift(-lag)
+    return pd.Series(x).corr(shifted, min_periods=min_periods)
+
+
+@pytest.mark.parametrize("lags", [0, 1, 7])
+def test_lagged_correlation_matches_brute_force(lags):
+    matrix = _matrix(points=120, series=3)
+    pairs, result = lagged_correlation(matrix, lags, min_periods=10)
+
+    assert pairs == [(0, 1), (0, 2), (1, 2)]
+    assert result.shape == (3, 2 * lags + 1)
+    for row, (i, j) in enumerate(pairs):
+        expected = [_brute_force_lag(matrix[:, i], matrix[:, j], lag, 10) for lag in range(-lags, lags + 1)]
+        assert np.allclose(result[row], expected, equal_nan=True, atol=1e-9)
+
+
+def test_lagged_correlation_finds_the_delay():
+    rng = np.random.default_rng(5)
+    signal = rng.normal(size=300)
+    delayed = np.r_[np.zeros(4), signal[:-4]]  # series 1 follows series 0 four steps later
+    _, result = lagged_correlation(np.column_stack([signal, delayed]), 6)
+    assert np.argmax(result[0]) - 6 == 4
+
+
+def test_asof_matches_merge_asof():
+    rng = np.random.default_rng(6)
+    times = np.sort(rng.choice(np.arange(0, 3600, 7), 200, replace=False)).astype(np.int64) * SECOND
+    values = rng.normal(size=len(times))
+    grid = np.arange(-60, 3700, 60, dtype=np.int64) * SECOND
+    tolerance = 30 * SECOND
+
+    expected = pd.merge_asof(
+        pd.DataFrame({"t": grid}), pd.DataFrame({"t": times, "v": values}),
+        on="t", direction="backward", tolerance=tolerance,
+    )["v"].to_numpy()
+    assert np.array_equal(asof(times, values, grid, tolerance), expected, equal_nan=True)
+
+
+def test_report_matches_pandas_on_the_aligned_grid(app_env):
+    dataset = get_dataset()
+    window, error = resolve_window(dataset, sensors="temperature,co2", device_ids="esp32-1,esp32-2",
+                                   step="900", max_lag="3600")
+    assert error is None
+    report = correlation_report(dataset, window)
+
+    # Reference alignment: each series without its missing values, forward-filled onto the grid within the tolerance
+    grid = pd.DatetimeIndex(window["start"] + np.arange(window["points"]) * window["step"]).tz_localize("UTC")
+    columns = {}
+    for device, sensor in window["series"]:
+        rows = dataset.select(device)
+        series = pd.Series(dataset.columns[SENSORS[sensor]["column"]][rows],
+                           index=dataset.timestamps[rows]).dropna()
+        columns[f"{device}:{sensor}"] = series.reindex(grid, method="ffill",
+                                                       tolerance=pd.Timedelta(window["tolerance"]))
+    frame = pd.DataFrame(columns)
+    expected = frame.corr(min_periods=10).to_numpy()
+    assert np.allclose(np.array(report["correlation"], dtype=float), expected, equal_nan=True)
+    assert report["lagged"][0]["lags_seconds"] == [900.0 * lag for lag in range(-4, 5)]
+    # Lag 0 of the lagged cross-correlation is the plain correlation
+    assert np.isclose(report["lagged"][0]["correlation"][4], expected[0, 1])
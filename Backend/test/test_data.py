@@ -0,0 +1,140 @@
+"""
+test_data.py
+-------------
+GET /data filters.
+"""
+
+import os
+from datetime import datetime, timezone
+
+from conftest import READINGS_PER_DEVICE, DEVICES, INGEST_AUTH
+
+
+def _utc(text):
+    return datetime.fromisoformat(text).astimezone(timezone.utc)
+
+
+def test_all_rows(client):
+    body = client.get("/data").get_json()
+    assert body["records"] == READINGS_PER_DEVICE * len(DEVICES)
+
+
+def test_date_only_range(client):
+    # Dates without an offset are UTC: 2025-09-18T00:00Z to 2025-09-19T00:00Z, both included
+    response = client.get("/data?start_date=2025-09-18&end_date=2025-09-19")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["records"] == (24 * 4 + 1) * len(DEVICES)
+    stamps = [_utc(row["timestamp"]) for row in body["data"]]
+    assert min(stamps) == datetime(2025, 9, 18, tzinfo=timezone.utc)
+    assert max(stamps) == datetime(2025, 9, 19, tzinfo=timezone.utc)
+
+
+def test_offset_range_with_sensor_and_device(client):
+    response = client.get(
+        "/data?sensor=temperature&device_id=esp32-1"
+        "&start_date=2025-09-18T00:00:00-06:00&end_date=2025-09-18T05:59:59-06:00"
+    )
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["records"] == 6 * 4
+    assert {row["deviceId"] for row in body["data"]} == {"esp32-1"}
+    assert {row["sensor"] for row in body["data"]} == {"temperature"}
+
+
+def test_invalid_date(client):
+    response = client.get("/data?start_date=yesterday")
+    assert response.status_code == 404
+    assert "start_date" in response.get_json()["error"]
+
+
+def _epoch_ms(text):
+    return int(_utc(text).timestamp() * 1000)
+
+
+def test_layouts_select_the_same_rows(client):
+    queries = [
+        "",
+        "start_date=2025-09-18&end_date=2025-09-19",
+        "sensor=co2&device_id=esp32-2",
+        "sensor=temperature&start_date=2025-09-18T00:00:00-06:00",
+        "since=2025-09-19T12:00:00Z",
+        "sensor=co2&since=2025-09-18",
+    ]
+    for query in queries:
+        records = client.get(f"/data?{query}")
+        columnar = client.get(f"/data?{query}&layout=columnar")
+        assert records.status_code == columnar.status_code == 200, query
+        records, columnar = records.get_json(), columnar.get_json()
+        assert records["records"] == columnar["records"], query
+        assert records["high_water_mark"] == columnar["high_water_mark"], query
+
+        devices = columnar["header"]["devices"]
+        rows = list(zip(columnar["data"]["timestamp"], (devices[code] for code in columnar["data"]["device"])))
+        assert [(_epoch_ms(row["timestamp"]), row["deviceId"]) for row in records["data"]] == rows, query
+        if "sensor=co2" in query:
+            assert [row["value"] for row in records["data"]] == columnar["data"]["values"]["co2"], query
+
+
+def _since(client, mark, query=""):
+    response = client.get(f"/data?since={mark}&{query}")
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_since_without_new_rows_keeps_the_mark(client):
+    mark = client.get("/data").get_json()["high_water_mark"]
+    body = _since(client, mark)
+    assert body["records"] == 0
+    assert body["high_water_mark"] == mark
+
+
+def test_since_delivers_late_ingested_rows(client):
+    mark = client.get("/data").get_json()["high_water_mark"]
+    # Re-upload of a reading older than everything already served
+    late = {"timestamp": "2025-09-17T00:05:00-06:00", "deviceId": "esp32-1", "tempC": "19,5"}
+    assert client.post("/ingest", json=[late], headers=INGEST_AUTH).status_code == 202
+
+    body = _since(client, mark)
+    assert body["records"] == 1
+    assert body["data"][0]["deviceId"] == "esp32-1"
+    assert _utc(body["data"][0]["timestamp"]) == _utc(late["timestamp"])
+    assert _since(client, mark, "layout=columnar")["records"] == 1
+    assert _since(client, body["high_water_mark"])["records"] == 0
+
+
+def test_since_delivers_late_rows_of_a_sheet(client, sensor_csv):
+    import services.dataset as dataset_module
+    from conftest import sensor_rows, write_csv
+
+    mark = client.get("/data?device_id=esp32-2").get_json()["high_water_mark"]
+    late = sensor_rows(devices=["esp32-2"], readings=1, hour=1)[1]
+    late[0] = "2025-09-17T01:07:00-06:00"
+    write_csv(sensor_csv, sensor_rows() + [late])
+    os.utime(sensor_csv, (0, 0))
+    dataset_module.expire_dataset()
+
+    body = _since(client, mark, "device_id=esp32-2")
+    assert body["records"] == 1
+    assert _utc(body["data"][0]["timestamp"]) == _utc(late[0])
+    assert _since(client, mark, "device_id=esp32-1")["records"] == 0
+
+
+def test_invalid_since(client):
+    response = client.get("/data?since=soon")
+    assert response.status_code == 404
+    assert "since" in response.get_json()["error"]
+
+
+def test_body_comes_from_the_dataset_of_the_cache_key(client, monkeypatch):
+    import services.data_service
+    import services.rollups
+
+    def refreshed():
+        raise AssertionError("the route's dataset must be used")
+
+    # A refresh between building the cache key and the body would pair a key with other data
+    monkeypatch.setattr(services.data_service, "get_dataset", refreshed)
+    monkeypatch.setattr(services.rollups, "get_dataset", refreshed)
+    assert client.get("/data?device_id=esp32-1").status_code == 200
+    assert client.get("/data?sensor=temperature&resolution=hour").status_code == 200
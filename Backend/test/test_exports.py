@@ -0,0 +1,110 @@
+"""
+test_exports.py
+----------------
+Bulk exports: POST /exports, then GET /exports/<id> until the file is served.
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import time
+
+import pytest
+
+import routes.exports
+from services.cache import get_cache, cache_key
+from services.exports import ExportManager
+
+
+@pytest.fixture
+def exports(client, monkeypatch):
+    # Relative directory, as in settings: resolved against the cwd (tmp_path), not the app root
+    manager = ExportManager(directory="exports", chunk_rows=50)
+    monkeypatch.setattr(routes.exports, "export_manager", manager)
+    return manager
+
+
+def _download(client, params):
+    response = client.post("/exports", json=params)
+    assert response.status_code == 202
+    url = response.headers["Location"]
+    deadline = time.time() + 30
+    while True:
+        response = client.get(url)
+        if response.status_code != 202 or time.time() > deadline:
+            return response
+        time.sleep(0.02)
+
+
+def test_download_csv(client, exports, tmp_path):
+    response = _download(client, {"device_id": "esp32-1", "start_date": "2025-09-18", "end_date": "2025-09-19"})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.get_data()).decode("utf-8"))))
+    assert len(rows) == 24 * 4 + 1
+    assert int(response.headers["X-Export-Rows"]) == len(rows)
+    assert exports.directory == str(tmp_path / "exports")
+
+
+def test_sensor_export_counts_written_rows(client, exports):
+    # Every 10th co2 reading of esp32-2 is empty and is left out of the file
+    response = _download(client, {"sensor": "co2", "device_id": "esp32-2"})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.get_data()).decode("utf-8"))))
+    assert all(row["value"] for row in rows)
+    assert int(response.headers["X-Export-Rows"]) == len(rows)
+
+    job = next(iter(exports._jobs.values()))
+    state = job.to_dict()
+    assert state["rows_written"] == state["total_rows"] == len(rows)
+    assert state["progress"] == 1.0
+
+
+def _publish_state(exports, **fields):
+    # Job state as another server process would have published it
+    state = {"id": "ab" * 16, "filters": {}, "format": "csv", "status": "completed", "error": None,
+             "total_rows": 1, "rows_written": 1, "created_at": time.time(), "finished_at": time.time(), **fields}
+    get_cache().set(cache_key("export", state["id"]), json.dumps(state).encode("utf-8"), 60)
+    return state["id"]
+
+
+def test_cached_path_is_not_served(client, exports, tmp_path):
+    secret = tmp_path / "secret.txt"
+    secret.write_text("not an export")
+    job_id = _publish_state(exports, path=str(secret))
+
+    response = client.get(f"/exports/{job_id}")
+    # The file is looked up in the export directory only, where it doesn't exist
+    assert response.status_code == 410
+    assert exports.get(job_id).path == os.path.join(exports.directory, f"export_{job_id}.csv.gz")
+
+    assert exports.get("../secret") is None
+    assert client.get(f"/exports/{_publish_state(exports, id='cd' * 16, format='../../x')}").status_code == 404
+
+
+def test_swept_file_is_gone(client, exports):
+    response = _download(client, {"device_id": "esp32-1"})
+    assert response.status_code == 200
+    job = next(iter(exports._jobs.values()))
+    os.remove(job.path)
+
+    response = client.get(f"/exports/{job.id}")
+    assert response.status_code == 410
+    assert response.get_json()["size_bytes"] is None
+
+
+def test_sweep_removes_old_files_of_any_process(exports):
+    os.makedirs(exports.directory)
+    old = time.time() - exports.retention - 10
+    names = ("export_" + "1" * 32 + ".csv.gz", "export_" + "2" * 32 + ".parquet.part",
+             "export_" + "3" * 32 + ".csv.gz", "notes.txt")
+    for name in names:
+        path = os.path.join(exports.directory, name)
+        with open(path, "w") as file:
+            file.write("x")
+        if name != names[2]:
+            os.utime(path, (old, old))
+
+    exports.sweep()
+    assert sorted(os.listdir(exports.directory)) == sorted(names[2:])
@@ -0,0 +1,64 @@
+"""
+test_feature_builder.py
+------------------------
+FeatureBuilder.build (src/model/feature_builder.py): per-sensor matrices from
+one shared base array.
+"""
+
+import numpy as np
+import pandas as pd
+
+from model.feature_builder import FeatureBuilder
+from model.feature_window import FeatureWindow
+
+COLUMNS = ["tempC", "hum%", "co2_ppm"]
+
+
+def _data(rows=60):
+    rng = np.random.default_rng(1)
+    data = pd.DataFrame(rng.normal(50, 10, (rows, len(COLUMNS))), columns=COLUMNS)
+    data["timestamp"] = pd.date_range("2025-09-17", periods=rows, freq="15min", tz="UTC")
+    return data
+
+
+def test_target_is_not_an_exogenous_column():
+    builder = FeatureBuilder(_data(), COLUMNS)
+    window = FeatureWindow("tempC", n_lags=3, windows=(4,), calendar=())
+    features = builder.build(window, exogenous=COLUMNS)
+
+    assert features.feature_names == ["hum%", "co2_ppm"] + window.feature_names
+    # The current target value never leaks into X
+    assert not any(np.allclose(features.X[:, j], features.y) for j in range(features.X.shape[1]))
+
+
+def test_invalid_rows_are_dropped_per_sensor():
+    data = _data()
+    data.loc[30, "tempC"] = np.nan
+    data.loc[50, "hum%"] = np.nan
+    builder = FeatureBuilder(data, COLUMNS)
+
+    temperature = builder.build(FeatureWindow("tempC", n_lags=3, windows=(4,), calendar=()))
+    humidity = builder.build(FeatureWindow("hum%", n_lags=3, windows=(4,), calendar=()))
+    # The gap in tempC removes its own row and the rows whose window holds it, nothing else
+    assert set(np.arange(4, 60)) - set(temperature.positions) == set(range(30, 35))
+    assert set(np.arange(4, 60)) - set(humidity.positions) == set(range(50, 55))
+
+    # With humidity as an exogenous column, the tempC matrix also loses row 50
+    with_humidity = builder.build(FeatureWindow("tempC", n_lags=3, windows=(4,), calendar=()), exogenous=["hum%"])
+    assert set(temperature.positions) - set(with_humidity.positions) == {50}
+    assert not np.isnan(with_humidity.X).any() and not np.isnan(with_humidity.y).any()
+
+
+def test_positions_and_timestamps_stay_aligned():
+    data = _data()
+    data.loc[[10, 40], "co2_ppm"] = np.nan
+    builder = FeatureBuilder(data, COLUMNS)
+    window = FeatureWindow("co2_ppm", n_lags=2, windows=(3,))
+    features = builder.build(window, exogenous=["tempC"])
+
+    assert np.array_equal(features.y, data["co2_ppm"].to_numpy()[features.positions])
+    assert np.array_equal(features.X[:, 0], data["tempC"].to_numpy()[features.positions])
+    assert features.timestamps.equals(pd.DatetimeIndex(data["timestamp"])[features.positions])
+    # Lag 1 of each row is the previous reading
+    assert np.array_equal(features.X[:, 1], data["co2_ppm"].to_numpy()[features.positions - 1])
+    assert list(features.to_frame().index) == list(features.timestamps)
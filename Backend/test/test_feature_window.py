@@ -0,0 +1,61 @@
+"""
+test_feature_window.py
+-----------------------
+FeatureWindow (src/model/feature_window.py): the incremental features used at
+inference must equal the vectorized training matrix.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from model import feature_window
+from model.feature_window import FeatureWindow
+
+
+def _incremental(window, values, timestamps):
+    """features() before each observation once the window is ready, like the rows of transform()."""
+    rows = []
+    for value, timestamp in zip(values, timestamps):
+        if window.ready:
+            rows.append(window.features(timestamp))
+        window.push(value)
+    return np.array(rows)
+
+
+@pytest.mark.parametrize("windows", [(10,), (3, 10), (1, 4)])
+def test_incremental_features_equal_transform(windows):
+    values = np.random.default_rng(0).normal(20, 5, 300)
+    values[[40, 41, 42, 150]] = np.nan  # gaps enter and then leave the windows
+    timestamps = pd.date_range("2025-09-17", periods=len(values), freq="15min", tz="UTC")
+    window = FeatureWindow("tempC", n_lags=6, windows=windows)
+
+    expected = window.transform(values, timestamps)
+    actual = _incremental(window, values, timestamps)
+    assert actual.shape == expected.shape == (len(values) - window.size, len(window.feature_names))
+    assert np.allclose(actual, expected, equal_nan=True)
+    # Once the gap has left every window the statistics are finite again
+    assert np.isfinite(actual[42 + window.size:100]).all()
+
+
+def test_window_boundary():
+    window = FeatureWindow("tempC", n_lags=3, windows=(5,), calendar=())
+    values = np.arange(1.0, 8.0)
+    window.extend(values[:4])
+    with pytest.raises(ValueError):
+        window.features()
+
+    # Exactly `size` observations: the first row of transform(), lags newest first
+    window.push(values[4])
+    first = window.transform(values)[0]
+    assert np.allclose(window.features(), first)
+    assert list(first[:3]) == [5.0, 4.0, 3.0]
+    assert first[3] == values[:5].mean()
+
+
+def test_resync_keeps_gaps(monkeypatch):
+    monkeypatch.setattr(feature_window, "RESYNC_INTERVAL", 7)
+    values = np.linspace(0, 1, 50)
+    values[20] = np.nan
+    window = FeatureWindow("tempC", n_lags=2, windows=(5,), calendar=())
+    assert np.allclose(_incremental(window, values, [None] * len(values)), window.transform(values), equal_nan=True)
@@ -0,0 +1,61 @@
+"""
+test_model_selection.py
+------------------------
+Disk cache of the model selection (model/model_selection.py).
+"""
+
+import os
+
+import numpy as np
+
+from model.model_selection import ModelSelection, config_key
+
+SEARCH_SPACE = [("ridge", {"alpha": 1.0}), ("linear_regression", {})]
+
+
+def _selection(seed, **options):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(60, 3))
+    y = X @ [1.0, -2.0, 0.5] + rng.normal(scale=0.1, size=60)
+    return ModelSelection(X, y, ["a", "b", "c"], search_space=SEARCH_SPACE, n_splits=2, workers=1, **options)
+
+
+def test_cache_dir_is_absolute(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    selection = _selection(0, cache_dir="cache")
+    assert selection.directory == os.path.join(str(tmp_path), "cache", selection.hash)
+    monkeypatch.chdir("/")  # e.g. a worker started from another directory
+    selection.run()
+    assert os.path.exists(os.path.join(selection.directory, "X.npy"))
+
+
+def test_cache_keeps_the_most_recent_datasets(tmp_path):
+    cache_dir = tmp_path / "cache"
+    (cache_dir / "notes").mkdir(parents=True)  # not a dataset: never removed
+    hashes = []
+    for seed in range(4):
+        selection = _selection(seed, cache_dir=str(cache_dir), cache_keep=2)
+        selection.run()
+        hashes.append(selection.hash)
+        os.utime(selection.directory, (seed, seed))  # distinct ages, oldest first
+
+    # A cached dataset used again counts as recent
+    reused = _selection(2, cache_dir=str(cache_dir), cache_keep=2).run()
+    assert reused["evaluations"]["computed"] == 0
+    assert sorted(os.listdir(cache_dir)) == sorted(["notes", hashes[2], hashes[3]])
+
+
+def test_cache_holds_data_only(tmp_path):
+    selection = _selection(0, cache_dir=str(tmp_path))
+    first = selection.run()
+    files = [name for _, _, names in os.walk(selection.directory) for name in names]
+    assert {os.path.splitext(name)[1] for name in files} == {".npy", ".json"}
+
+    # A pickle planted where older versions kept the final model is never loaded
+    models = os.path.join(selection.directory, "models")
+    os.makedirs(models)
+    with open(os.path.join(models, f"{config_key(first['best']['model'], first['best']['params'])}.pkl"), "wb") as file:
+        file.write(b"not a model")
+    again = _selection(0, cache_dir=str(tmp_path)).run()
+    assert again["evaluations"]["computed"] == 0
+    assert np.allclose(again["model"].predict(selection.X), first["model"].predict(selection.X))
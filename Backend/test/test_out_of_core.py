@@ -0,0 +1,83 @@
+"""
+test_out_of_core.py
+--------------------
+Chunked analysis (src/model/out_of_core.py): state combined across chunks must
+equal the in-memory computation on the whole frame.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from model.feature_builder import FeatureBuilder
+from model.out_of_core import NUMERIC_COLUMNS, OutOfCoreAnalysis, Reservoir, RunningStats
+
+
+def _frame(rows=500, seed=7):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(rng.normal(100, 20, (rows, len(NUMERIC_COLUMNS))), columns=NUMERIC_COLUMNS)
+    frame[rng.random(frame.shape) < 0.05] = np.nan
+    frame["co2_ppm"] += 400  # large offset, where naive sums lose precision
+    frame.insert(0, "timestamp", pd.date_range("2025-09-17", periods=rows, freq="15min", tz="UTC"))
+    return frame
+
+
+def _chunks(frame, sizes):
+    bounds = np.cumsum([0] + list(sizes))
+    return [frame.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+@pytest.mark.parametrize("sizes", [(500,), (1, 99, 250, 150), (7,) * 71 + (3,)])
+def test_running_stats_equal_describe(sizes):
+    frame = _frame()
+    stats = RunningStats(len(NUMERIC_COLUMNS))
+    for chunk in _chunks(frame, sizes):
+        stats.update(chunk[NUMERIC_COLUMNS].to_numpy(dtype=float))
+
+    expected = frame[NUMERIC_COLUMNS].describe().T
+    actual = stats.to_frame(NUMERIC_COLUMNS)
+    for stat in ("count", "mean", "std", "min", "max"):
+        assert np.allclose(actual[stat], expected[stat], rtol=1e-10), stat
+
+
+def test_features_across_chunk_boundaries_equal_in_memory(tmp_path):
+    frame = _frame()
+    analysis = OutOfCoreAnalysis(tmp_path / "unused.csv", ["tempC", "co2_ppm"], window_size=10)
+
+    chunked = {target: [] for target in analysis.targets}
+    tail = None
+    # Chunks shorter and longer than the window history (10 rows)
+    for chunk in _chunks(frame, (4, 3, 50, 9, 120, 314)):
+        features, tail = analysis._features(chunk, tail)
+        for target, target_features in features.items():
+            chunked[target].append(target_features)
+
+    builder = FeatureBuilder(frame.reset_index(drop=True), NUMERIC_COLUMNS)
+    for target, window in analysis.windows.items():
+        expected = builder.build(window, exogenous=NUMERIC_COLUMNS)
+        parts = chunked[target]
+        assert np.array_equal(np.concatenate([part.X for part in parts]), expected.X)
+        assert np.array_equal(np.concatenate([part.y for part in parts]), expected.y)
+        assert parts[0].timestamps.append([part.timestamps for part in parts[1:]]).equals(expected.timestamps)
+
+
+def test_reservoir_stays_bounded_and_uniform():
+    reservoir = Reservoir(200, 2, seed=1)
+    for start in range(0, 20000, 1500):
+        rows = np.arange(start, min(start + 1500, 20000), dtype=float)
+        reservoir.update(np.column_stack([rows, -rows]))
+        assert reservoir.rows.shape == (200, 2)
+        assert len(reservoir.sample) == min(reservoir.seen, 200)
+
+    sample = reservoir.sample
+    assert reservoir.seen == 20000
+    # Distinct rows of the stream, kept whole, spread over all of it
+    assert len(np.unique(sample[:, 0])) == 200
+    assert np.array_equal(sample[:, 1], -sample[:, 0])
+    assert 8000 < sample[:, 0].mean() < 12000
+
+
+def test_reservoir_shorter_stream_keeps_every_row():
+    reservoir = Reservoir(50, 1)
+    reservoir.update(np.arange(30, dtype=float)[:, None])
+    assert np.array_equal(reservoir.sample[:, 0], np.arange(30))
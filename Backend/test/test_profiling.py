@@ -0,0 +1,56 @@
+"""
+test_profiling.py
+------------------
+Opt-in per-request profiling (services/instrumentation.py).
+"""
+
+import os
+
+import pytest
+
+import services.instrumentation as instrumentation
+
+
+@pytest.fixture
+def profiling(tmp_path, monkeypatch):
+    directory = tmp_path / "profiles"
+    monkeypatch.setattr(instrumentation, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(instrumentation, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(instrumentation, "PROFILE_DIR", str(directory))
+    monkeypatch.setattr(instrumentation, "PROFILE_MIN_INTERVAL", 0)
+    monkeypatch.setattr(instrumentation, "_last_profile", 0.0)
+    return directory
+
+
+@pytest.mark.skipif(bool(os.environ.get("ECOMONITOR_PROFILE_TOKEN")), reason="profile token set")
+def test_disabled_by_default(client):
+    assert not instrumentation.PROFILING_ENABLED
+    response = client.get("/sensors", headers={"X-Profile": "cprofile"})
+    assert "X-Profile-File" not in response.headers
+
+
+def test_requires_token(client, profiling):
+    for headers in ({"X-Profile": "cprofile"}, {"X-Profile": "cprofile", "X-Profile-Token": "wrong"}):
+        response = client.get("/sensors", headers=headers)
+        assert "X-Profile-File" not in response.headers
+    assert not profiling.exists()
+
+
+def test_profile_file_name_only(client, profiling):
+    response = client.get("/sensors", headers={"X-Profile": "cprofile", "X-Profile-Token": "secret"})
+    name = response.headers["X-Profile-File"]
+    assert os.path.basename(name) == name
+    assert (profiling / name).exists()
+
+
+def test_rate_limit_and_retention(client, profiling, monkeypatch):
+    headers = {"X-Profile": "cprofile", "X-Profile-Token": "secret"}
+    monkeypatch.setattr(instrumentation, "PROFILE_MAX_FILES", 2)
+    for _ in range(4):
+        assert "X-Profile-File" in client.get("/sensors", headers=headers).headers
+    assert len(os.listdir(profiling)) == 2
+
+    monkeypatch.setattr(instrumentation, "PROFILE_MIN_INTERVAL", 3600)
+    response = client.get("/sensors", headers=headers)
+    assert "X-Profile-File" not in response.headers
+    assert "limited" in response.headers["X-Profile-Error"]
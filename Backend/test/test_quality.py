@@ -0,0 +1,77 @@
+"""
+test_quality.py
+----------------
+Data-quality stage (services/quality.py) and its per-source gauge.
+"""
+
+import numpy as np
+
+from conftest import write_csv
+from services.dataset import TEXT_COLUMNS
+from services.metrics import QUALITY_ISSUES
+from services.quality import validate, NAT
+from services.sources import CsvSource
+
+MINUTE = 60 * 10**9
+
+
+def _validate(devices, minutes, temperatures):
+    timestamps = np.array([NAT if minute is None else minute * MINUTE for minute in minutes], dtype=np.int64)
+    columns = {
+        "deviceId": np.array(devices, dtype=object),
+        "tempC": np.array(temperatures, dtype=np.float64),
+    }
+    return validate(columns, timestamps, TEXT_COLUMNS)
+
+
+def test_duplicates_keep_the_first_occurrence():
+    columns, times, report = _validate(
+        ["a", "b", "a", "a", "b"],
+        [0, 0, 0, 1, 0],
+        [20.0, 21.0, 22.0, 23.0, 24.0],
+    )
+    assert report["rejected_rows"]["duplicate"] == 2
+    assert list(times // MINUTE) == [0, 0, 1]
+    assert list(columns["deviceId"]) == ["a", "b", "a"]
+    assert list(columns["tempC"]) == [20.0, 21.0, 23.0]
+
+
+def test_rows_are_ordered_by_time_stably():
+    columns, times, report = _validate(
+        ["a", "b", "c", "d", "e"],
+        [3, 1, 2, 1, 0],
+        [1.0, 2.0, 3.0, 4.0, 5.0],
+    )
+    assert report["rows_reordered"] == 3  # rows earlier than the one before them
+    assert list(times // MINUTE) == [0, 1, 1, 2, 3]
+    # Equal timestamps keep their upload order
+    assert list(columns["deviceId"]) == ["e", "b", "d", "c", "a"]
+
+
+def test_invalid_rows_and_out_of_range_values():
+    columns, times, report = _validate(
+        ["a", "", "a", "a", "a"],
+        [0, 1, None, 3, 4],
+        [-50.0, 20.0, 20.0, 81.0, 80.0],
+    )
+    assert report["rejected_rows"]["missing_device"] == 1
+    assert report["rejected_rows"]["invalid_timestamp"] == 1
+    assert report["rows_kept"] == 3
+    # Outside the temperature range (-40, 80) → cleared, the row is kept
+    assert report["cleared_values"]["out_of_range"] == {"tempC": 1 + 1}
+    assert np.array_equal(columns["tempC"], [np.nan, np.nan, 80.0], equal_nan=True)
+
+
+def test_gauge_is_not_counted_again_on_reparse(tmp_path, cache):
+    rows = [["timestamp", "deviceId", "tempC"]] + [
+        ["2025-09-18T00:00:00-06:00", "esp32-1", "20"],
+        ["2025-09-18T00:00:00-06:00", "esp32-1", "21"],
+        ["2025-09-18T00:15:00-06:00", "esp32-1", "99"],
+    ]
+    path = write_csv(tmp_path / "site.csv", rows)
+    source = CsvSource("quality-site", path, refresh_interval=0)
+    for _ in range(3):
+        source._mtime = None  # re-parse the unchanged file
+        assert source.refresh()
+    assert QUALITY_ISSUES.value(source="quality-site", reason="duplicate") == 1
+    assert QUALITY_ISSUES.value(source="quality-site", reason="out_of_range") == 1
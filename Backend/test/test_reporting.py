@@ -0,0 +1,17 @@
+"""
+test_reporting.py
+------------------
+Report rendering helpers (src/model/reporting.py).
+"""
+
+import numpy as np
+import pandas as pd
+
+from model.reporting import _naive_timestamps
+
+
+def test_plot_timestamps_are_local_time():
+    series = pd.Series(pd.to_datetime(["2025-09-17T06:00:00Z", "2025-09-17T18:30:00Z"]))
+    # America/Mexico_City is UTC-6
+    assert list(_naive_timestamps(series)) == list(np.array(["2025-09-17T00:00", "2025-09-17T12:30"],
+                                                            dtype="datetime64[ns]"))
@@ -0,0 +1,74 @@
+"""
+test_rollups.py
+----------------
+Hourly/daily rollups: /data?resolution=..., incremental updates and profiles.
+"""
+
+import numpy as np
+
+from conftest import sensor_rows, DEVICES
+from services.dataset import SensorDataset
+from services.rollups import RollupStore, aggregate, GRANULARITIES
+
+
+def test_auto_short_range_serves_raw_rows(client):
+    response = client.get("/data?sensor=temperature&resolution=auto&start_date=2025-09-18&end_date=2025-09-19")
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert body["resolution"] == "raw"
+    assert body["records"] == (24 * 4 + 1) * len(DEVICES)
+
+
+def test_auto_long_range_serves_hourly_rollups(client):
+    response = client.get("/data?sensor=temperature&resolution=auto&start_date=2025-09-17&end_date=2025-09-21")
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert body["resolution"] == "hour"
+    assert sum(row["count"] for row in body["data"]) == 3 * 24 * 4 * len(DEVICES)
+
+
+def test_edited_old_reading_is_reaggregated():
+    rows = sensor_rows()
+    store = RollupStore().update(SensorDataset.from_rows(rows))
+
+    # Same rows plus one new reading, with a reading of the first hour edited
+    edited = [list(row) for row in rows]
+    edited[1][2] = "99,0"
+    edited.append(["2025-09-20T00:00:00-06:00", "esp32-1"] + rows[1][2:])
+    dataset = SensorDataset.from_rows(edited)
+    store.update(dataset)
+
+    assert store.last_update["hour"] == "full"
+    for granularity in GRANULARITIES:
+        expected = aggregate(dataset, np.arange(len(dataset)), granularity, store.columns)
+        assert np.allclose(store.tables[granularity].to_numpy(), expected.to_numpy(), equal_nan=True)
+
+
+def test_unchanged_prefix_updates_incrementally():
+    rows = sensor_rows()
+    store = RollupStore().update(SensorDataset.from_rows(rows))
+    store.update(SensorDataset.from_rows(rows + [["2025-09-20T00:00:00-06:00", "esp32-1"] + rows[1][2:]]))
+    assert store.last_update["hour"] == "incremental"
+
+
+def test_profile_uses_local_hours():
+    # Readings from 00:00 to 00:45 local time (-06:00), i.e. 06:xx UTC
+    store = RollupStore().update(SensorDataset.from_rows(sensor_rows(readings=4)))
+    profile = store.profile("tempC", by="hour")
+    assert profile.index.tolist() == [0]
+
+
+def test_daily_buckets_start_at_local_midnight(client):
+    # Three local days of readings: in UTC days they would span four buckets
+    response = client.get("/data?sensor=temperature&resolution=day&device_id=esp32-1")
+    assert response.status_code == 200, response.get_json()
+    data = response.get_json()["data"]
+    assert [row["timestamp"] for row in data] == [
+        "2025-09-17T00:00:00-06:00", "2025-09-18T00:00:00-06:00", "2025-09-19T00:00:00-06:00",
+    ]
+    assert all(row["count"] == 24 * 4 for row in data)
+
+    # A range starting late in a local day still includes that day
+    response = client.get("/data?sensor=temperature&resolution=day&device_id=esp32-1"
+                          "&start_date=2025-09-18T23:00:00-06:00")
+    assert response.get_json()["data"][0]["timestamp"] == "2025-09-18T00:00:00-06:00"
@@ -0,0 +1,139 @@
+"""
+test_scheduler.py
+------------------
+Which server process runs the shared (heavy) jobs (services/scheduler.py).
+"""
+
+import os
+import threading
+
+import pytest
+
+from services.cache import MemoryCache, configure_cache, get_cache, cache_key
+from services.scheduler import Job, Scheduler, default_jobs
+
+
+class _SharedCache(MemoryCache):
+    """Stands in for a backend every process sees (Redis)."""
+
+    shared = True
+
+
+def _workers(tmp_path, count=2):
+    job = Job("anomaly_scan", lambda: None, 900, heavy=True)
+    return [Scheduler([job], threads=1, processes=1, lock_file=str(tmp_path / "scheduler.lock"))
+            for _ in range(count)], job
+
+
+def test_memory_cache_elects_one_process(tmp_path):
+    original = get_cache()
+    configure_cache(MemoryCache())
+    try:
+        (first, second), job = _workers(tmp_path)
+        assert first._claim(job)
+        assert first._claim(job)  # keeps running them every interval
+        assert not second._claim(job)
+
+        first.stop()  # e.g. the worker was recycled
+        assert second._claim(job)
+        second.stop()
+    finally:
+        configure_cache(original)
+
+
+def test_shared_cache_claims_each_run(tmp_path):
+    original = get_cache()
+    configure_cache(_SharedCache())
+    try:
+        (first, second), job = _workers(tmp_path)
+        assert first._claim(job)
+        assert not second._claim(job)
+        assert not first._claim(job)  # same interval
+        assert not os.path.exists(tmp_path / "scheduler.lock")
+    finally:
+        configure_cache(original)
+
+
+def test_light_jobs_run_everywhere(tmp_path):
+    job = Job("rollups", lambda: None, 300)
+    workers = [Scheduler([job], threads=1, processes=1, lock_file=str(tmp_path / "scheduler.lock")) for _ in range(2)]
+    assert all(worker._claim(job) for worker in workers)
+
+
+def test_retraining_gets_an_absolute_cache_dir():
+    job = next(job for job in default_jobs({"retrain_models": {"interval": 60}}) if job.name == "retrain_models")
+    assert os.path.isabs(job.func.keywords["cache_dir"])
+
+
+def _python(code, **env):
+    import subprocess
+    import sys
+    from conftest import SRC_DIR
+
+    return subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR, capture_output=True, text=True, timeout=60,
+                          env={**os.environ, **env})
+
+
+def test_importing_the_app_starts_nothing():
+    result = _python("import app; from services.scheduler import scheduler; print(scheduler._thread)",
+                     ECOMONITOR_SCHEDULER="1")
+    assert result.stdout.strip() == "None"
+
+
+def test_exit_while_a_job_runs_is_quiet(tmp_path):
+    # The job hands work to a thread pool after the interpreter started exiting
+    code = f"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+import services.scheduler as module
+from services.scheduler import Job, Scheduler
+
+pool = ThreadPoolExecutor(1)
+def job():
+    time.sleep(0.5)
+    return pool.submit(sum, [1, 2]).result()
+
+module.scheduler = Scheduler([Job("refresh_sources", job, 60)], lock_file={str(tmp_path / "scheduler.lock")!r})
+module.start_scheduler()
+time.sleep(0.2)
+"""
+    result = _python(code, ECOMONITOR_SCHEDULER="1")
+    assert result.returncode == 0
+    assert "Traceback" not in result.stderr
+
+
+@pytest.fixture
+def jobs_api(client, monkeypatch, tmp_path):
+    import routes.jobs
+    import services.scheduler as module
+
+    release = threading.Event()
+    job = Job("anomaly_scan", release.wait, 900, heavy=False, shared=True)
+    worker = Scheduler([job], threads=1, processes=1, lock_file=str(tmp_path / "scheduler.lock"))
+    monkeypatch.setattr(routes.jobs, "scheduler", worker)
+    monkeypatch.setattr(routes.jobs, "JOBS_TOKEN", "secret")
+    yield worker
+    release.set()
+    worker.stop()
+
+
+def test_run_job_requires_the_token(client, jobs_api, monkeypatch):
+    import routes.jobs
+
+    assert client.post("/jobs/anomaly_scan").status_code == 401
+    assert client.post("/jobs/anomaly_scan", headers={"X-Jobs-Token": "wrong"}).status_code == 401
+    monkeypatch.setattr(routes.jobs, "JOBS_TOKEN", None)
+    assert client.post("/jobs/anomaly_scan", headers={"X-Jobs-Token": "secret"}).status_code == 403
+
+
+def test_run_job_once_at_a_time(client, jobs_api):
+    headers = {"X-Jobs-Token": "secret"}
+    assert client.post("/jobs/missing", headers=headers).status_code == 404
+    assert client.post("/jobs/anomaly_scan", headers=headers).status_code == 202
+    assert client.post("/jobs/anomaly_scan", headers=headers).status_code == 409
+
+
+def test_shared_job_running_in_another_process(client, jobs_api):
+    configure_cache(_SharedCache())  # app_env restores the cache
+    get_cache().add(cache_key("job-running", "anomaly_scan"), b"1", 60)
+    assert client.post("/jobs/anomaly_scan", headers={"X-Jobs-Token": "secret"}).status_code == 409
@@ -0,0 +1,56 @@
+"""
+test_sequences.py
+------------------
+LSTM windows (src/model/sequences.py) against the per-row loop they replaced.
+"""
+
+import numpy as np
+import pytest
+
+from model.sequences import make_sequences, sequence_batches
+
+
+def _loop_sequences(series, sequence_length):
+    """The list-append loop train_lstm_model used before the sliding-window views."""
+    data = np.asarray(series).reshape(-1, 1)
+    X, y = [], []
+    for i in range(sequence_length, len(data)):
+        X.append(data[i - sequence_length:i, 0])
+        y.append(data[i, 0])
+    return np.array(X).reshape(-1, sequence_length), np.array(y)
+
+
+@pytest.mark.parametrize("length", [0, 5, 6, 7, 200])
+def test_windows_match_the_loop(length):
+    series = np.random.default_rng(2).normal(size=length).astype(np.float32)
+    X, y = make_sequences(series, 6)
+    expected_X, expected_y = _loop_sequences(series, 6)
+    assert X.shape == expected_X.shape and y.shape == expected_y.shape
+    assert np.array_equal(X, expected_X) and np.array_equal(y, expected_y)
+    if len(X):
+        # Views over the series, not copies
+        assert np.shares_memory(X, series)
+
+
+def test_batches_match_the_loop_split():
+    series = np.random.default_rng(3).normal(size=500).astype(np.float32)
+    expected_X, expected_y = _loop_sequences(series, 20)
+    split = int(0.8 * len(expected_y))
+
+    batches = list(sequence_batches(series, 20, stop=split, batch_size=32))
+    assert all(X.shape[1:] == (20, 1) for X, _ in batches)
+    assert np.array_equal(np.concatenate([X for X, _ in batches])[..., 0], expected_X[:split])
+    assert np.array_equal(np.concatenate([y for _, y in batches]), expected_y[:split])
+
+    test = list(sequence_batches(series, 20, start=split, batch_size=32))
+    assert np.array_equal(np.concatenate([y for _, y in test]), expected_y[split:])
+
+
+def test_shuffled_batches_keep_pairs():
+    series = np.arange(100, dtype=np.float32)
+    batches = list(sequence_batches(series, 10, stop=60, batch_size=16, shuffle=True))
+    X = np.concatenate([X for X, _ in batches])[..., 0]
+    y = np.concatenate([y for _, y in batches])
+    # Every training window once, each with the value that follows it
+    assert sorted(y.tolist()) == list(range(10, 70))
+    assert np.array_equal(X[:, -1] + 1, y)
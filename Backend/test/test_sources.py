@@ -0,0 +1,182 @@
+"""
+test_sources.py
+----------------
+Shared source snapshots and the ingest journal (services/sources.py).
+"""
+
+import os
+import pickle
+
+import numpy as np
+
+from conftest import INGEST_AUTH
+from services.cache import cache_key
+from services.sources import CsvSource, IngestSource, SourceRegistry
+
+
+def _assert_same(left, right):
+    assert left.headers == right.headers
+    assert np.array_equal(left.timestamps.asi8, right.timestamps.asi8)
+    for name, values in left.columns.items():
+        if values.dtype == object:
+            assert list(values) == list(right.columns[name])
+        else:
+            assert np.array_equal(values, right.columns[name], equal_nan=True)
+
+
+def test_snapshot_shared_without_pickle(sensor_csv, cache):
+    first = CsvSource("site", sensor_csv, refresh_interval=60)
+    assert first.refresh()
+    value = cache.get(cache_key("source", "site"))
+    assert value[32:34] == b"PK"  # .npz (zip) archive
+
+    # Another process loads the published run instead of parsing the file
+    second = CsvSource("site", "/nonexistent.csv", refresh_interval=60)
+    assert second.refresh()
+    assert second.snapshot_id == first.snapshot_id
+    assert second.origin == sensor_csv
+    _assert_same(first.dataset, second.dataset)
+    assert second.dataset.quality == first.dataset.quality
+    assert np.array_equal(second.dataset.arrivals, first.dataset.arrivals)
+
+
+class _Exploit:
+    ran = False
+
+    def __reduce__(self):
+        return (setattr, (_Exploit, "ran", True))
+
+
+def test_snapshot_never_unpickles(cache):
+    cache.set(cache_key("source", "site"), b"0" * 32 + pickle.dumps(_Exploit()), 60)
+    source = CsvSource("site", "/nonexistent.csv", refresh_interval=60)
+    assert not source.refresh()
+    assert source.last_error is not None
+    assert not _Exploit.ran
+
+
+def _record(minute, device="esp32-9"):
+    return {"timestamp": f"2025-09-18T00:{minute:02d}:00-06:00", "deviceId": device, "tempC": "21,5"}
+
+
+def test_ingest_journal_shared_between_processes(tmp_path):
+    worker_a = IngestSource("ingest", directory=tmp_path)
+    worker_b = IngestSource("ingest", directory=tmp_path)
+    worker_a.append([_record(0), _record(1)])
+
+    assert worker_b.refresh()
+    assert len(worker_b.dataset) == 2
+    assert not worker_b.refresh()  # unchanged journal
+
+    worker_b.append([_record(2)])
+    assert worker_a.refresh()
+    assert len(worker_a.dataset) == 3
+
+    # A restarted (or recycled) worker starts from the journal
+    restarted = IngestSource("ingest", directory=tmp_path)
+    assert restarted.refresh()
+    assert len(restarted.dataset) == 3
+
+
+def test_ingest_journal_compaction(tmp_path):
+    worker_a = IngestSource("ingest", max_rows=3, directory=tmp_path)
+    worker_b = IngestSource("ingest", max_rows=3, directory=tmp_path)
+    worker_a.append([_record(minute) for minute in range(7)])
+    worker_a.refresh()
+    with open(worker_a.path, encoding="utf-8") as file:
+        assert len(file.readlines()) == 3
+    assert list(worker_a.dataset.timestamps.minute) == [4, 5, 6]
+
+    worker_a.append([_record(7)])
+    worker_b.refresh()  # reads the compacted journal from the start
+    assert list(worker_b.dataset.timestamps.minute) == [5, 6, 7]
+
+
+def test_ingest_batches_arrive_in_order(tmp_path):
+    worker_a = IngestSource("ingest", directory=tmp_path)
+    worker_b = IngestSource("ingest", directory=tmp_path)
+    for minute in range(5):
+        (worker_a if minute % 2 else worker_b).append([_record(59 - minute)])  # older readings each time
+    worker_a.refresh()
+    by_reading_time = worker_a.dataset.arrivals
+    assert list(np.argsort(by_reading_time)) == [4, 3, 2, 1, 0]
+    assert len(set(by_reading_time)) == 5
+
+
+def test_rows_keep_their_arrival(tmp_path, cache):
+    from conftest import sensor_rows, write_csv
+
+    path = write_csv(tmp_path / "site.csv", sensor_rows(readings=4))
+    source = CsvSource("site", path, refresh_interval=0)
+    source.refresh()
+    first = source.dataset.arrivals.copy()
+    # First load: the history arrived at its reading time
+    assert np.array_equal(first, source.dataset.timestamps.asi8 // 1_000_000)
+
+    late = sensor_rows(devices=["esp32-9"], readings=1)[1]
+    write_csv(path, sensor_rows(readings=4) + [late])
+    os.utime(path, (0, 0))
+    source.refresh()
+    arrivals = source.dataset.arrivals
+    new = source.dataset.columns["deviceId"] == "esp32-9"
+    assert np.array_equal(np.sort(arrivals[~new]), np.sort(first))
+    assert arrivals[new][0] > first.max()
+
+
+
+def test_processes_agree_on_arrivals(tmp_path, cache):
+    from conftest import sensor_rows, write_csv
+
+    path = write_csv(tmp_path / "site.csv", sensor_rows(readings=4))
+    worker_a = SourceRegistry([CsvSource("site", path, refresh_interval=0)])
+    worker_a.load()
+
+    late = sensor_rows(devices=["esp32-9"], readings=1)[1]
+    write_csv(path, sensor_rows(readings=4) + [late])
+    os.utime(path, (0, 0))
+    stamped = worker_a.load()
+    # Started after the late row was stamped: it must not take it as history
+    worker_b = SourceRegistry([CsvSource("site", path, refresh_interval=0)])
+    assert np.array_equal(worker_b.load().arrivals, stamped.arrivals)
+
+    newer = sensor_rows(devices=["esp32-8"], readings=1)[1]
+    write_csv(path, sensor_rows(readings=4) + [late, newer])
+    os.utime(path, (1, 1))
+    from_b = worker_b.load(force=True).arrivals
+    from_a = worker_a.load(force=True).arrivals
+    assert np.array_equal(from_a, from_b)
+    assert from_a.max() > stamped.arrivals.max()
+
+def test_ingest_endpoint(client, app_env):
+    response = client.post("/ingest", json=[_record(30, "esp32-9")], headers=INGEST_AUTH)
+    assert response.status_code == 202
+    body = client.get("/data?device_id=esp32-9").get_json()
+    assert body["records"] == 1
+    assert os.path.exists(app_env.get("ingest").path)
+
+
+def test_ingest_requires_the_token(client, monkeypatch):
+    import routes.sources
+
+    assert client.post("/ingest", json=[_record(30)]).status_code == 401
+    assert client.post("/ingest", json=[_record(30)], headers={"X-Ingest-Token": "wrong"}).status_code == 401
+    monkeypatch.setattr(routes.sources, "INGEST_TOKEN", None)
+    assert client.post("/ingest", json=[_record(30)], headers=INGEST_AUTH).status_code == 403
+
+
+def test_ingest_rejects_unknown_fields(client, app_env):
+    response = client.post("/ingest", json=[{**_record(30), "x" * 20: 1}], headers=INGEST_AUTH)
+    assert response.status_code == 400
+    assert not os.path.exists(app_env.get("ingest").path)
+
+
+def test_ingest_journal_ignores_unknown_keys(tmp_path):
+    source = IngestSource("ingest", directory=tmp_path)
+    source.append([{**_record(0), "rogue": 1}])
+    # A line journaled before keys were checked
+    with open(source.path, "a", encoding="utf-8") as file:
+        file.write('{"timestamp": "2025-09-18T00:01:00-06:00", "deviceId": "esp32-9", "other": 2}\n')
+
+    assert source.refresh()
+    assert "rogue" not in source.dataset.headers and "other" not in source.dataset.headers
+    assert len(source.dataset) == 2